@@ -0,0 +1,283 @@
+"""
+Author: Caroline Rinks
+Answers many start/goal queries over one grid. The grid is loaded once, copied into a
+shared memory block and searched read-only by a pool of worker processes. Results are
+streamed to stdout as JSON lines, in the same order as the queries.
+
+Usage:
+
+    python3 batch.py --input FILENAME --search SEARCH_TYPE [--queries QUERY_FILE] [--workers N] [--compact]
+                     [--budget MS] [--max-expansions N]
+
+Each line of QUERY_FILE (or stdin, if no file is given) holds one query in the form
+"START_NODE GOAL_NODE", e.g. "0,0 9,9". Blank lines and lines starting with # are skipped.
+"""
+
+import json
+import os
+import sys
+from multiprocessing import Pool, shared_memory
+
+import components
+import grid_io
+import hpa
+import landmarks
+import main as m
+
+USAGE = ("Usage: python batch.py --input FILENAME --search SEARCH_TYPE [--queries QUERY_FILE] [--workers N] [--compact]"
+         " [--budget MS] [--max-expansions N]")
+
+# Per-process state set up by init_worker
+worker_grid = None
+worker_planner = None
+worker_shm = None
+worker_search = None
+
+def parse_args():
+    """
+    Parses the command-line arguments.
+
+    @return filename: The grid file to search
+    @return search_type: One of main.SEARCH_TYPES
+    @return queries: The query file, or "" to read queries from stdin
+    @return workers: The number of worker processes
+    @return compact: True if the searches should run in compact mode
+    @return budgets: The (time in ms, expansions) budgets of each A*-ANYTIME query,
+                     None where there is no limit
+    """
+    filename = ""
+    search_type = ""
+    queries = ""
+    workers = os.cpu_count() or 1
+    compact = False
+    time_budget = None
+    expansion_budget = None
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == "--compact":
+            compact = True
+            i += 1
+            continue
+        if i+1 == len(sys.argv):
+            sys.exit(USAGE)
+
+        if sys.argv[i] == "--input":
+            filename = sys.argv[i+1]
+        elif sys.argv[i] == "--search":
+            search_type = sys.argv[i+1]
+            if search_type not in m.SEARCH_TYPES:
+                sys.exit("Options are: " + " | ".join(m.SEARCH_TYPES))
+        elif sys.argv[i] == "--queries":
+            queries = sys.argv[i+1]
+        elif sys.argv[i] == "--workers":
+            if not sys.argv[i+1].isnumeric() or int(sys.argv[i+1]) < 1:
+                sys.exit("--workers must be a positive integer")
+            workers = int(sys.argv[i+1])
+        elif sys.argv[i] == "--budget":
+            if not sys.argv[i+1].replace('.', '', 1).isnumeric():
+                sys.exit("--budget must be a number of milliseconds")
+            time_budget = float(sys.argv[i+1])
+        elif sys.argv[i] == "--max-expansions":
+            if not sys.argv[i+1].isnumeric():
+                sys.exit("--max-expansions must be a positive integer")
+            expansion_budget = int(sys.argv[i+1])
+        else:
+            sys.exit(USAGE)
+        i += 2
+
+    if filename == "" or search_type == "":
+        sys.exit(USAGE)
+
+    return filename, search_type, queries, workers, compact, (time_budget, expansion_budget)
+
+def read_queries(file):
+    """
+    Yields (line number, start, goal) for every query line in a file, where start and
+    goal are the raw coordinate strings.
+
+    @param file: An open file or stdin
+    @return a generator of query tuples
+    """
+    for line_no, line in enumerate(file, 1):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        fields = line.split()
+        if len(fields) != 2:
+            fields = (line, "")
+        yield line_no, fields[0], fields[1]
+
+def parse_coordinate(text, grid):
+    """
+    Converts a "row,col" string into a pair of ints and checks it is a free cell.
+
+    @param text: The coordinate string
+    @param grid: The Grid object being searched
+    @return a (row, col) tuple
+    """
+    coordinate = text.split(',')
+    if not (len(coordinate) == 2 and coordinate[0].isnumeric() and coordinate[1].isnumeric()):
+        raise ValueError("%r is not in coordinate form" % text)
+
+    x = int(coordinate[0])
+    y = int(coordinate[1])
+    if x >= grid.Nrows or y >= grid.Ncols:
+        raise ValueError("%s is outside the grid environment" % text)
+    if grid.cells[x * grid.Ncols + y] == 1:
+        raise ValueError("%s is an obstacle" % text)
+    return x, y
+
+def answer_query(PathPlan, grid, search_type, query):
+    """
+    Runs one query and returns its result as a dict ready to be written as JSON.
+    The same PathPlanner is reused across queries so its distance field cache
+    carries over between queries that share a source.
+
+    @param PathPlan: The PathPlanner object to search with
+    @param grid: The Grid object being searched
+    @param search_type: One of main.SEARCH_TYPES
+    @param query: A (line number, start, goal) tuple from read_queries
+    @return a dict describing the path found and the search's statistics (see
+            main.SearchResult.to_dict), or the error
+    """
+    line_no, start, goal = query
+    result = {"line": line_no, "start": start, "goal": goal}
+
+    try:
+        x1, y1 = parse_coordinate(start, grid)
+        x2, y2 = parse_coordinate(goal, grid)
+    except ValueError as err:
+        result["error"] = str(err)
+        return result
+
+    if (x1, y1) == (x2, y2):
+        search_result = m.SearchResult(search_type, True, [(x1, y1)], 0, 0, 0, 0.0)
+    else:
+        search_result = PathPlan.search(search_type, m.Node(x1, y1), m.Node(x2, y2), grid)
+
+    result.update(search_result.to_dict())
+    return result
+
+def make_planner(Nrows, Ncols, compact, budgets):
+    """
+    Creates the PathPlanner that answers a batch's queries.
+
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param compact: True if the searches should run in compact mode
+    @param budgets: The (time in ms, expansions) budgets of each A*-ANYTIME query
+    @return a PathPlanner object
+    """
+    PathPlan = m.PathPlanner(Nrows, Ncols, compact=compact)
+    PathPlan.time_budget, PathPlan.expansion_budget = budgets
+    return PathPlan
+
+def init_worker(filename, shm_name, Nrows, Ncols, weighted, search_type, compact, budgets):
+    """
+    Attaches a worker process to the shared grid and its saved component labels,
+    abstract graph and landmark tables.
+
+    @param filename: The name of the grid file, used to find its labels
+    @param shm_name: The name of the shared memory block holding the grid's cells, or
+                     None to open a tiled grid file
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param weighted: True if the shared block holds the grid's costs after its cells
+    @param search_type: One of main.SEARCH_TYPES
+    @param compact: True if the searches should run in compact mode
+    @param budgets: The (time in ms, expansions) budgets of each A*-ANYTIME query
+    @return none
+    """
+    global worker_grid, worker_planner, worker_shm, worker_search
+
+    if shm_name is None:
+        # Tiled grids are not copied: each worker reads the chunks it needs from the file
+        worker_grid = grid_io.load_grid(filename)
+    else:
+        worker_shm = shared_memory.SharedMemory(name=shm_name)
+        size = Nrows * Ncols
+        costs = worker_shm.buf[size:2 * size].toreadonly() if weighted else None
+        worker_grid = grid_io.Grid(Nrows, Ncols, worker_shm.buf[:size].toreadonly(), costs=costs)
+    components.attach_labels(worker_grid, filename)
+    hpa.attach_graph(worker_grid, filename)
+    landmarks.attach_landmarks(worker_grid, filename)
+    worker_planner = make_planner(Nrows, Ncols, compact, budgets)
+    worker_search = search_type
+
+def run_worker_query(query):
+    """
+    Answers one query inside a worker process.
+
+    @param query: A (line number, start, goal) tuple from read_queries
+    @return the query's result as a JSON string
+    """
+    return json.dumps(answer_query(worker_planner, worker_grid, worker_search, query))
+
+def run_batch(filename, grid, search_type, queries, workers, compact, budgets, out):
+    """
+    Answers every query and writes one JSON line per result to out, in query order.
+
+    @param filename: The name of the grid file
+    @param grid: The Grid object being searched
+    @param search_type: One of main.SEARCH_TYPES
+    @param queries: An iterable of (line number, start, goal) tuples
+    @param workers: The number of worker processes
+    @param compact: True if the searches should run in compact mode
+    @param budgets: The (time in ms, expansions) budgets of each A*-ANYTIME query
+    @param out: The file to write results to
+    @return none
+    """
+    if workers == 1:
+        PathPlan = make_planner(grid.Nrows, grid.Ncols, compact, budgets)
+        for query in queries:
+            out.write(json.dumps(answer_query(PathPlan, grid, search_type, query)) + "\n")
+        return
+
+    size = grid.Nrows * grid.Ncols
+    weighted = grid.costs is not None
+    shm = None
+    if not isinstance(grid, grid_io.TiledGrid):
+        shm = shared_memory.SharedMemory(create=True, size=max(2 * size if weighted else size, 1))
+    try:
+        if shm is not None:
+            shm.buf[:size] = grid.cells
+            if weighted:
+                shm.buf[size:2 * size] = grid.costs
+        args = (filename, shm.name if shm is not None else None, grid.Nrows, grid.Ncols, weighted,
+                search_type, compact, budgets)
+        with Pool(workers, initializer=init_worker, initargs=args) as pool:
+            for line in pool.imap(run_worker_query, queries, chunksize=16):
+                out.write(line + "\n")
+                out.flush()
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+def main():
+    """
+    Loads the grid once and answers every query read from the query file or stdin.
+
+    @return 0 at end of process
+    """
+    filename, search_type, queries, workers, compact, budgets = parse_args()
+
+    try:
+        grid = grid_io.load_grid(filename)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    components.attach_labels(grid, filename)
+    hpa.attach_graph(grid, filename)
+    landmarks.attach_landmarks(grid, filename)
+
+    if queries == "":
+        run_batch(filename, grid, search_type, read_queries(sys.stdin), workers, compact, budgets, sys.stdout)
+    else:
+        with open(queries, 'r') as file:
+            run_batch(filename, grid, search_type, read_queries(file), workers, compact, budgets, sys.stdout)
+
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,510 @@
+"""
+Author: Caroline Rinks
+Benchmarks the planners on reproducible synthetic grids, so performance can be measured
+at realistic sizes and compared between versions.
+
+Three kinds of grid are generated from a seed:
+
+    random  - each cell is an obstacle with a fixed probability (25% by default)
+    maze    - a recursive-division maze whose corridors widen with the grid size
+    rooms   - walled rooms with one door each, laid out between a lattice of corridors
+
+Generated grids are saved as .npy files in a cache directory and memory-mapped by the
+workers. Every (grid, search) case runs in a fresh process, so its peak RSS is its own,
+and a case that runs past the timeout is stopped and recorded as "timeout".
+
+Usage:
+
+    python3 benchmark.py [--kinds KIND,...] [--sizes N,...] [--search SEARCH_TYPE,...] [--queries N]
+                         [--seed SEED] [--timeout SECONDS] [--compact] [--cache DIR]
+                         [--output FILE] [--compare BASELINE_FILE] [--tolerance FRACTION]
+
+The results are written as JSON to FILE (default benchmark.json). With --compare, each case
+is checked against the same case in an earlier results file; a case whose time or peak RSS
+grew by more than the tolerance (default 0.25), or whose expansions or path lengths changed,
+is reported as a regression and the program exits with status 1.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import components
+import grid_io
+import hpa
+import landmarks
+import main as m
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+USAGE = ("Usage: python benchmark.py [--kinds KIND,...] [--sizes N,...] [--search SEARCH_TYPE,...] [--queries N]"
+         " [--seed SEED] [--timeout SECONDS] [--compact] [--cache DIR] [--output FILE]"
+         " [--compare BASELINE_FILE] [--tolerance FRACTION]")
+
+# Bumped whenever a generator changes, so results from different grids are never compared
+GENERATOR_VERSION = 1
+
+# Obstacle probability of random grids
+DENSITY = 0.25
+
+def random_grid(Nrows, Ncols, rng, density=DENSITY):
+    """
+    Generates a grid in which every cell is an obstacle with the given probability.
+    Random bytes are mapped to cells with one bytes.translate call.
+
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param rng: A random.Random object
+    @param density: The probability that a cell is an obstacle
+    @return a Grid object
+    """
+    threshold = round(density * 256)
+    table = bytes(1 if b < threshold else 0 for b in range(256))
+    cells = bytearray(rng.randbytes(Nrows * Ncols).translate(table))
+    return grid_io.Grid(Nrows, Ncols, cells)
+
+def maze_grid(Nrows, Ncols, rng, corridor=None):
+    """
+    Generates a maze by recursive division: each chamber is split by a wall with one
+    door in it, and the two halves are divided in turn until they are one corridor wide.
+    Walls lie on a lattice of pitch corridor+1, so every corridor has the same width, and
+    every free cell can reach every other. Walls are drawn with slice assignments.
+
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param rng: A random.Random object
+    @param corridor: The corridor width, by default 1 for every 200 cells of the shorter side
+    @return a Grid object
+    """
+    if corridor is None:
+        corridor = max(1, min(Nrows, Ncols) // 200)
+    pitch = corridor + 1
+    cells = bytearray(Nrows * Ncols)
+
+    chambers = [(0, Nrows, 0, Ncols)]
+    while chambers:
+        r0, r1, c0, c1 = chambers.pop()
+        rows = range(r0 + corridor, r1 - corridor, pitch)
+        cols = range(c0 + corridor, c1 - corridor, pitch)
+        if len(rows) == 0 and len(cols) == 0:
+            continue
+
+        # Split across the longer side, so chambers stay roughly square
+        horizontal = len(cols) == 0 or (len(rows) != 0 and (r1 - r0 > c1 - c0 or
+                                                             (r1 - r0 == c1 - c0 and rng.random() < 0.5)))
+        if horizontal:
+            r = rng.choice(rows)
+            door = rng.randrange(c0, c1, pitch)
+            width = min(corridor, c1 - door)
+            cells[r * Ncols + c0:r * Ncols + c1] = b'\x01' * (c1 - c0)
+            cells[r * Ncols + door:r * Ncols + door + width] = bytes(width)
+            chambers.append((r0, r, c0, c1))
+            chambers.append((r + 1, r1, c0, c1))
+        else:
+            c = rng.choice(cols)
+            door = rng.randrange(r0, r1, pitch)
+            height = min(corridor, r1 - door)
+            cells[r0 * Ncols + c:(r1 - 1) * Ncols + c + 1:Ncols] = b'\x01' * (r1 - r0)
+            cells[door * Ncols + c:(door + height - 1) * Ncols + c + 1:Ncols] = bytes(height)
+            chambers.append((r0, r1, c0, c))
+            chambers.append((r0, r1, c + 1, c1))
+
+    return grid_io.Grid(Nrows, Ncols, cells)
+
+def rooms_grid(Nrows, Ncols, rng, room=None, storage=0.1):
+    """
+    Generates rooms and corridors: the grid is tiled with blocks made of a corridor
+    along the top and left and a walled room with one door onto a corridor. A fraction
+    of the rooms are solid storage blocks. The corridors form a connected lattice, so
+    every free cell can reach every other.
+
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param rng: A random.Random object
+    @param room: The side of a room including its walls, by default 1/25 of the shorter side
+    @param storage: The fraction of rooms that are solid
+    @return a Grid object
+    """
+    if room is None:
+        room = max(6, min(Nrows, Ncols) // 25)
+    corridor = max(2, room // 3)
+    pitch = room + corridor
+    cells = bytearray(Nrows * Ncols)
+
+    for top in range(corridor, Nrows, pitch):
+        bottom = min(top + room, Nrows)
+        for left in range(corridor, Ncols, pitch):
+            right = min(left + room, Ncols)
+            if bottom - top < 3 or right - left < 3:
+                continue
+
+            if rng.random() < storage:
+                for r in range(top, bottom):
+                    cells[r * Ncols + left:r * Ncols + right] = b'\x01' * (right - left)
+                continue
+
+            cells[top * Ncols + left:top * Ncols + right] = b'\x01' * (right - left)
+            cells[(bottom - 1) * Ncols + left:(bottom - 1) * Ncols + right] = b'\x01' * (right - left)
+            cells[top * Ncols + left:(bottom - 1) * Ncols + left + 1:Ncols] = b'\x01' * (bottom - top)
+            cells[top * Ncols + right - 1:(bottom - 1) * Ncols + right:Ncols] = b'\x01' * (bottom - top)
+
+            # The top and left walls always face a corridor
+            if rng.random() < 0.5:
+                cells[top * Ncols + rng.randrange(left + 1, right - 1)] = 0
+            else:
+                cells[rng.randrange(top + 1, bottom - 1) * Ncols + left] = 0
+
+    return grid_io.Grid(Nrows, Ncols, cells)
+
+# Grid generators by name
+GENERATORS = {"random": random_grid, "maze": maze_grid, "rooms": rooms_grid}
+
+def generate(kind, size, seed):
+    """
+    Generates a square grid of the given kind.
+
+    @param kind: One of the names in GENERATORS
+    @param size: The number of rows and columns
+    @param seed: The random seed
+    @return a Grid object
+    """
+    return GENERATORS[kind](size, size, random.Random("%s-%d-%d" % (kind, size, seed)))
+
+def pick_queries(grid, labels, count, seed):
+    """
+    Picks random start/goal pairs inside the grid's largest component, so every query
+    has a path.
+
+    @param grid: The Grid object
+    @param labels: The grid's component labels, as returned by components.label_components
+    @param count: The number of queries
+    @param seed: The random seed
+    @return a list of ((row, col), (row, col)) pairs
+    """
+    sizes = Counter(labels)
+    del sizes[0]
+    if not sizes:
+        return []
+    largest = max(sizes, key=sizes.get)
+    if sizes[largest] < 2:
+        return []
+
+    rng = random.Random(seed)
+    size = grid.Nrows * grid.Ncols
+    queries = []
+    while len(queries) < count:
+        a = rng.randrange(0, size)
+        b = rng.randrange(0, size)
+        if a != b and labels[a] == largest and labels[b] == largest:
+            queries.append((divmod(a, grid.Ncols), divmod(b, grid.Ncols)))
+    return queries
+
+def prepare_grid(kind, size, seed, count, cache):
+    """
+    Generates a grid (or reuses the copy in the cache directory) and picks its queries.
+
+    @param kind: One of the names in GENERATORS
+    @param size: The number of rows and columns
+    @param seed: The random seed
+    @param count: The number of queries
+    @param cache: The directory generated grids are saved in
+    @return a tuple (filename, queries, obstacle fraction, seconds spent generating)
+    """
+    filename = os.path.join(cache, "%s-%d-%d-v%d.npy" % (kind, size, seed, GENERATOR_VERSION))
+    begin = time.perf_counter()
+    if os.path.exists(filename):
+        grid = grid_io.load_grid(filename)
+    else:
+        grid = generate(kind, size, seed)
+        grid_io.save_grid(grid, filename + ".tmp.npy")
+        os.replace(filename + ".tmp.npy", filename)
+
+    if components.attach_labels(grid, filename):
+        labels = grid.labels
+    else:
+        labels, _ = components.label_components(grid)
+        components.save_labels(labels, grid, filename)
+    queries = pick_queries(grid, labels, count, seed)
+    density = bytes(grid.cells).count(1) / (grid.Nrows * grid.Ncols)
+    elapsed = time.perf_counter() - begin
+    # The labels may be a view of the memory-mapped labels file, which close() unmaps
+    del labels
+    grid.close()
+    return filename, queries, density, elapsed
+
+def peak_rss_kb():
+    """
+    Returns the peak resident set size of this process.
+
+    @return the peak RSS in kilobytes, or None where the resource module is missing
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def run_case(filename, search_type, queries, compact):
+    """
+    Runs every query of one case inside a fresh worker process.
+
+    @param filename: The grid file
+    @param search_type: One of main.SEARCH_TYPES
+    @param queries: A list of ((row, col), (row, col)) pairs
+    @param compact: True if the searches should run in compact mode
+    @return a dict of the case's measurements
+    """
+    grid = grid_io.load_grid(filename)
+    components.attach_labels(grid, filename)
+    preprocess_time = 0.0
+    if search_type == "HPA*" and not hpa.attach_graph(grid, filename):
+        grid.hpa = hpa.ClusterGraph.build(grid)
+        preprocess_time = grid.hpa.build_time
+    if search_type == "A*-ALT" and not landmarks.attach_landmarks(grid, filename):
+        grid.landmarks = landmarks.LandmarkTable.build(grid)
+        preprocess_time = grid.landmarks.build_time
+
+    PathPlan = m.PathPlanner(grid.Nrows, grid.Ncols, compact=compact)
+    base_rss = peak_rss_kb()
+    times = []
+    lengths = []
+    expansions = 0
+    generated = 0
+    peak_frontier = 0
+    for start, goal in queries:
+        result = PathPlan.search(search_type, m.Node(*start), m.Node(*goal), grid)
+        times.append(result.wall_time)
+        lengths.append(len(result.path) - 1 if result.found else None)
+        expansions += result.expansions
+        if result.generated is None:
+            generated = peak_frontier = None
+        elif generated is not None:
+            generated += result.generated
+            peak_frontier = max(peak_frontier, result.peak_frontier)
+
+    times.sort()
+    return {"status": "ok",
+            "time_total": sum(times),
+            "time_mean": sum(times) / len(times) if times else None,
+            "time_median": times[len(times) // 2] if times else None,
+            "time_max": times[-1] if times else None,
+            "preprocess_time": preprocess_time,
+            "expansions": expansions,
+            "generated": generated,
+            "peak_frontier": peak_frontier,
+            "lengths": lengths,
+            "base_rss_kb": base_rss,
+            "peak_rss_kb": peak_rss_kb()}
+
+def run_isolated(filename, search_type, queries, compact, timeout):
+    """
+    Runs one case in a freshly spawned process, stopping it if it runs too long.
+
+    @param filename: The grid file
+    @param search_type: One of main.SEARCH_TYPES
+    @param queries: A list of ((row, col), (row, col)) pairs
+    @param compact: True if the searches should run in compact mode
+    @param timeout: The seconds the whole case may take
+    @return a dict of the case's measurements, with "status" "timeout" or "error" if
+            it did not finish
+    """
+    # Spawned rather than forked, so the worker's RSS does not include the parent's pages
+    pool = multiprocessing.get_context("spawn").Pool(1)
+    try:
+        pending = pool.apply_async(run_case, (filename, search_type, queries, compact))
+        return pending.get(timeout)
+    except multiprocessing.TimeoutError:
+        return {"status": "timeout"}
+    except Exception as err:
+        return {"status": "error", "error": "%s: %s" % (type(err).__name__, err)}
+    finally:
+        pool.terminate()
+        pool.join()
+
+def case_key(case):
+    """
+    Returns the fields that identify a case across results files.
+
+    @param case: A case dict from a results file
+    @return a hashable key
+    """
+    return (case["kind"], case["size"], case["seed"], case["search"], case["queries"], case["compact"])
+
+def compare(results, baseline, tolerance):
+    """
+    Compares each case with the same case in an earlier results file.
+
+    @param results: The results document of this run
+    @param baseline: The results document to compare against
+    @param tolerance: The fraction by which time or peak RSS may grow
+    @return a list of regression messages, empty if there are none
+    """
+    if baseline.get("generator_version") != results["generator_version"]:
+        return ["baseline was generated with different grids (generator version %s)" %
+                baseline.get("generator_version")]
+
+    before = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = before.get(case_key(case))
+        if old is None or old["status"] != "ok":
+            continue
+        name = "%s %d %s" % (case["kind"], case["size"], case["search"])
+        if case["status"] != "ok":
+            regressions.append("%s: %s (was ok)" % (name, case["status"]))
+            continue
+
+        print("%-24s time %.3f -> %.3f s (x%.2f)" % (name, old["time_total"], case["time_total"],
+              case["time_total"] / old["time_total"] if old["time_total"] else float("inf")))
+        if case["time_total"] > old["time_total"] * (1 + tolerance):
+            regressions.append("%s: time %.3f -> %.3f s" % (name, old["time_total"], case["time_total"]))
+        if (case["peak_rss_kb"] is not None and old["peak_rss_kb"] is not None and
+                case["peak_rss_kb"] > old["peak_rss_kb"] * (1 + tolerance)):
+            regressions.append("%s: peak RSS %d -> %d KB" % (name, old["peak_rss_kb"], case["peak_rss_kb"]))
+        if case["expansions"] != old["expansions"]:
+            regressions.append("%s: expansions %d -> %d" % (name, old["expansions"], case["expansions"]))
+        if case["lengths"] != old["lengths"]:
+            regressions.append("%s: path lengths changed" % name)
+    return regressions
+
+def parse_list(text, allowed=None, numeric=False):
+    """
+    Splits a comma-separated option value, exiting if an item is not allowed.
+
+    @param text: The option value
+    @param allowed: The allowed items, or None to allow any
+    @param numeric: True if the items must be positive integers
+    @return the list of items
+    """
+    items = [item for item in text.split(",") if item != ""]
+    for item in items:
+        if numeric and (not item.isnumeric() or int(item) < 2):
+            sys.exit("%s is not a grid size" % item)
+        if allowed is not None and item not in allowed:
+            sys.exit("Options are: " + " | ".join(allowed))
+    if not items:
+        sys.exit(USAGE)
+    return [int(item) for item in items] if numeric else items
+
+def parse_args():
+    """
+    Parses the command-line arguments.
+
+    @return a dict of settings
+    """
+    settings = {"kinds": list(GENERATORS), "sizes": [100, 1000], "search": ["BFS", "DFS", "A*"],
+                "queries": 10, "seed": 0, "timeout": 30.0, "compact": False,
+                "cache": os.path.join(tempfile.gettempdir(), "path_search_bench"),
+                "output": "benchmark.json", "compare": None, "tolerance": 0.25}
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == "--compact":
+            settings["compact"] = True
+            i += 1
+            continue
+        if i+1 == len(sys.argv):
+            sys.exit(USAGE)
+
+        value = sys.argv[i+1]
+        if sys.argv[i] == "--kinds":
+            settings["kinds"] = parse_list(value, list(GENERATORS))
+        elif sys.argv[i] == "--sizes":
+            settings["sizes"] = parse_list(value, numeric=True)
+        elif sys.argv[i] == "--search":
+            settings["search"] = parse_list(value, m.SEARCH_TYPES)
+        elif sys.argv[i] == "--queries":
+            if not value.isnumeric() or int(value) < 1:
+                sys.exit("--queries must be a positive integer")
+            settings["queries"] = int(value)
+        elif sys.argv[i] == "--seed":
+            if not value.isnumeric():
+                sys.exit("--seed must be a non-negative integer")
+            settings["seed"] = int(value)
+        elif sys.argv[i] == "--timeout":
+            if not value.replace('.', '', 1).isnumeric():
+                sys.exit("--timeout must be a number of seconds")
+            settings["timeout"] = float(value)
+        elif sys.argv[i] == "--tolerance":
+            if not value.replace('.', '', 1).isnumeric():
+                sys.exit("--tolerance must be a fraction such as 0.25")
+            settings["tolerance"] = float(value)
+        elif sys.argv[i] in ("--cache", "--output", "--compare"):
+            settings[sys.argv[i][2:]] = value
+        else:
+            sys.exit(USAGE)
+        i += 2
+
+    return settings
+
+def main():
+    """
+    Runs every (grid kind, size, search) case, prints a table as the cases finish,
+    saves the results and optionally compares them with a baseline.
+
+    @return 0 if there were no regressions, 1 otherwise
+    """
+    settings = parse_args()
+    baseline = None
+    if settings["compare"] is not None:
+        try:
+            with open(settings["compare"], 'r') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as err:
+            sys.exit("Cannot read baseline: %s" % err)
+    os.makedirs(settings["cache"], exist_ok=True)
+
+    results = {"generator_version": GENERATOR_VERSION,
+               "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "settings": {key: settings[key] for key in ("queries", "seed", "timeout", "compact")},
+               "cases": []}
+
+    print("%-7s %6s %-10s %8s %10s %10s %12s %10s" % ("kind", "size", "search", "status", "total s",
+                                                     "mean ms", "expansions", "peak MB"))
+    for kind in settings["kinds"]:
+        for size in settings["sizes"]:
+            filename, queries, density, gen_time = prepare_grid(kind, size, settings["seed"],
+                                                                settings["queries"], settings["cache"])
+            print("# %s %dx%d: %.1f%% obstacles, ready in %.2f s" % (kind, size, size, 100 * density, gen_time),
+                  file=sys.stderr)
+
+            for search_type in settings["search"]:
+                case = {"kind": kind, "size": size, "seed": settings["seed"], "search": search_type,
+                        "queries": len(queries), "compact": settings["compact"], "density": density}
+                case.update(run_isolated(filename, search_type, queries, settings["compact"], settings["timeout"]))
+                results["cases"].append(case)
+
+                if case["status"] == "ok":
+                    print("%-7s %6d %-10s %8s %10.3f %10.2f %12d %10s" % (
+                        kind, size, search_type, "ok", case["time_total"], 1000 * case["time_mean"],
+                        case["expansions"], "-" if case["peak_rss_kb"] is None else "%.1f" % (case["peak_rss_kb"] / 1024)))
+                else:
+                    print("%-7s %6d %-10s %8s" % (kind, size, search_type, case["status"]))
+                sys.stdout.flush()
+
+    with open(settings["output"], 'w') as file:
+        json.dump(results, file, indent=1)
+    print("Results saved to %s" % settings["output"])
+
+    if baseline is not None:
+        regressions = compare(results, baseline, settings["tolerance"])
+        for message in regressions:
+            print("REGRESSION " + message)
+        if regressions:
+            return 1
+        print("No regressions against %s" % settings["compare"])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Author: Caroline Rinks
+Labels the 4-connected components of free cells in a grid, so planners can reject a
+query whose start and goal lie in different components without searching.
+
+Labels are computed once and saved next to the grid as GRIDNAME.labels.npy (one uint32
+per cell, 0 for obstacles). When a grid is loaded, attach_labels() memory-maps the saved
+labels if they are newer than the grid file.
+
+Usage (compute and save the labels for a grid):
+
+    python3 components.py FILENAME
+"""
+
+import os
+import sys
+from array import array
+
+import grid_io
+
+def labels_filename(filename):
+    """
+    Returns the name of the labels file stored next to a grid file.
+
+    @param filename: The name of the grid file
+    @return the name of the labels file
+    """
+    return os.path.splitext(filename)[0] + ".labels.npy"
+
+def find(parent, r):
+    """
+    Returns the root of run r in the union-find forest, halving the path as it goes.
+
+    @param parent: The union-find parent array
+    @param r: A run id
+    @return the root run id
+    """
+    while parent[r] != r:
+        parent[r] = parent[parent[r]]
+        r = parent[r]
+    return r
+
+def label_components(grid):
+    """
+    Labels the 4-connected components of free cells. Each row is split into runs of
+    free cells with bytes.find, runs that touch a run in the row above are joined with
+    union-find, and each run's label is then written with a single slice assignment.
+
+    @param grid: The Grid object to label
+    @return a tuple (labels, count): a flat array('I') with the component label of each
+            cell (1 to count, 0 for obstacles) and the number of components
+    """
+    Nrows = grid.Nrows
+    Ncols = grid.Ncols
+    cells = grid.cells
+
+    run_start = array('I')
+    run_end = array('I')
+    parent = array('I')
+    prev_first = prev_last = 0
+
+    for i in range(0, Nrows):
+        offset = i * Ncols
+        row = bytes(cells[offset:offset + Ncols])
+        first = len(run_start)
+
+        j = row.find(b'\x00')
+        while j != -1:
+            end = row.find(b'\x01', j)
+            if end == -1:
+                end = Ncols
+            run_start.append(offset + j)
+            run_end.append(offset + end)
+            parent.append(len(parent))
+            j = row.find(b'\x00', end)
+        last = len(run_start)
+
+        # Join overlapping runs of this row and the row above (two-pointer sweep)
+        a = prev_first
+        b = first
+        while a < prev_last and b < last:
+            s1 = run_start[a] + Ncols
+            e1 = run_end[a] + Ncols
+            if s1 < run_end[b] and run_start[b] < e1:
+                r1 = find(parent, a)
+                r2 = find(parent, b)
+                if r1 != r2:
+                    parent[max(r1, r2)] = min(r1, r2)
+            if e1 <= run_end[b]:
+                a += 1
+            else:
+                b += 1
+
+        prev_first = first
+        prev_last = last
+
+    labels = array('I', [0]) * (Nrows * Ncols)
+    root_label = {}
+    for r in range(0, len(run_start)):
+        root = find(parent, r)
+        if root not in root_label:
+            root_label[root] = len(root_label) + 1
+        labels[run_start[r]:run_end[r]] = array('I', [root_label[root]]) * (run_end[r] - run_start[r])
+
+    return labels, len(root_label)
+
+def save_labels(labels, grid, filename):
+    """
+    Saves component labels next to a grid file.
+
+    @param labels: The flat labels array returned by label_components
+    @param grid: The labelled Grid object
+    @param filename: The name of the grid file
+    @return none
+    """
+    grid_io.write_npy(labels_filename(filename), labels, (grid.Nrows, grid.Ncols), '<u4')
+
+def attach_labels(grid, filename):
+    """
+    Memory-maps the labels saved next to a grid file and stores them in grid.labels.
+    Labels that are missing, older than the grid file, or of the wrong shape are ignored.
+
+    @param grid: The Grid object loaded from filename
+    @param filename: The name of the grid file
+    @return True if labels were attached, False otherwise
+    """
+    lfile = labels_filename(filename)
+    try:
+        if os.path.getmtime(lfile) < os.path.getmtime(filename):
+            return False
+        labels, shape, mm = grid_io.read_npy(lfile)
+    except (OSError, ValueError):
+        return False
+
+    if shape != (grid.Nrows, grid.Ncols) or labels.itemsize != 4:
+        return False
+    grid.labels = labels
+    grid.labels_mm = mm
+    return True
+
+def main():
+    """
+    Computes and saves the component labels of a grid file.
+
+    @return 0 at end of process
+    """
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python components.py FILENAME")
+
+    try:
+        grid = grid_io.load_grid(sys.argv[1])
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+    labels, count = label_components(grid)
+    save_labels(labels, grid, sys.argv[1])
+    print("Found %d components, saved to %s" % (count, labels_filename(sys.argv[1])))
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,668 @@
+"""
+Author: Caroline Rinks
+Implements the Grid class and the loaders for the two grid file formats used by the
+path planner: the comma-separated text format (.dat) and a binary .npy format that
+can be memory-mapped and searched without copying.
+
+Cells are 0 (free) or 1 (obstacle). A weighted grid also gives each free cell a cost of
+entering it: in the text format the digits 2 to 9 mark free cells with that cost ('0' is
+free with cost 1), and a weighted .npy grid holds a (2, Nrows, Ncols) array whose second
+plane is the costs.
+
+The .npy files follow NumPy's format (version 1.0) so they can also be opened with
+numpy.load(), but reading and writing them here only needs the standard library.
+
+Maps too large to keep in memory can be stored in the tiled format (.tiles): the grid is
+cut into square chunks that are read from the file only when a search reaches them, and
+kept in a size-bounded LRU cache (see TiledGrid). Searches on a tiled grid keep their
+per-cell state in a SparseTable, which only holds the cells the search has touched.
+
+Usage (convert between formats, chosen by file extension; --chunk sets the chunk side of
+a .tiles output, 256 by default):
+
+    python3 grid_io.py INPUT OUTPUT [--chunk N]
+"""
+
+import ast
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+NPY_MAGIC = b'\x93NUMPY'
+
+# Maps the NumPy dtype descriptors we read and write to array/memoryview typecodes
+NPY_TYPECODES = {'|u1': 'B', '|b1': 'B', '|i1': 'b', '<u2': 'H', '<u4': 'I', '<i4': 'i'}
+
+# Translates the characters '0' to '9' into the cell values 0 (free) and 1 (obstacle)
+TEXT_TO_CELL = bytes.maketrans(b'0123456789', b'\x00\x01' + b'\x00' * 8)
+CELL_TO_TEXT = bytes.maketrans(b'\x00\x01', b'01')
+
+# Translates the characters '0' to '9' into the cost of entering the cell, and back
+TEXT_TO_COST = bytes.maketrans(b'0123456789', bytes([1, 1, 2, 3, 4, 5, 6, 7, 8, 9]))
+COST_TO_TEXT = bytes.maketrans(bytes(range(1, 10)), b'023456789')
+WEIGHTED_DIGITS = b'23456789'
+
+# Tiled files start with this magic string and a (Nrows, Ncols, chunk side) header, padded
+# so the chunks start on a 64-byte boundary
+TILES_MAGIC = b'PSTILES\x01'
+TILES_HEADER = struct.Struct('<8sIII')
+TILES_OFFSET = 64
+
+# The default chunk side and chunk cache budget of tiled grids
+TILE_SIZE = 256
+TILE_CACHE_BYTES = 64 * 2**20
+
+class Grid(object):
+    def __init__(self, Nrows, Ncols, cells, mm=None, costs=None):
+        """
+        The Constructor for the Grid class.
+
+        @param self: The Grid object
+        @param Nrows: The number of rows in the grid environment
+        @param Ncols: The number of columns in the grid environment
+        @param cells: A flat bytes-like object of 0 (free) and 1 (obstacle) values
+                      indexed by row*Ncols+col
+        @param mm: The mmap backing cells, if the grid was memory-mapped
+        @param costs: A flat bytes-like object holding the cost (1 to 9) of entering
+                      each cell, or None if every cell costs 1
+        @return none
+        """
+        self.Nrows = Nrows
+        self.Ncols = Ncols
+        self.cells = cells
+        self.mm = mm
+        self.costs = costs
+
+        # Connected-component labels per cell, attached by components.attach_labels
+        self.labels = None
+        self.labels_mm = None
+
+        # Abstract graph for hierarchical search, attached by hpa.attach_graph
+        self.hpa = None
+
+        # Landmark distance tables for the ALT heuristic, attached by landmarks.attach_landmarks
+        self.landmarks = None
+
+        # Bumped on every edit so cached search results can tell the grid changed
+        self.version = 0
+
+    def __len__(self):
+        """
+        Returns the number of rows, so a Grid can be used like a 2D array.
+
+        @param self: The Grid object
+        @return the number of rows in the grid
+        """
+        return self.Nrows
+
+    def __getitem__(self, i):
+        """
+        Returns row i as a zero-copy view, so grid[i][j] works like a 2D array.
+
+        @param self: The Grid object
+        @param i: The row index
+        @return a memoryview of the row's cells
+        """
+        if i < 0 or i >= self.Nrows:
+            raise IndexError("grid row out of range")
+        return memoryview(self.cells)[i*self.Ncols:(i+1)*self.Ncols]
+
+    def set_cell(self, x, y, value):
+        """
+        Sets one cell to free (0) or obstacle (1). Component labels, the abstract
+        graph and the landmark tables no longer match the grid afterwards, so they
+        are dropped.
+
+        @param self: The Grid object
+        @param x: The cell's row
+        @param y: The cell's column
+        @param value: 0 for a free cell, 1 for an obstacle
+        @return none
+        """
+        self.cells[x * self.Ncols + y] = value
+        self.labels = None
+        self.hpa = None
+        self.landmarks = None
+        self.version += 1
+
+    def close(self):
+        """
+        Releases the memory maps backing the grid, its labels and its landmark tables,
+        if there are any.
+
+        @param self: The Grid object
+        @return none
+        """
+        if self.mm is not None:
+            self.cells = bytes(self.cells)
+            if self.costs is not None:
+                self.costs = bytes(self.costs)
+            self.mm.close()
+            self.mm = None
+        if self.labels_mm is not None:
+            self.labels = None
+            self.labels_mm.close()
+            self.labels_mm = None
+        if self.landmarks is not None:
+            self.landmarks.close()
+            self.landmarks = None
+
+class ChunkedCells(object):
+    def __init__(self, file, Nrows, Ncols, chunk, cache_bytes=TILE_CACHE_BYTES):
+        """
+        The Constructor for the ChunkedCells class: a read-only flat sequence of cells,
+        indexed by row*Ncols+col like a Grid's cells, that reads the chunks of a tiled
+        file on demand. At most cache_bytes of chunks are kept, least recently used first
+        out; the chunk used last is checked before the cache, since neighbouring cells
+        almost always share it.
+
+        @param self: The ChunkedCells object
+        @param file: The open tiled file
+        @param Nrows: The number of rows in the grid
+        @param Ncols: The number of columns in the grid
+        @param chunk: The side length of a chunk, in cells
+        @param cache_bytes: The memory budget of the chunk cache
+        @return none
+        """
+        self.file = file
+        self.Nrows = Nrows
+        self.Ncols = Ncols
+        self.chunk = chunk
+        self.chunk_cols = (Ncols + chunk - 1) // chunk
+        self.capacity = max(1, cache_bytes // (chunk * chunk))
+
+        self.cache = OrderedDict()
+        self.last_key = -1
+        self.last_chunk = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """
+        Returns the number of cells.
+
+        @param self: The ChunkedCells object
+        @return Nrows*Ncols
+        """
+        return self.Nrows * self.Ncols
+
+    def load_chunk(self, key):
+        """
+        Returns a chunk from the cache, reading it from the file on a miss.
+
+        @param self: The ChunkedCells object
+        @param key: The chunk's index, chunk_row*chunk_cols+chunk_col
+        @return the chunk's chunk*chunk cells as bytes
+        """
+        data = self.cache.get(key)
+        if data is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+        else:
+            self.misses += 1
+            size = self.chunk * self.chunk
+            data = os.pread(self.file.fileno(), size, TILES_OFFSET + key * size)
+            if len(data) != size:
+                raise ValueError("%s is truncated" % self.file.name)
+            self.cache[key] = data
+            if len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        self.last_key = key
+        self.last_chunk = data
+        return data
+
+    def __getitem__(self, idx):
+        """
+        Returns one cell, or a bytes object for a slice of cells.
+
+        @param self: The ChunkedCells object
+        @param idx: A flat cell index or a slice
+        @return the cell's value, or the cells in the slice
+        """
+        if isinstance(idx, slice):
+            return self.read_slice(idx)
+        if idx < 0:
+            idx += self.Nrows * self.Ncols
+        if idx < 0 or idx >= self.Nrows * self.Ncols:
+            raise IndexError("cell index out of range")
+
+        chunk = self.chunk
+        i, j = divmod(idx, self.Ncols)
+        key = (i // chunk) * self.chunk_cols + j // chunk
+        if key == self.last_key:
+            self.hits += 1
+            return self.last_chunk[(i % chunk) * chunk + j % chunk]
+        return self.load_chunk(key)[(i % chunk) * chunk + j % chunk]
+
+    def read_slice(self, idx):
+        """
+        Reads a slice of cells, one run within a chunk at a time.
+
+        @param self: The ChunkedCells object
+        @param idx: A slice of flat cell indices
+        @return the cells in the slice as bytes
+        """
+        start, stop, step = idx.indices(self.Nrows * self.Ncols)
+        if step != 1:
+            return bytes(self[k] for k in range(start, stop, step))
+
+        chunk = self.chunk
+        out = bytearray()
+        while start < stop:
+            i, j = divmod(start, self.Ncols)
+            run = min(stop - start, chunk - j % chunk, self.Ncols - j)
+            offset = (i % chunk) * chunk + j % chunk
+            out += self.load_chunk((i // chunk) * self.chunk_cols + j // chunk)[offset:offset + run]
+            start += run
+        return bytes(out)
+
+class TiledRow(object):
+    def __init__(self, cells, offset):
+        """
+        The Constructor for the TiledRow class: one row of a TiledGrid, so grid[i][j]
+        reads a single cell instead of the whole row.
+
+        @param self: The TiledRow object
+        @param cells: The grid's ChunkedCells
+        @param offset: The flat index of the row's first cell
+        @return none
+        """
+        self.cells = cells
+        self.offset = offset
+
+    def __len__(self):
+        """
+        Returns the number of cells in the row.
+
+        @param self: The TiledRow object
+        @return the number of columns in the grid
+        """
+        return self.cells.Ncols
+
+    def __getitem__(self, j):
+        """
+        Returns one cell of the row.
+
+        @param self: The TiledRow object
+        @param j: The column index
+        @return the cell's value
+        """
+        if j < 0 or j >= self.cells.Ncols:
+            raise IndexError("grid column out of range")
+        return self.cells[self.offset + j]
+
+class TiledGrid(Grid):
+    def __init__(self, filename, cache_bytes=TILE_CACHE_BYTES):
+        """
+        The Constructor for the TiledGrid class: a read-only Grid whose cells stay in a
+        tiled file and are read one chunk at a time as the planners reach them, so only
+        the chunk cache has to fit in memory.
+
+        @param self: The TiledGrid object
+        @param filename: The name of the .tiles file
+        @param cache_bytes: The memory budget of the chunk cache
+        @return none
+        """
+        file = open(filename, 'rb')
+        magic, Nrows, Ncols, chunk = TILES_HEADER.unpack(file.read(TILES_HEADER.size).ljust(TILES_HEADER.size, b'\0'))
+        if magic != TILES_MAGIC or chunk == 0:
+            file.close()
+            raise ValueError("%s is not a tiled grid" % filename)
+        Grid.__init__(self, Nrows, Ncols, ChunkedCells(file, Nrows, Ncols, chunk, cache_bytes))
+
+    def __getitem__(self, i):
+        """
+        Returns row i, so grid[i][j] works like a 2D array.
+
+        @param self: The TiledGrid object
+        @param i: The row index
+        @return a TiledRow object
+        """
+        if i < 0 or i >= self.Nrows:
+            raise IndexError("grid row out of range")
+        return TiledRow(self.cells, i * self.Ncols)
+
+    def set_cell(self, x, y, value):
+        """
+        Tiled grids are read-only; convert the grid to .npy to edit it.
+
+        @param self: The TiledGrid object
+        @param x: The cell's row
+        @param y: The cell's column
+        @param value: 0 for a free cell, 1 for an obstacle
+        @return none
+        """
+        raise ValueError("%s is a read-only tiled grid" % self.cells.file.name)
+
+    def cache_stats(self):
+        """
+        Returns how well the chunk cache has served the searches so far.
+
+        @param self: The TiledGrid object
+        @return a dict with the cache's hits, misses, hit_rate, evictions, and the
+                chunks and bytes it holds
+        """
+        cells = self.cells
+        lookups = cells.hits + cells.misses
+        return {"hits": cells.hits, "misses": cells.misses,
+                "hit_rate": cells.hits / lookups if lookups else None,
+                "evictions": cells.evictions, "chunks": len(cells.cache),
+                "bytes": len(cells.cache) * cells.chunk * cells.chunk}
+
+    def close(self):
+        """
+        Closes the tiled file and empties the chunk cache, along with any memory maps
+        backing the grid's labels and landmark tables.
+
+        @param self: The TiledGrid object
+        @return none
+        """
+        self.cells.cache.clear()
+        self.cells.last_chunk = None
+        self.cells.file.close()
+        Grid.close(self)
+
+class SparseTable(dict):
+    def __init__(self, fill):
+        """
+        The Constructor for the SparseTable class: per-cell search state (flags, g(x)
+        values, parent links) indexed by row*Ncols+col like a flat array, but holding
+        only the cells that were written. Reading any other cell gives fill. Searches
+        on a TiledGrid use it, so their memory grows with the cells they reach rather
+        than with the size of the map.
+
+        @param self: The SparseTable object
+        @param fill: The value of cells that were never written
+        @return none
+        """
+        dict.__init__(self)
+        self.fill = fill
+
+    def __missing__(self, idx):
+        """
+        Returns the value of a cell that was never written.
+
+        @param self: The SparseTable object
+        @param idx: The cell index
+        @return fill
+        """
+        return self.fill
+
+def state_table(cells, fill=0, typecode='B'):
+    """
+    Creates a table of per-cell search state for a flat grid: a flat array of
+    len(cells) entries set to fill, or a SparseTable when the cells are read from a
+    tiled file and a dense table could be larger than memory.
+
+    @param cells: The flat grid the search runs on
+    @param fill: The starting value of every cell
+    @param typecode: The array typecode of the values; 'B' with fill 0 gives a bytearray
+    @return a bytearray, an array or a SparseTable
+    """
+    if isinstance(cells, ChunkedCells):
+        return SparseTable(fill)
+    if typecode == 'B' and fill == 0:
+        return bytearray(len(cells))
+    return array(typecode, [fill]) * len(cells)
+
+def state_bytes(table):
+    """
+    Estimates the memory a table returned by state_table takes.
+
+    @param table: A bytearray, array or SparseTable
+    @return the size in bytes
+    """
+    if isinstance(table, SparseTable):
+        # The dict's hash table plus an int object for each stored value
+        return sys.getsizeof(table) + 28 * len(table)
+    if isinstance(table, array):
+        return table.itemsize * len(table)
+    return len(table)
+
+def save_tiled(grid, filename, chunk=TILE_SIZE):
+    """
+    Writes a grid in the tiled format. The grid is read one band of chunk rows at a time,
+    so a memory-mapped grid is converted without loading it whole. Chunks that overhang
+    the edge of the grid are padded with obstacles.
+
+    @param grid: The Grid object to write
+    @param filename: The name of the .tiles file
+    @param chunk: The side length of a chunk, in cells
+    @return none
+    """
+    if grid.costs is not None:
+        raise ValueError("Tiled grids do not store terrain costs")
+    Nrows = grid.Nrows
+    Ncols = grid.Ncols
+    wall = b'\x01' * chunk
+
+    with open(filename, 'wb') as file:
+        file.write(TILES_HEADER.pack(TILES_MAGIC, Nrows, Ncols, chunk).ljust(TILES_OFFSET, b'\0'))
+        for top in range(0, Nrows, chunk):
+            band = [bytes(grid.cells[i * Ncols:(i + 1) * Ncols]) for i in range(top, min(top + chunk, Nrows))]
+            for left in range(0, Ncols, chunk):
+                data = bytearray()
+                for row in band:
+                    data += row[left:left + chunk].ljust(chunk, b'\x01')
+                data += wall * (chunk - len(band))
+                file.write(data)
+
+def load_text(filename):
+    """
+    Reads a grid in the comma-separated text format. The whole file is parsed with
+    bytes-level operations (translate, split, join) instead of one character at a time.
+
+    @param filename: The name of the .dat file
+    @return a Grid object
+    """
+    with open(filename, 'rb') as file:
+        data = file.read()
+
+    lines = data.translate(None, b',\r').split(b'\n')
+    while lines and lines[-1] == b'':
+        lines.pop()
+
+    if not lines:
+        raise ValueError("File contains no grid")
+    Ncols = len(lines[0])
+    for line in lines:
+        if line.translate(None, b'0123456789') != b'':
+            raise ValueError("File contains invalid character")
+        if len(line) != Ncols:
+            raise ValueError("File rows have different lengths")
+
+    text = b''.join(lines)
+    cells = bytearray(text.translate(TEXT_TO_CELL))
+    costs = None
+    if text.translate(None, WEIGHTED_DIGITS) != text:
+        costs = bytearray(text.translate(TEXT_TO_COST))
+    return Grid(len(lines), Ncols, cells, costs=costs)
+
+def save_text(grid, filename):
+    """
+    Writes a grid in the comma-separated text format.
+
+    @param grid: The Grid object to write
+    @param filename: The name of the .dat file
+    @return none
+    """
+    text = bytes(grid.cells).translate(CELL_TO_TEXT)
+    if grid.costs is not None:
+        # Free cells are written as their cost digit, obstacles stay '1'
+        digits = bytes(grid.costs).translate(COST_TO_TEXT)
+        text = bytes(d if t == 48 else t for t, d in zip(text, digits))
+    # Each row is written by filling the even positions of a comma-separated line
+    line = bytearray(b',' * (2*grid.Ncols - 1))
+
+    with open(filename, 'wb') as file:
+        for i in range(0, grid.Nrows):
+            if i != 0:
+                file.write(b'\n')
+            line[0::2] = text[i*grid.Ncols:(i+1)*grid.Ncols]
+            file.write(line)
+
+def write_npy(filename, data, shape, descr='|u1'):
+    """
+    Writes a flat buffer to a .npy file as a C-ordered array with the given shape.
+
+    @param filename: The name of the .npy file
+    @param data: A bytes-like object or array holding the values, or the ChunkedCells of
+                 a tiled grid, which are copied one band of chunks at a time
+    @param shape: A tuple with the dimensions of the array
+    @param descr: The NumPy dtype descriptor of the values
+    @return none
+    """
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (descr, tuple(shape))
+    # The header is padded so the data starts on a 64-byte boundary
+    pad = 64 - (len(NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = (header + ' ' * (pad % 64) + '\n').encode('latin1')
+
+    with open(filename, 'wb') as file:
+        file.write(NPY_MAGIC + b'\x01\x00' + len(header).to_bytes(2, 'little'))
+        file.write(header)
+        if isinstance(data, ChunkedCells):
+            band = data.chunk * data.Ncols
+            for start in range(0, len(data), band):
+                file.write(data[start:start + band])
+        else:
+            file.write(memoryview(data).cast('B'))
+
+def read_npy(filename, use_mmap=True):
+    """
+    Reads a .npy file written by write_npy (or NumPy). With use_mmap, the file is
+    memory-mapped read-only and the returned view points straight into the map.
+
+    @param filename: The name of the .npy file
+    @param use_mmap: If True, memory-map the file instead of reading it into memory
+    @return a tuple (values, shape, mm) where values is a flat memoryview or array,
+            shape is the array's dimensions and mm is the mmap (or None)
+    """
+    with open(filename, 'rb') as file:
+        prefix = file.read(10)
+        if prefix[:6] != NPY_MAGIC:
+            raise ValueError("%s is not a .npy file" % filename)
+        if prefix[6] == 1:
+            header_len = int.from_bytes(prefix[8:10], 'little')
+            offset = 10 + header_len
+        else:
+            header_len = int.from_bytes(prefix[8:10] + file.read(2), 'little')
+            offset = 12 + header_len
+        header = ast.literal_eval(file.read(header_len).decode('latin1'))
+
+        if header['fortran_order'] or header['descr'] not in NPY_TYPECODES:
+            raise ValueError("Unsupported .npy layout: %s" % header)
+        typecode = NPY_TYPECODES[header['descr']]
+        shape = tuple(header['shape'])
+        count = 1
+        for n in shape:
+            count *= n
+
+        if use_mmap and count != 0:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            values = memoryview(mm)[offset:].cast('B')
+            values = values[:count * array(typecode).itemsize].cast(typecode)
+            return values, shape, mm
+
+        file.seek(offset)
+        values = array(typecode)
+        values.frombytes(file.read(count * values.itemsize))
+        return values, shape, None
+
+def save_npy(grid, filename):
+    """
+    Writes a grid as a 2D uint8 .npy file, or a weighted grid as a (2, Nrows, Ncols)
+    uint8 .npy file holding the cells and then the costs.
+
+    @param grid: The Grid object to write
+    @param filename: The name of the .npy file
+    @return none
+    """
+    if grid.costs is None:
+        write_npy(filename, grid.cells, (grid.Nrows, grid.Ncols))
+    else:
+        write_npy(filename, bytes(grid.cells) + bytes(grid.costs), (2, grid.Nrows, grid.Ncols))
+
+def load_npy(filename, use_mmap=True):
+    """
+    Reads a grid stored as a 2D uint8 .npy file (or a weighted grid stored as a
+    (2, Nrows, Ncols) one). By default the file is memory-mapped, so the planners read
+    cells and costs directly from the page cache without a copy.
+
+    @param filename: The name of the .npy file
+    @param use_mmap: If True, memory-map the file instead of reading it into memory
+    @return a Grid object
+    """
+    values, shape, mm = read_npy(filename, use_mmap)
+    if values.itemsize != 1:
+        raise ValueError("%s does not hold a uint8 grid" % filename)
+    if len(shape) == 2:
+        return Grid(shape[0], shape[1], values, mm)
+    if len(shape) == 3 and shape[0] == 2:
+        size = shape[1] * shape[2]
+        return Grid(shape[1], shape[2], values[:size], mm, costs=values[size:])
+    raise ValueError("%s does not hold a 2D uint8 grid" % filename)
+
+def load_grid(filename, use_mmap=True):
+    """
+    Reads a grid in any of the formats, chosen by the file extension.
+
+    @param filename: The name of a .npy, .tiles or comma-separated text grid file
+    @param use_mmap: If True, memory-map .npy files
+    @return a Grid object (a TiledGrid for .tiles files)
+    """
+    if filename.endswith('.tiles'):
+        return TiledGrid(filename)
+    if filename.endswith('.npy'):
+        return load_npy(filename, use_mmap)
+    return load_text(filename)
+
+def save_grid(grid, filename):
+    """
+    Writes a grid in any of the formats, chosen by the file extension.
+
+    @param grid: The Grid object to write
+    @param filename: The name of a .npy, .tiles or comma-separated text grid file
+    @return none
+    """
+    if filename.endswith('.tiles'):
+        save_tiled(grid, filename)
+    elif filename.endswith('.npy'):
+        save_npy(grid, filename)
+    else:
+        save_text(grid, filename)
+
+def main():
+    """
+    Converts a grid file between the text, .npy and tiled formats.
+
+    @return 0 at end of process
+    """
+    usage = "Usage: python grid_io.py INPUT OUTPUT [--chunk N]"
+    chunk = TILE_SIZE
+    if len(sys.argv) == 5 and sys.argv[3] == "--chunk" and sys.argv[4].isnumeric() and int(sys.argv[4]) > 0:
+        chunk = int(sys.argv[4])
+    elif len(sys.argv) != 3:
+        sys.exit(usage)
+
+    try:
+        # A .npy grid is memory-mapped when tiling it, so maps larger than memory convert
+        grid = load_grid(sys.argv[1], use_mmap=sys.argv[2].endswith('.tiles'))
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    try:
+        if sys.argv[2].endswith('.tiles'):
+            save_tiled(grid, sys.argv[2], chunk)
+        else:
+            save_grid(grid, sys.argv[2])
+    except ValueError as err:
+        sys.exit(str(err))
+    print("Converted %s (%d x %d) to %s" % (sys.argv[1], grid.Nrows, grid.Ncols, sys.argv[2]))
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+"""
+Author: Caroline Rinks
+Implements hierarchical path finding (HPA*). The grid is split into square clusters;
+entrances between neighbouring clusters become the nodes of a small abstract graph,
+joined by the shortest distances between entrances inside each cluster. A query is
+answered with A* on the abstract graph and the result is refined into a full path
+with searches that never leave a single cluster, so query time depends on the path
+length and cluster size rather than on the size of the map.
+
+HPA* paths are close to, but not always exactly, the shortest path.
+
+The abstract graph is saved next to the grid as GRIDNAME.hpa. When a grid is loaded,
+attach_graph() reads the saved graph if it is newer than the grid file.
+
+Usage (build the abstract graph for a grid and report the preprocessing cost):
+
+    python3 hpa.py FILENAME [--cluster SIZE]
+"""
+
+import heapq
+import json
+import os
+import sys
+import time
+from array import array
+from collections import deque
+
+import grid_io
+
+HPA_MAGIC = b'HPA1'
+
+# Border runs shorter than this get one entrance in the middle, longer runs get two
+ENTRANCE_SPLIT = 6
+
+def graph_filename(filename):
+    """
+    Returns the name of the abstract graph file stored next to a grid file.
+
+    @param filename: The name of the grid file
+    @return the name of the abstract graph file
+    """
+    return os.path.splitext(filename)[0] + ".hpa"
+
+class ClusterGraph(object):
+    def __init__(self, Nrows, Ncols, cluster, node_cell, edge_start, edge_to, edge_cost):
+        """
+        The Constructor for the ClusterGraph class. The abstract graph's edges are
+        stored in compressed sparse row form: the edges of node n are
+        edge_to[edge_start[n]:edge_start[n+1]] with matching costs in edge_cost.
+
+        @param self: The ClusterGraph object
+        @param Nrows: The number of rows in the grid
+        @param Ncols: The number of columns in the grid
+        @param cluster: The side length of a cluster, in cells
+        @param node_cell: The grid cell index of each abstract node
+        @param edge_start: The offset of each node's first edge (one extra at the end)
+        @param edge_to: The node at the other end of each edge
+        @param edge_cost: The length of each edge, in moves
+        @return none
+        """
+        self.Nrows = Nrows
+        self.Ncols = Ncols
+        self.cluster = cluster
+        self.node_cell = node_cell
+        self.edge_start = edge_start
+        self.edge_to = edge_to
+        self.edge_cost = edge_cost
+
+        self.build_time = 0.0
+        self.node_of = {}
+        self.cluster_nodes = {}
+        for n in range(0, len(node_cell)):
+            self.node_of[node_cell[n]] = n
+            self.cluster_nodes.setdefault(self.cluster_of(node_cell[n]), []).append(n)
+
+    def cluster_of(self, idx):
+        """
+        Returns the (cluster row, cluster column) that a cell belongs to.
+
+        @param self: The ClusterGraph object
+        @param idx: The cell index
+        @return a tuple identifying the cluster
+        """
+        r, c = divmod(idx, self.Ncols)
+        return (r // self.cluster, c // self.cluster)
+
+    def cluster_bfs(self, cells, source, target=None):
+        """
+        Runs a BFS from source that never leaves source's cluster.
+
+        @param self: The ClusterGraph object
+        @param cells: The flat grid
+        @param source: The cell index to search from
+        @param target: If given, a cell index to stop at
+        @return a tuple (dist, parent) of dicts keyed by cell index
+        """
+        Ncols = self.Ncols
+        K = self.cluster
+        cr, cc = self.cluster_of(source)
+        r0 = cr * K
+        c0 = cc * K
+        r1 = min(r0 + K, self.Nrows)
+        c1 = min(c0 + K, Ncols)
+
+        dist = {source: 0}
+        parent = {source: -1}
+        queue = deque([source])
+        while queue:
+            idx = queue.popleft()
+            if idx == target:
+                break
+            r, c = divmod(idx, Ncols)
+            d = dist[idx] + 1
+            for child, ok in ((idx + Ncols, r + 1 < r1), (idx + 1, c + 1 < c1),
+                              (idx - Ncols, r - 1 >= r0), (idx - 1, c - 1 >= c0)):
+                if ok and cells[child] == 0 and child not in dist:
+                    dist[child] = d
+                    parent[child] = idx
+                    queue.append(child)
+        return dist, parent
+
+    @classmethod
+    def build(cls, grid, cluster=32):
+        """
+        Builds the abstract graph of a grid: finds the entrances on every border
+        between two clusters and the shortest in-cluster distance between every pair
+        of entrances that share a cluster.
+
+        @param cls: The ClusterGraph class
+        @param grid: The Grid object to preprocess
+        @param cluster: The side length of a cluster, in cells
+        @return a ClusterGraph object, with build_time set to the seconds spent
+        """
+        begin = time.perf_counter()
+        Nrows = grid.Nrows
+        Ncols = grid.Ncols
+        cells = grid.cells
+
+        node_of = {}
+        node_cell = array('I')
+        edges = []
+
+        def add_node(idx):
+            if idx not in node_of:
+                node_of[idx] = len(node_cell)
+                node_cell.append(idx)
+                edges.append({})
+            return node_of[idx]
+
+        def add_entrance(a, b):
+            na = add_node(a)
+            nb = add_node(b)
+            edges[na][nb] = 1
+            edges[nb][na] = 1
+
+        def scan_border(pairs):
+            # pairs holds the (inside, outside) cells along one border, in order
+            run = []
+            for a, b in pairs + [(None, None)]:
+                if a is not None and cells[a] == 0 and cells[b] == 0:
+                    run.append((a, b))
+                    continue
+                if len(run) >= ENTRANCE_SPLIT:
+                    add_entrance(*run[0])
+                    add_entrance(*run[-1])
+                elif run:
+                    add_entrance(*run[len(run) // 2])
+                run = []
+
+        # Borders between vertically adjacent clusters, then horizontally adjacent ones
+        for r in range(cluster, Nrows, cluster):
+            for c0 in range(0, Ncols, cluster):
+                scan_border([((r - 1) * Ncols + c, r * Ncols + c) for c in range(c0, min(c0 + cluster, Ncols))])
+        for c in range(cluster, Ncols, cluster):
+            for r0 in range(0, Nrows, cluster):
+                scan_border([(r * Ncols + c - 1, r * Ncols + c) for r in range(r0, min(r0 + cluster, Nrows))])
+
+        graph = cls(Nrows, Ncols, cluster, node_cell, array('I'), array('I'), array('I'))
+
+        # Intra-cluster edges: one in-cluster BFS per entrance node
+        for nodes in graph.cluster_nodes.values():
+            for n in nodes:
+                dist = graph.cluster_bfs(cells, node_cell[n])[0]
+                for m in nodes:
+                    if m != n and node_cell[m] in dist:
+                        d = dist[node_cell[m]]
+                        if d < edges[n].get(m, d + 1):
+                            edges[n][m] = d
+
+        for n in range(0, len(node_cell)):
+            graph.edge_start.append(len(graph.edge_to))
+            for m in sorted(edges[n]):
+                graph.edge_to.append(m)
+                graph.edge_cost.append(edges[n][m])
+        graph.edge_start.append(len(graph.edge_to))
+
+        graph.build_time = time.perf_counter() - begin
+        return graph
+
+    def save(self, filename):
+        """
+        Writes the abstract graph to a file: a magic number, a JSON header with the
+        sizes, and then the raw node and edge arrays.
+
+        @param self: The ClusterGraph object
+        @param filename: The name of the .hpa file
+        @return none
+        """
+        header = json.dumps({"Nrows": self.Nrows, "Ncols": self.Ncols, "cluster": self.cluster,
+                             "nodes": len(self.node_cell), "edges": len(self.edge_to)}).encode()
+        with open(filename, 'wb') as file:
+            file.write(HPA_MAGIC + len(header).to_bytes(4, 'little') + header)
+            for values in (self.node_cell, self.edge_start, self.edge_to, self.edge_cost):
+                file.write(values.tobytes())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Reads an abstract graph written by save().
+
+        @param cls: The ClusterGraph class
+        @param filename: The name of the .hpa file
+        @return a ClusterGraph object
+        """
+        with open(filename, 'rb') as file:
+            if file.read(4) != HPA_MAGIC:
+                raise ValueError("%s is not an HPA graph file" % filename)
+            header = json.loads(file.read(int.from_bytes(file.read(4), 'little')))
+
+            values = []
+            for count in (header["nodes"], header["nodes"] + 1, header["edges"], header["edges"]):
+                a = array('I')
+                a.frombytes(file.read(count * a.itemsize))
+                if len(a) != count:
+                    raise ValueError("%s is truncated" % filename)
+                values.append(a)
+
+        return cls(header["Nrows"], header["Ncols"], header["cluster"], *values)
+
+    def find_path(self, cells, start_idx, goal_idx):
+        """
+        Finds a path from start to goal: the start and goal are joined to the
+        entrances of their clusters, A* runs on the abstract graph, and every abstract
+        edge on the result is refined into cells with an in-cluster BFS.
+
+        @param self: The ClusterGraph object
+        @param cells: The flat grid the graph was built from
+        @param start_idx: The index of the start cell
+        @param goal_idx: The index of the goal cell
+        @return a tuple (path, expansions): the list of cell indices from start to
+                goal (None if there is no path) and the number of abstract nodes expanded
+        """
+        Ncols = self.Ncols
+        START = len(self.node_cell)
+        GOAL = START + 1
+        gx, gy = divmod(goal_idx, Ncols)
+
+        # Temporary edges from the start to its cluster's entrances, and from the goal's
+        # cluster entrances to the goal (the grid is undirected, so one BFS each suffices)
+        start_dist = self.cluster_bfs(cells, start_idx)[0]
+        goal_dist = self.cluster_bfs(cells, goal_idx)[0]
+        start_edges = [(n, start_dist[self.node_cell[n]])
+                       for n in self.cluster_nodes.get(self.cluster_of(start_idx), [])
+                       if self.node_cell[n] in start_dist]
+        to_goal = {}
+        for n in self.cluster_nodes.get(self.cluster_of(goal_idx), []):
+            if self.node_cell[n] in goal_dist:
+                to_goal[n] = goal_dist[self.node_cell[n]]
+        if goal_idx in start_dist:
+            start_edges.append((GOAL, start_dist[goal_idx]))
+
+        def cell_of(n):
+            return start_idx if n == START else goal_idx if n == GOAL else self.node_cell[n]
+
+        g_val = {START: 0}
+        parent = {START: -1}
+        closed = set()
+        pushed = 0
+        sx, sy = divmod(start_idx, Ncols)
+        open = [(abs(gx - sx) + abs(gy - sy), pushed, START)]
+        expansions = 0
+
+        while open:
+            n = heapq.heappop(open)[2]
+            if n in closed:
+                continue
+            if n == GOAL:
+                break
+            closed.add(n)
+            expansions += 1
+
+            if n == START:
+                neighbours = start_edges
+            else:
+                neighbours = [(self.edge_to[e], self.edge_cost[e])
+                              for e in range(self.edge_start[n], self.edge_start[n + 1])]
+                if n in to_goal:
+                    neighbours.append((GOAL, to_goal[n]))
+
+            for m, cost in neighbours:
+                g = g_val[n] + cost
+                if m in closed or g >= g_val.get(m, g + 1):
+                    continue
+                g_val[m] = g
+                parent[m] = n
+                x1, y1 = divmod(cell_of(m), Ncols)
+                pushed += 1
+                heapq.heappush(open, (g + abs(gx - x1) + abs(gy - y1), pushed, m))
+
+        if GOAL not in parent:
+            return None, expansions
+
+        abstract = [GOAL]
+        while abstract[-1] != START:
+            abstract.append(parent[abstract[-1]])
+        abstract.reverse()
+
+        # Refine each abstract edge: entrance pairs are neighbours, anything else lies
+        # inside one cluster
+        path = [start_idx]
+        for n in abstract[1:]:
+            a = path[-1]
+            b = cell_of(n)
+            if a == b:
+                continue
+            if self.cluster_of(a) != self.cluster_of(b):
+                path.append(b)
+                continue
+            walk = [b]
+            local_parent = self.cluster_bfs(cells, a, b)[1]
+            while walk[-1] != a:
+                walk.append(local_parent[walk[-1]])
+            path.extend(reversed(walk[:-1]))
+
+        return path, expansions
+
+def attach_graph(grid, filename):
+    """
+    Reads the abstract graph saved next to a grid file and stores it in grid.hpa.
+    Graphs that are missing, older than the grid file, or built for another grid
+    size are ignored.
+
+    @param grid: The Grid object loaded from filename
+    @param filename: The name of the grid file
+    @return True if a graph was attached, False otherwise
+    """
+    gfile = graph_filename(filename)
+    try:
+        if os.path.getmtime(gfile) < os.path.getmtime(filename):
+            return False
+        graph = ClusterGraph.load(gfile)
+    except (OSError, ValueError, KeyError):
+        return False
+
+    if graph.Nrows != grid.Nrows or graph.Ncols != grid.Ncols:
+        return False
+    grid.hpa = graph
+    return True
+
+def main():
+    """
+    Builds and saves the abstract graph of a grid file and reports its cost.
+
+    @return 0 at end of process
+    """
+    if len(sys.argv) == 4 and sys.argv[2] == "--cluster" and sys.argv[3].isnumeric() and int(sys.argv[3]) > 0:
+        cluster = int(sys.argv[3])
+    elif len(sys.argv) == 2:
+        cluster = 32
+    else:
+        sys.exit("Usage: python hpa.py FILENAME [--cluster SIZE]")
+
+    try:
+        grid = grid_io.load_grid(sys.argv[1])
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+    graph = ClusterGraph.build(grid, cluster)
+    graph.save(graph_filename(sys.argv[1]))
+    print("Clusters: %d x %d cells" % (cluster, cluster))
+    print("Abstract graph: %d nodes, %d edges" % (len(graph.node_cell), len(graph.edge_to)))
+    print("Preprocessing time: %.3f s" % graph.build_time)
+    print("Saved to %s" % graph_filename(sys.argv[1]))
+    return 0
+
+if __name__ == '__main__':
+    main()
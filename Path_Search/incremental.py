@@ -0,0 +1,333 @@
+"""
+Author: Caroline Rinks
+Implements the DStarLite class, an incremental planner (D* Lite) that keeps its search
+state between calls. When cells of the grid change, only the part of the search that
+depends on them is re-expanded, instead of planning again from scratch.
+
+Usage (replan after each batch of cell changes and compare against a full replan):
+
+    python3 incremental.py --input FILENAME --start START_NODE --goal GOAL_NODE --changes CHANGES_FILE
+
+Each line of CHANGES_FILE is "ROW,COL VALUE" (VALUE 1 blocks the cell, 0 frees it).
+Blank lines separate batches of changes that happen at the same time.
+"""
+
+import heapq
+import sys
+from array import array
+
+import grid_io
+
+# g(x) and rhs(x) of cells that cannot reach the goal
+INF = 2**31 - 1
+
+class DStarLite(object):
+    def __init__(self, grid, start_idx, goal_idx):
+        """
+        The Constructor for the DStarLite class. The search runs backwards from the
+        goal, so the start can move (see move_start) without losing any work.
+
+        @param self: The DStarLite object
+        @param grid: A writable Grid object; changes are applied to it with set_cell
+        @param start_idx: The index (row*Ncols+col) of the start cell
+        @param goal_idx: The index of the goal cell
+        @return none
+        """
+        self.grid = grid
+        self.Nrows = grid.Nrows
+        self.Ncols = grid.Ncols
+        self.start_idx = start_idx
+        self.goal_idx = goal_idx
+
+        size = self.Nrows * self.Ncols
+        self.g = array('i', [INF]) * size
+        self.rhs = array('i', [INF]) * size
+
+        # The open list is a heap with lazy deletion; a cell's live key is kept in
+        # key1/key2 and in_open says whether it has one
+        self.open = []
+        self.in_open = bytearray(size)
+        self.key1 = array('i', [0]) * size
+        self.key2 = array('i', [0]) * size
+        self.pushed = 0
+
+        self.km = 0
+        self.last_idx = start_idx
+        self.expansions = 0
+        self.total_expansions = 0
+
+        self.rhs[goal_idx] = 0
+        self.insert(goal_idx)
+
+    def heuristic(self, a, b):
+        """
+        Returns the Manhattan distance between two cells.
+
+        @param self: The DStarLite object
+        @param a: A cell index
+        @param b: A cell index
+        @return the Manhattan distance between a and b
+        """
+        ar, ac = divmod(a, self.Ncols)
+        br, bc = divmod(b, self.Ncols)
+        return abs(ar - br) + abs(ac - bc)
+
+    def neighbours(self, idx):
+        """
+        Returns the free cells next to idx, in the order DOWN, RIGHT, UP, LEFT.
+
+        @param self: The DStarLite object
+        @param idx: A cell index
+        @return a list of cell indices
+        """
+        Ncols = self.Ncols
+        cells = self.grid.cells
+        j = idx % Ncols
+        result = []
+        for child, ok in ((idx + Ncols, idx < len(cells) - Ncols), (idx + 1, j != Ncols - 1),
+                          (idx - Ncols, idx >= Ncols), (idx - 1, j != 0)):
+            if ok and cells[child] == 0:
+                result.append(child)
+        return result
+
+    def calculate_key(self, idx):
+        """
+        Returns the priority of a cell: (min(g, rhs) + h + km, min(g, rhs)).
+
+        @param self: The DStarLite object
+        @param idx: A cell index
+        @return a tuple of two ints
+        """
+        m = min(self.g[idx], self.rhs[idx])
+        if m == INF:
+            return (INF, INF)
+        return (m + self.heuristic(self.start_idx, idx) + self.km, m)
+
+    def insert(self, idx):
+        """
+        Puts a cell on the open list with its current key, replacing any older entry.
+
+        @param self: The DStarLite object
+        @param idx: A cell index
+        @return none
+        """
+        k1, k2 = self.calculate_key(idx)
+        self.key1[idx] = k1
+        self.key2[idx] = k2
+        self.in_open[idx] = 1
+        self.pushed += 1
+        heapq.heappush(self.open, (k1, k2, self.pushed, idx))
+
+    def top(self):
+        """
+        Drops stale entries from the front of the open list and returns the live one.
+
+        @param self: The DStarLite object
+        @return the (k1, k2, order, idx) entry with the least key, or None
+        """
+        while self.open:
+            k1, k2, order, idx = self.open[0]
+            if self.in_open[idx] and self.key1[idx] == k1 and self.key2[idx] == k2:
+                return self.open[0]
+            heapq.heappop(self.open)
+        return None
+
+    def update_vertex(self, idx):
+        """
+        Recomputes a cell's rhs from its neighbours and puts it on the open list if it
+        is inconsistent (g != rhs).
+
+        @param self: The DStarLite object
+        @param idx: A cell index
+        @return none
+        """
+        if idx != self.goal_idx:
+            best = INF
+            if self.grid.cells[idx] == 0:
+                for child in self.neighbours(idx):
+                    if self.g[child] != INF and self.g[child] + 1 < best:
+                        best = self.g[child] + 1
+            self.rhs[idx] = best
+
+        self.in_open[idx] = 0
+        if self.g[idx] != self.rhs[idx]:
+            self.insert(idx)
+
+    def compute_shortest_path(self):
+        """
+        Expands inconsistent cells until the start's g value is final.
+
+        @param self: The DStarLite object
+        @return none
+        """
+        self.expansions = 0
+        while True:
+            entry = self.top()
+            start_key = self.calculate_key(self.start_idx)
+            if entry is None or ((entry[0], entry[1]) >= start_key and
+                                 self.rhs[self.start_idx] == self.g[self.start_idx]):
+                break
+
+            k_old = (entry[0], entry[1])
+            idx = entry[3]
+            k_new = self.calculate_key(idx)
+            self.expansions += 1
+
+            if k_old < k_new:
+                self.insert(idx)
+            elif self.g[idx] > self.rhs[idx]:
+                self.in_open[idx] = 0
+                self.g[idx] = self.rhs[idx]
+                for child in self.neighbours(idx):
+                    self.update_vertex(child)
+            else:
+                self.g[idx] = INF
+                self.update_vertex(idx)
+                for child in self.neighbours(idx):
+                    self.update_vertex(child)
+
+        self.total_expansions += self.expansions
+
+    def move_start(self, start_idx):
+        """
+        Moves the start (e.g. as the robot follows the path) without discarding work.
+
+        @param self: The DStarLite object
+        @param start_idx: The index of the new start cell
+        @return none
+        """
+        self.km += self.heuristic(self.last_idx, start_idx)
+        self.last_idx = start_idx
+        self.start_idx = start_idx
+
+    def update_cells(self, changes):
+        """
+        Applies a batch of cell changes to the grid and marks the affected cells for
+        repair. The repair itself happens in the next call to find_path.
+
+        @param self: The DStarLite object
+        @param changes: A list of (row, col, value) tuples; value 1 blocks the cell
+                        and 0 frees it
+        @return none
+        """
+        for x, y, value in changes:
+            idx = x * self.Ncols + y
+            if self.grid.cells[idx] == value:
+                continue
+            self.grid.set_cell(x, y, value)
+
+            # Every edge into or out of the cell changed, so every cell around it
+            # (free or not) has to recompute its rhs
+            Ncols = self.Ncols
+            self.update_vertex(idx)
+            j = idx % Ncols
+            for child, ok in ((idx + Ncols, idx < len(self.grid.cells) - Ncols), (idx + 1, j != Ncols - 1),
+                              (idx - Ncols, idx >= Ncols), (idx - 1, j != 0)):
+                if ok:
+                    self.update_vertex(child)
+
+    def find_path(self):
+        """
+        Brings the search up to date and returns the current shortest path, found by
+        following the neighbour with the least g from the start to the goal.
+
+        @param self: The DStarLite object
+        @return the list of cell indices from start to goal, or None if there is no path
+        """
+        self.compute_shortest_path()
+        if self.g[self.start_idx] == INF:
+            return None
+
+        path = [self.start_idx]
+        while path[-1] != self.goal_idx:
+            best = None
+            for child in self.neighbours(path[-1]):
+                if best is None or self.g[child] < self.g[best]:
+                    best = child
+            path.append(best)
+        return path
+
+def parse_coordinate(text, grid, name):
+    """
+    Converts a "row,col" string into a cell index, exiting if it is not a free cell.
+
+    @param text: The coordinate string
+    @param grid: The Grid object
+    @param name: The name to use in error messages
+    @return the cell index
+    """
+    coordinate = text.split(',')
+    if not (len(coordinate) == 2 and coordinate[0].isnumeric() and coordinate[1].isnumeric()):
+        sys.exit("%s must be in coordinate form." % name)
+    x = int(coordinate[0])
+    y = int(coordinate[1])
+    if x >= grid.Nrows or y >= grid.Ncols:
+        sys.exit("%s is outside the grid environment" % name)
+    if grid.cells[x * grid.Ncols + y] == 1:
+        sys.exit("%s invalid: obstacle in the way." % name)
+    return x * grid.Ncols + y
+
+def read_changes(filename):
+    """
+    Reads batches of cell changes from a file.
+
+    @param filename: The name of the changes file
+    @return a list of batches, each a list of (row, col, value) tuples
+    """
+    batches = [[]]
+    with open(filename, 'r') as file:
+        for line in file:
+            fields = line.split()
+            if not fields:
+                if batches[-1]:
+                    batches.append([])
+                continue
+            coordinate = fields[0].split(',')
+            if len(fields) != 2 or len(coordinate) != 2 or fields[1] not in ("0", "1"):
+                sys.exit("Invalid change: %s" % line.strip())
+            batches[-1].append((int(coordinate[0]), int(coordinate[1]), int(fields[1])))
+    return [batch for batch in batches if batch]
+
+def main():
+    """
+    Plans a path, then repairs it after every batch of changes, reporting how many
+    nodes were re-expanded compared with planning again from scratch.
+
+    @return 0 at end of process
+    """
+    usage = "Usage: python incremental.py --input FILENAME --start START_NODE --goal GOAL_NODE --changes CHANGES_FILE"
+    if (len(sys.argv) != 9 or sys.argv[1] != "--input" or sys.argv[3] != "--start" or
+            sys.argv[5] != "--goal" or sys.argv[7] != "--changes"):
+        sys.exit(usage)
+
+    try:
+        grid = grid_io.load_grid(sys.argv[2], use_mmap=False)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    if not isinstance(grid.cells, bytearray):
+        grid.cells = bytearray(grid.cells)
+
+    start_idx = parse_coordinate(sys.argv[4], grid, "START_NODE")
+    goal_idx = parse_coordinate(sys.argv[6], grid, "GOAL_NODE")
+    batches = read_changes(sys.argv[8])
+
+    planner = DStarLite(grid, start_idx, goal_idx)
+    path = planner.find_path()
+    print("Initial plan: length %s, expanded %d" % (len(path) - 1 if path else None, planner.expansions))
+
+    for n, batch in enumerate(batches, 1):
+        planner.update_cells(batch)
+        path = planner.find_path()
+
+        full = DStarLite(grid_io.Grid(grid.Nrows, grid.Ncols, bytearray(grid.cells)), start_idx, goal_idx)
+        full.find_path()
+        print("Change %d (%d cells): length %s, re-expanded %d, full replan %d" %
+              (n, len(batch), len(path) - 1 if path else None, planner.expansions, full.expansions))
+
+    if path is None:
+        sys.exit("Could not find a path.")
+    print("Path: [" + ", ".join("(%d, %d)" % divmod(idx, grid.Ncols) for idx in path) + "]")
+    return 0
+
+if __name__ == '__main__':
+    main()
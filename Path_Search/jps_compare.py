@@ -0,0 +1,109 @@
+"""
+Author: Caroline Rinks
+Compares the number of nodes expanded by A* and Jump Point Search on random queries
+over one grid, and checks that both find paths of the same (shortest) length.
+
+Usage:
+
+    python3 jps_compare.py --input FILENAME [--queries N] [--seed SEED]
+"""
+
+import random
+import sys
+
+import components
+import grid_io
+import main as m
+
+USAGE = "Usage: python jps_compare.py --input FILENAME [--queries N] [--seed SEED]"
+
+def parse_args():
+    """
+    Parses the command-line arguments.
+
+    @return filename: The grid file to search
+    @return queries: The number of random queries to run
+    @return seed: The random seed used to pick the queries
+    """
+    filename = ""
+    queries = 20
+    seed = 0
+
+    if len(sys.argv) % 2 != 1:
+        sys.exit(USAGE)
+    for i in range(1, len(sys.argv), 2):
+        if sys.argv[i] == "--input":
+            filename = sys.argv[i+1]
+        elif sys.argv[i] == "--queries" and sys.argv[i+1].isnumeric():
+            queries = int(sys.argv[i+1])
+        elif sys.argv[i] == "--seed" and sys.argv[i+1].isnumeric():
+            seed = int(sys.argv[i+1])
+        else:
+            sys.exit(USAGE)
+
+    if filename == "":
+        sys.exit(USAGE)
+    return filename, queries, seed
+
+def compare(grid, pairs):
+    """
+    Runs A* and JPS on every start/goal pair and prints one row per query plus totals.
+
+    @param grid: The Grid object to search
+    @param pairs: A list of ((x1, y1), (x2, y2)) start/goal pairs
+    @return True if every query found paths of the same length with both searches
+    """
+    totals = {"A*": [0, 0.0], "JPS": [0, 0.0]}
+    agree = True
+
+    print("%-12s %-12s %8s %10s %10s" % ("start", "goal", "length", "A* exp", "JPS exp"))
+    for start, goal in pairs:
+        lengths = {}
+        counts = {}
+        for search_type in ("A*", "JPS"):
+            PathPlan = m.PathPlanner(grid.Nrows, grid.Ncols, compact=True)
+            result = PathPlan.search(search_type, m.Node(*start), m.Node(*goal), grid)
+            totals[search_type][1] += result.wall_time
+            totals[search_type][0] += result.expansions
+            lengths[search_type] = len(result.path) - 1 if result.found else None
+            counts[search_type] = result.expansions
+
+        if lengths["A*"] != lengths["JPS"]:
+            agree = False
+        print("%-12s %-12s %8s %10d %10d%s" % ("%d,%d" % start, "%d,%d" % goal, lengths["A*"],
+              counts["A*"], counts["JPS"], "" if lengths["A*"] == lengths["JPS"] else "  LENGTH MISMATCH"))
+
+    print("\n%-6s %14s %12s" % ("search", "expansions", "time (s)"))
+    for search_type in ("A*", "JPS"):
+        print("%-6s %14d %12.3f" % (search_type, totals[search_type][0], totals[search_type][1]))
+    if totals["A*"][0] != 0:
+        print("JPS expanded %.1f%% of the nodes A* expanded" % (100.0 * totals["JPS"][0] / totals["A*"][0]))
+    return agree
+
+def main():
+    """
+    Picks random free start/goal pairs on a grid and compares A* against JPS.
+
+    @return 0 if both searches agreed on every path length, 1 otherwise
+    """
+    filename, queries, seed = parse_args()
+    try:
+        grid = grid_io.load_grid(filename)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    components.attach_labels(grid, filename)
+
+    free = [idx for idx in range(grid.Nrows * grid.Ncols) if grid.cells[idx] == 0]
+    if len(free) < 2:
+        sys.exit("Grid needs at least two free cells")
+
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(queries):
+        a, b = rng.sample(free, 2)
+        pairs.append((divmod(a, grid.Ncols), divmod(b, grid.Ncols)))
+
+    return 0 if compare(grid, pairs) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Author: Caroline Rinks
+Precomputes landmark distance tables for the ALT heuristic (A*, Landmarks, Triangle
+inequality). For a landmark L and any two cells n and g, the triangle inequality gives
+|d(L, g) - d(L, n)| <= d(n, g), so the exact BFS distances from a few well-spread
+landmarks give lower bounds on the remaining path length that are far tighter than
+Manhattan distance on maze-like grids.
+
+The tables are saved next to the grid as GRIDNAME.landmarks.npy, a (K, Nrows, Ncols)
+array of uint16 distances (uint32 if some distance does not fit). When a grid is loaded,
+attach_landmarks() memory-maps the saved tables if they are newer than the grid file.
+
+Usage (choose the landmarks for a grid and save their distance tables):
+
+    python3 landmarks.py FILENAME [--landmarks K]
+"""
+
+import os
+import sys
+import time
+from array import array
+
+import components
+import grid_io
+
+# Distance stored for cells a landmark cannot reach, per table typecode
+UNREACHABLE = {'H': 2**16 - 1, 'I': 2**32 - 1}
+
+# The number of landmarks a single query evaluates at each node
+ACTIVE_LANDMARKS = 4
+
+def landmarks_filename(filename):
+    """
+    Returns the name of the landmark table file stored next to a grid file.
+
+    @param filename: The name of the grid file
+    @return the name of the landmark table file
+    """
+    return os.path.splitext(filename)[0] + ".landmarks.npy"
+
+def bfs_distances(cells, Nrows, Ncols, source):
+    """
+    Returns the BFS distance from source to every cell, one wavefront at a time.
+
+    @param cells: The flat grid
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param source: The cell index to search from
+    @return a flat array('i') of distances, -1 for cells that cannot be reached
+    """
+    size = Nrows * Ncols
+    dist = array('i', [-1]) * size
+    dist[source] = 0
+
+    frontier = array('i', [source])
+    d = 0
+    while len(frontier) != 0:
+        d += 1
+        wave = array('i')
+        for idx in frontier:
+            j = idx % Ncols
+            for child, ok in ((idx + Ncols, idx < size - Ncols), (idx + 1, j != Ncols - 1),
+                              (idx - Ncols, idx >= Ncols), (idx - 1, j != 0)):
+                if ok and cells[child] == 0 and dist[child] == -1:
+                    dist[child] = d
+                    wave.append(child)
+        frontier = wave
+    return dist
+
+class LandmarkTable(object):
+    def __init__(self, Nrows, Ncols, count, dist, mm=None):
+        """
+        The Constructor for the LandmarkTable class. The distance from landmark k to
+        cell idx is dist[k*Nrows*Ncols + idx].
+
+        @param self: The LandmarkTable object
+        @param Nrows: The number of rows in the grid
+        @param Ncols: The number of columns in the grid
+        @param count: The number of landmarks
+        @param dist: A flat array or memoryview of 'H' or 'I' distances
+        @param mm: The mmap backing dist, if the tables were memory-mapped
+        @return none
+        """
+        self.Nrows = Nrows
+        self.Ncols = Ncols
+        self.count = count
+        self.dist = dist
+        self.mm = mm
+        self.unreachable = UNREACHABLE[dist.typecode if isinstance(dist, array) else dist.format]
+        self.build_time = 0.0
+
+    @classmethod
+    def build(cls, grid, count=8):
+        """
+        Chooses landmarks by farthest-point selection inside the largest component
+        (each new landmark is the cell farthest from all landmarks chosen so far, so
+        they end up spread around the edges of the map) and records their BFS
+        distance tables.
+
+        @param cls: The LandmarkTable class
+        @param grid: The Grid object to preprocess
+        @param count: The number of landmarks to choose
+        @return a LandmarkTable object, with build_time set to the seconds spent
+        """
+        begin = time.perf_counter()
+        Nrows = grid.Nrows
+        Ncols = grid.Ncols
+        cells = grid.cells
+        size = Nrows * Ncols
+
+        labels, ncomponents = components.label_components(grid)
+        if ncomponents == 0:
+            table = cls(Nrows, Ncols, 0, array('H'))
+            table.build_time = time.perf_counter() - begin
+            return table
+
+        sizes = [0] * (ncomponents + 1)
+        for label in labels:
+            sizes[label] += 1
+        largest = max(range(1, ncomponents + 1), key=sizes.__getitem__)
+        seed = labels.index(largest)
+
+        # The seed itself is not a landmark; the cell farthest from it is the first one
+        nearest = bfs_distances(cells, Nrows, Ncols, seed)
+        tables = []
+        while len(tables) < count:
+            landmark = max(range(0, size), key=nearest.__getitem__)
+            if nearest[landmark] <= 0:
+                break
+            dist = bfs_distances(cells, Nrows, Ncols, landmark)
+            tables.append(dist)
+            if len(tables) == 1:
+                nearest = array('i', dist)
+            else:
+                nearest = array('i', map(min, nearest, dist))
+
+        longest = max(max(dist) for dist in tables) if tables else 0
+        typecode = 'H' if longest < UNREACHABLE['H'] else 'I'
+        unreachable = UNREACHABLE[typecode]
+        values = array(typecode)
+        for dist in tables:
+            values.extend(unreachable if d == -1 else d for d in dist)
+
+        table = cls(Nrows, Ncols, len(tables), values)
+        table.build_time = time.perf_counter() - begin
+        return table
+
+    def save(self, filename):
+        """
+        Writes the distance tables to a (K, Nrows, Ncols) .npy file.
+
+        @param self: The LandmarkTable object
+        @param filename: The name of the .npy file
+        @return none
+        """
+        descr = '<u2' if self.unreachable == UNREACHABLE['H'] else '<u4'
+        grid_io.write_npy(filename, self.dist, (self.count, self.Nrows, self.Ncols), descr)
+
+    @classmethod
+    def load(cls, filename, use_mmap=True):
+        """
+        Reads distance tables written by save(), memory-mapped by default.
+
+        @param cls: The LandmarkTable class
+        @param filename: The name of the .npy file
+        @param use_mmap: If True, memory-map the file instead of reading it into memory
+        @return a LandmarkTable object
+        """
+        dist, shape, mm = grid_io.read_npy(filename, use_mmap)
+        if len(shape) != 3 or dist.itemsize not in (2, 4) or shape[0] == 0:
+            raise ValueError("%s does not hold landmark tables" % filename)
+        return cls(shape[1], shape[2], shape[0], dist, mm)
+
+    def close(self):
+        """
+        Releases the memory map backing the tables, if there is one.
+
+        @param self: The LandmarkTable object
+        @return none
+        """
+        if self.mm is not None:
+            self.dist = None
+            self.mm.close()
+            self.mm = None
+
+    def goal_bounds(self, goal_idx, start_idx, active):
+        """
+        Picks the landmarks that give the tightest bound between start and goal. Using
+        only a few of them keeps the heuristic cheap to evaluate at every node.
+
+        @param self: The LandmarkTable object
+        @param goal_idx: The index of the goal cell
+        @param start_idx: The index of the start cell
+        @param active: The largest number of landmarks to use
+        @return a list of (table offset, distance from the landmark to the goal) pairs
+        """
+        size = self.Nrows * self.Ncols
+        dist = self.dist
+        bounds = []
+        for k in range(0, self.count):
+            offset = k * size
+            dg = dist[offset + goal_idx]
+            if dg != self.unreachable:
+                bounds.append((abs(dg - dist[offset + start_idx]), offset, dg))
+        bounds.sort(reverse=True)
+        return [(offset, dg) for _, offset, dg in bounds[:active]]
+
+def attach_landmarks(grid, filename):
+    """
+    Memory-maps the landmark tables saved next to a grid file and stores them in
+    grid.landmarks. Tables that are missing, older than the grid file, or of the wrong
+    shape are ignored.
+
+    @param grid: The Grid object loaded from filename
+    @param filename: The name of the grid file
+    @return True if landmark tables were attached, False otherwise
+    """
+    lfile = landmarks_filename(filename)
+    try:
+        if os.path.getmtime(lfile) < os.path.getmtime(filename):
+            return False
+        table = LandmarkTable.load(lfile)
+    except (OSError, ValueError, KeyError):
+        return False
+
+    if table.Nrows != grid.Nrows or table.Ncols != grid.Ncols:
+        table.close()
+        return False
+    grid.landmarks = table
+    return True
+
+def main():
+    """
+    Chooses landmarks for a grid file and saves their distance tables.
+
+    @return 0 at end of process
+    """
+    if len(sys.argv) == 4 and sys.argv[2] == "--landmarks" and sys.argv[3].isnumeric() and int(sys.argv[3]) > 0:
+        count = int(sys.argv[3])
+    elif len(sys.argv) == 2:
+        count = 8
+    else:
+        sys.exit("Usage: python landmarks.py FILENAME [--landmarks K]")
+
+    try:
+        grid = grid_io.load_grid(sys.argv[1])
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+    table = LandmarkTable.build(grid, count)
+    table.save(landmarks_filename(sys.argv[1]))
+    print("Landmarks: %d" % table.count)
+    print("Table size: %d bytes" % (len(table.dist) * table.dist.itemsize))
+    print("Preprocessing time: %.3f s" % table.build_time)
+    print("Saved to %s" % landmarks_filename(sys.argv[1]))
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,37 @@ This program reads in a file containing a grid environment and finds the shortes
 between a specified start and end coordinate location.
 '''
 
+import cProfile
+import heapq
+import json
+import pstats
 import sys
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict, deque
+from multiprocessing import Pool, shared_memory
+
+import components
+import grid_io
+import hpa
+import incremental
+import landmarks
+import weighted
+
+# Sentinel g(x) for cells that have not been reached yet
+UNREACHED = 2**31 - 1
+
+# The single searches that can be requested by name
+SEARCH_TYPES = ("BFS", "BFS-BI", "BFS-FIELD", "DFS", "DFS-PLAIN", "A*", "A*-ALT", "A*-BI",
+                "A*-ANYTIME", "JPS", "HPA*", "DIJKSTRA", "DIJKSTRA-8")
+
+# The searches compared by --search ALL
+ALL_SEARCHES = ("BFS", "DFS", "A*")
+
+# Starting inflation of the heuristic in anytime A*, and how much it drops per pass
+ANYTIME_EPSILON = 3.0
+ANYTIME_STEP = 0.5
 
 class Node(object):
     def __init__(self, x, y, parent=None):
@@ -86,29 +116,124 @@ class Node(object):
         """
         return self.y
 
+class SearchResult(object):
+    def __init__(self, search_type, found, path, expansions, generated, peak_frontier, wall_time,
+                 peak_memory=None):
+        """
+        The Constructor for the SearchResult class, which describes one finished search.
+
+        @param self: The SearchResult object
+        @param search_type: The name of the search that was run
+        @param found: True if a path was found
+        @param path: The list of (row, col) cells from start to goal, or None
+        @param expansions: The number of nodes expanded (the Traversed count)
+        @param generated: The number of nodes added to the frontier, or None if the
+                          search does not track it
+        @param peak_frontier: The largest size the frontier reached, or None if the
+                              search does not track it
+        @param wall_time: The time the search took, in seconds
+        @param peak_memory: The peak bytes allocated during the search, or None if
+                            memory was not traced
+        @return none
+        """
+        self.search_type = search_type
+        self.found = found
+        self.path = path
+        self.expansions = expansions
+        self.generated = generated
+        self.peak_frontier = peak_frontier
+        self.wall_time = wall_time
+        self.peak_memory = peak_memory
+
+        # Set only by the searches they apply to
+        self.cost = None
+        self.suboptimality = None
+        self.side_counts = None
+
+        # Chunk cache hits and misses during the search, for tiled grids
+        self.chunk_cache = None
+
+    def to_dict(self):
+        """
+        Returns the result as a dict ready to be written as JSON.
+
+        @param self: The SearchResult object
+        @return a dict of the result's fields, leaving out the ones that do not apply
+        """
+        result = {"search": self.search_type, "found": self.found,
+                  "path": [list(cell) for cell in self.path] if self.path is not None else None,
+                  "length": len(self.path) - 1 if self.path is not None else None,
+                  "expansions": self.expansions, "generated": self.generated,
+                  "peak_frontier": self.peak_frontier, "wall_time": self.wall_time,
+                  "peak_memory": self.peak_memory}
+        if self.cost is not None:
+            result["cost"] = self.cost
+        if self.suboptimality is not None:
+            result["suboptimality"] = self.suboptimality
+        if self.side_counts is not None:
+            result["expansions_per_side"] = list(self.side_counts)
+        if self.chunk_cache is not None:
+            result["chunk_cache"] = self.chunk_cache
+        return result
+
 class PathPlanner(object):
-    def __init__(self, Nrows, Ncols):
+    def __init__(self, Nrows, Ncols, compact=False, field_cache_bytes=64*2**20):
         """
         The Constructor for the class PathPlanner.
         
         @param self: The PathPlanner object
         @param Nrows: The number of rows in the grid environment
         @param Ncols: The number of columns in the grid environment
+        @param compact: If True, searches keep their state in flat arrays indexed by
+                        row*Ncols+col instead of building a tree of Node objects
+        @param field_cache_bytes: The memory budget of the distance field cache
         @return none
         """
         
         self.Nrows = Nrows
         self.Ncols = Ncols
+        self.compact = compact
         self.count = 0
 
+        # Nodes added to the frontier and the frontier's largest size during the
+        # current search, kept next to self.count by every search that can track them
+        self.generated = 0
+        self.peak_frontier = 0
+
+        # Optional callback on_expand(row, col, frontier size), called on every expansion
+        self.on_expand = None
+
         self.stack = []
-        self.queue = []
+        self.queue = deque()
         self.visited_str = []
 
+        # (forward, backward) expansions of the last bidirectional search
+        self.side_counts = None
+
+        # Cost of the last weighted search's path, in straight moves over plain floor
+        self.path_cost = None
+
+        # Budgets for anytime_search (None for no limit), and the proven bound on how
+        # much longer than the shortest path its last returned path may be
+        self.time_budget = None
+        self.expansion_budget = None
+        self.suboptimality = None
+
+        # D* Lite state kept between incremental_search calls
+        self.dstar = None
+        self.dstar_grid = None
+
+        # LRU cache of single-source BFS fields, keyed by source cell index
+        self.field_cache = OrderedDict()
+        self.field_cache_bytes = field_cache_bytes
+        self.field_grid = None
+
     def calculate_hx(self, node, goal):
         """
         Given a current node and a goal node, calculate and set the current node's h(x) value,
-        which is the Euclidean distance from the current node to the goal node.
+        which is the Manhattan distance from the current node to the goal node. With
+        unit-cost 4-way moves this never overestimates and is exact on open ground, so A*
+        heads straight for the goal instead of widening out like Euclidean distance does.
         
         @param self: The PathPlanner object
         @param node: The current node to calculate h(x)
@@ -125,8 +250,8 @@ class PathPlanner(object):
         x1 = node.getX()
         y1 = node.getY()
                 
-        Euclidean_dis =  ( ((x2-x1)**2) + ((y2-y1)**2) )**0.5
-        node.h_val = Euclidean_dis
+        Manhattan_dis = abs(x2-x1) + abs(y2-y1)
+        node.h_val = Manhattan_dis
 
     def calculate_gx(self, node, child):
         """
@@ -149,29 +274,209 @@ class PathPlanner(object):
         """
         return self.count
 
-    def expand_node(self, node, grid):
+    def reset(self):
+        """
+        Clears the path and the statistics of the previous search.
+
+        @param self: The PathPlanner object
+        @return none
+        """
+        self.count = 0
+        self.generated = 0
+        self.peak_frontier = 0
+        self.visited_str = []
+        self.side_counts = None
+        self.path_cost = None
+        self.suboptimality = None
+
+    def note_expansion(self, idx, frontier):
+        """
+        Records one expansion: tracks the peak frontier size and calls self.on_expand
+        if it is set.
+
+        @param self: The PathPlanner object
+        @param idx: The index (row*Ncols+col) of the cell being expanded
+        @param frontier: The current number of entries on the frontier
+        @return none
+        """
+        if frontier > self.peak_frontier:
+            self.peak_frontier = frontier
+        if self.on_expand is not None:
+            row, col = divmod(idx, self.Ncols)
+            self.on_expand(row, col, frontier)
+
+    def search(self, search_type, start, goal, grid, trace_memory=False):
         """
-        Given a grid environment and a node, set the node's list of children according to 
+        Runs the search named by search_type from a clean state and returns what it
+        found and what it cost.
+
+        @param self: The PathPlanner object
+        @param search_type: One of the names in SEARCH_TYPES
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @param trace_memory: If True, measure the search's peak memory with tracemalloc,
+                             which slows the search down
+        @return a SearchResult object
+        """
+        self.reset()
+        tiled = isinstance(grid, grid_io.TiledGrid)
+        if tiled:
+            before = grid.cache_stats()
+        if trace_memory:
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+
+        begin = time.perf_counter()
+        try:
+            found = run_search(self, search_type, start, goal, grid)
+        finally:
+            wall_time = time.perf_counter() - begin
+            peak_memory = None
+            if trace_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1] - base
+                if not was_tracing:
+                    tracemalloc.stop()
+
+        path = None
+        if found:
+            path = [tuple(int(v) for v in c.split(", ")) for c in self.visited_str]
+        result = SearchResult(search_type, found, path, self.count, self.generated,
+                              self.peak_frontier, wall_time, peak_memory)
+        result.cost = self.path_cost
+        result.suboptimality = self.suboptimality
+        result.side_counts = self.side_counts
+        if tiled:
+            after = grid.cache_stats()
+            hits = after["hits"] - before["hits"]
+            misses = after["misses"] - before["misses"]
+            result.chunk_cache = {"hits": hits, "misses": misses,
+                                  "hit_rate": hits / (hits + misses) if hits + misses else None,
+                                  "evictions": after["evictions"] - before["evictions"],
+                                  "resident_bytes": after["bytes"]}
+        return result
+
+    def expand_node(self, node, cells):
+        """
+        Given a flat grid and a node, set the node's list of children according to 
         the moves (DOWN, RIGHT, UP, LEFT) that are available at that node's position in the grid.
         
         @param self: The PathPlanner object
         @param node: The node to expand
-        @param grid: A 2D array representing the environment in which the search takes place
+        @param cells: The flat grid returned by flatten_grid
         @return none
         """
         
         i = node.getX()
         j = node.getY()
+        idx = i * self.Ncols + j
 
-        if (i != self.Nrows-1) and (grid[i+1][j] == 0):   # Down
+        if (i != self.Nrows-1) and (cells[idx+self.Ncols] == 0):   # Down
             child = Node(i+1, j, node)
-        if (j != self.Ncols-1) and (grid[i][j+1] == 0):   # Right
+        if (j != self.Ncols-1) and (cells[idx+1] == 0):            # Right
             child = Node(i, j+1, node)
-        if (i != 0) and (grid[i-1][j] == 0):              # Up
+        if (i != 0) and (cells[idx-self.Ncols] == 0):              # Up
             child = Node(i-1, j, node)
-        if (j != 0) and (grid[i][j-1] == 0):              # Left
+        if (j != 0) and (cells[idx-1] == 0):                       # Left
             child = Node(i, j-1, node)
 
+    def flatten_grid(self, grid):
+        """
+        Returns the grid as a flat sequence of cells indexed by row*Ncols+col. A Grid
+        object's cells are used directly, a 2D array is packed into a bytearray, and a
+        flat grid is returned as is.
+
+        @param self: The PathPlanner object
+        @param grid: A Grid object, 2D array or flat sequence representing the environment
+        @return a flat sequence of 0 (free) and 1 (obstacle) values
+        """
+        if isinstance(grid, grid_io.Grid):
+            return grid.cells
+        if len(grid) == self.Nrows and isinstance(grid[0], (list, tuple)):
+            cells = bytearray(self.Nrows * self.Ncols)
+            for i in range(0, self.Nrows):
+                cells[i*self.Ncols:(i+1)*self.Ncols] = bytes(grid[i])
+            return cells
+        return grid
+
+    def expand_index(self, idx, cells):
+        """
+        Given a flat grid and a cell index, return the indices of the free neighbouring
+        cells in the same order as expand_node (DOWN, RIGHT, UP, LEFT).
+
+        @param self: The PathPlanner object
+        @param idx: The index (row*Ncols+col) of the cell to expand
+        @param cells: The flat grid returned by flatten_grid
+        @return a list of neighbouring cell indices
+        """
+        Ncols = self.Ncols
+        j = idx % Ncols
+        children = []
+
+        if (idx < len(cells) - Ncols) and (cells[idx+Ncols] == 0):   # Down
+            children.append(idx+Ncols)
+        if (j != Ncols-1) and (cells[idx+1] == 0):                   # Right
+            children.append(idx+1)
+        if (idx >= Ncols) and (cells[idx-Ncols] == 0):               # Up
+            children.append(idx-Ncols)
+        if (j != 0) and (cells[idx-1] == 0):                         # Left
+            children.append(idx-1)
+        return children
+
+    def connected(self, start, goal, grid):
+        """
+        Checks in O(1) whether start and goal can be connected at all, using the
+        component labels attached to the grid (see components.py). Without labels
+        every pair is assumed to be connected.
+
+        @param self: The PathPlanner object
+        @param start: The start node
+        @param goal: The goal node
+        @param grid: The grid environment in which the search takes place
+        @return False if start and goal lie in different components, True otherwise
+        """
+        if not isinstance(grid, grid_io.Grid) or grid.labels is None:
+            return True
+        return (grid.labels[start.getX() * self.Ncols + start.getY()] ==
+                grid.labels[goal.getX() * self.Ncols + goal.getY()])
+
+    def trace_path(self, parent, start_idx, goal_idx):
+        """
+        Follows the parent array back from the goal and stores the path from start
+        to goal in self.visited_str, formatting each coordinate only once.
+
+        @param self: The PathPlanner object
+        @param parent: A flat array holding each reached cell's parent index
+        @param start_idx: The index of the start cell
+        @param goal_idx: The index of the goal cell
+        @return none
+        """
+        path = [goal_idx]
+        while path[-1] != start_idx:
+            path.append(parent[path[-1]])
+
+        self.visited_str = ["%d, %d" % divmod(idx, self.Ncols) for idx in reversed(path)]
+
+    def trace_nodes(self, node, start):
+        """
+        Follows parent links back from the given node to the start node and stores the
+        path from start to that node in self.visited_str.
+
+        @param self: The PathPlanner object
+        @param node: The last node of the path
+        @param start: The node the search began at
+        @return none
+        """
+        path = [node]
+        while not (node.getX() == start.getX() and node.getY() == start.getY()):
+            node = node.parent
+            path.append(node)
+
+        self.visited_str = ["%d, %d" % (n.getX(), n.getY()) for n in reversed(path)]
+
     def breadth_first_search(self, start, goal, grid):
         """
         Given a grid environment, return True if a valid path
@@ -183,121 +488,140 @@ class PathPlanner(object):
         @param grid: A 2D array representing the environment in which the search takes place.
         @return True if a path was found, False otherwise
         """
-        
-        path_found = False
-        coordinate = str(start.getX()) + ", " + str(start.getY())
-        coordinate = coordinate.replace(" ", "")
-        coordinate = coordinate.replace(",", ", ")
 
-        # Set current node (start) as visited and add to stack
-        self.queue.append(start)
-        self.visited_str.append(coordinate)
+        if not self.connected(start, goal, grid):
+            return False
 
-        while (self.queue != []):
-            node = self.queue.pop(0)
+        if self.compact:
+            return self.breadth_first_search_compact(start, goal, grid)
+        
+        # Visited cells are flags in a bytearray indexed by row*Ncols+col and the
+        # frontier is a deque, so each reachable cell costs O(1) to queue and check.
+        cells = self.flatten_grid(grid)
+        visited = grid_io.state_table(cells)
+        self.queue = deque([start])
+        visited[start.getX() * self.Ncols + start.getY()] = 1
+
+        while self.queue:
+            node = self.queue.popleft()
             
             self.count += 1
+            self.note_expansion(node.getX() * self.Ncols + node.getY(), len(self.queue))
             if (node.getX() == goal.getX() and node.getY() == goal.getY()):
-                path_found = True
-                break
+                self.trace_nodes(node, start)
+                return True
 
-            self.expand_node(node, grid)
+            self.expand_node(node, cells)
 
-            for i in range(0, len(node.children)) :
-                coordinate = str(node.children[i].getX()) + ", " + str(node.children[i].getY())
-                coordinate = coordinate.replace(" ", "")
-                coordinate = coordinate.replace(",", ", ")
-                if coordinate not in self.visited_str :
-                    self.queue.append(node.children[i])
-                    self.visited_str.append(coordinate)
-
-        if not path_found:
-            return False
-        
-        # Build path backwards using parent links
-        self.visited_str = []
-        coordinate = str(node.getX()) + ", " + str(node.getY())
-        coordinate = coordinate.replace(" ", "")
-        coordinate = coordinate.replace(",", ", ")
-        self.visited_str.insert(0, coordinate)
-        while (1):
-            coordinate = str(node.parent.getX()) + ", " + str(node.parent.getY())
-            coordinate = coordinate.replace(" ", "")
-            coordinate = coordinate.replace(",", ", ")
-            self.visited_str.insert(0, coordinate)
-            node = node.parent
-            if (node.getX() == start.getX()) and (node.getY() == start.getY()) :
-                return path_found
+            for child in node.children:
+                idx = child.getX() * self.Ncols + child.getY()
+                if not visited[idx]:
+                    visited[idx] = 1
+                    self.queue.append(child)
+                    self.generated += 1
+
+        return False
 
-    def depth_first_search(self, start, goal, grid):
+    def depth_first_search(self, start, goal, grid, deepening=True):
         """
         Given a grid environment, return True if a valid path
-        from start to goal is found using a DFS.
+        from start to goal is found using an iterative-deepening DFS.
         
         @param self: The PathPlanner object
         @param start: The node to begin search at.
         @param goal: The node being searched for.
         @param grid: A 2D array representing the environment in which the search takes place.
+        @param deepening: If False, run a single plain DFS instead, which visits each cell
+                          once but does not guarantee the shortest path
         @return True if a path was found, False otherwise
         """
-        
-        path_found = False
-        self.stack.append(start)
-        limit = -1
 
-        while (self.stack != []) :
-            limit += 1
+        if not self.connected(start, goal, grid):
+            return False
 
-            for i in range(0, 2**limit):
-                for j in reversed(self.stack):
-                    node = j
-                    if (node.height > limit):
-                        continue
-                    else:
-                        self.stack.remove(node)
-                        break
-                
-                coordinate = str(node.getX()) + ", " + str(node.getY())
-                coordinate = coordinate.replace(" ", "")
-                coordinate = coordinate.replace(",", ", ")
-                self.visited_str.append(coordinate)
+        if self.compact:
+            return self.depth_first_search_compact(start, goal, grid, deepening)
 
-                self.expand_node(node, grid)
-                for i in range(0, len(node.children)):
-                    self.count += 1
-                    if (node.children[i].getX() == goal.getX() and node.children[i].getY() == goal.getY()) :
-                        path_found = True
-                        node = node.children[i]
-                        break
-
-                    coordinate = str(node.children[i].getX()) + ", " + str(node.children[i].getY())
-                    coordinate = coordinate.replace(" ", "")
-                    coordinate = coordinate.replace(",", ", ")
-                
-                    if coordinate not in self.visited_str:
-                        self.stack.append(node.children[i])
+        cells = self.flatten_grid(grid)
 
-                if path_found:
-                    break
+        if not deepening:
+            visited = grid_io.state_table(cells)
+            self.stack = [start]
+
+            while self.stack:
+                node = self.stack.pop()
+                idx = node.getX() * self.Ncols + node.getY()
+                if visited[idx]:
+                    continue
+                visited[idx] = 1
+                self.note_expansion(idx, len(self.stack))
+
+                self.expand_node(node, cells)
+                for child in node.children:
+                    self.count += 1
+                    if (child.getX() == goal.getX() and child.getY() == goal.getY()) :
+                        self.trace_nodes(child, start)
+                        return True
+                    if not visited[child.getX() * self.Ncols + child.getY()]:
+                        self.stack.append(child)
+                        self.generated += 1
 
-            if path_found:
-                # Build path backwards using parent links
-                self.visited_str = []
-                coordinate = str(node.getX()) + ", " + str(node.getY())
-                coordinate = coordinate.replace(" ", "")
-                coordinate = coordinate.replace(",", ", ")
-                self.visited_str.insert(0, coordinate)
-                while (1):
-                    coordinate = str(node.parent.getX()) + ", " + str(node.parent.getY())
-                    coordinate = coordinate.replace(" ", "")
-                    coordinate = coordinate.replace(",", ", ")
-                    self.visited_str.insert(0, coordinate)
-                    node = node.parent
-                    if (node.getX() == start.getX()) and (node.getY() == start.getY()) :
-                        return path_found
-
-        if not path_found:
             return False
+        
+        # Iterative deepening: the round with depth limit L is a DFS that generates
+        # paths of at most L moves, so the first round to reach the goal finds a
+        # shortest path. best[idx] is the fewest moves idx was pushed at this round
+        # (valid where seen[idx] == L, so the table is reset by starting a new round);
+        # a cell is pushed again only over a shorter path. No path is shorter than
+        # the Manhattan distance, so the rounds start there and go up by one, and a
+        # cell whose depth plus Manhattan distance to the goal is over the limit is
+        # left for a later round instead of being searched below.
+        start_idx = start.getX() * self.Ncols + start.getY()
+        x2 = goal.getX()
+        y2 = goal.getY()
+        best = grid_io.state_table(cells, 0, 'i')
+        seen = grid_io.state_table(cells, -1, 'i')
+        limit = max(1, abs(goal.getX() - start.getX()) + abs(goal.getY() - start.getY())) - 1
+        cutoff = True
+
+        while cutoff:
+            limit += 1
+            cutoff = False
+            seen[start_idx] = limit
+            best[start_idx] = 0
+            self.stack = [start]
+
+            while self.stack:
+                node = self.stack.pop()
+                d = node.height - start.height
+                idx = node.getX() * self.Ncols + node.getY()
+                if d > best[idx]:
+                    # Pushed again over a shorter path since
+                    continue
+                self.note_expansion(idx, len(self.stack))
+
+                self.expand_node(node, cells)
+                children = node.children
+                # Only parent links are needed to trace the path, so drop the children
+                # list and let branches that are finished be freed
+                node.children = []
+                for child in children:
+                    self.count += 1
+                    if (child.getX() == goal.getX() and child.getY() == goal.getY()) :
+                        self.trace_nodes(child, start)
+                        return True
+
+                    idx = child.getX() * self.Ncols + child.getY()
+                    if seen[idx] != limit or d + 1 < best[idx]:
+                        if d + 1 + abs(x2 - child.getX()) + abs(y2 - child.getY()) > limit:
+                            cutoff = True
+                            continue
+                        seen[idx] = limit
+                        best[idx] = d + 1
+                        self.stack.append(child)
+                        self.generated += 1
+
+        return False
 
     def a_star_search(self, start, goal, grid):
         """
@@ -311,40 +635,47 @@ class PathPlanner(object):
         @return True if a path was found, False otherwise
         """
 
+        if not self.connected(start, goal, grid):
+            return False
+
+        if self.compact:
+            return self.a_star_search_compact(start, goal, grid)
+
         path_found = False
+        cells = self.flatten_grid(grid)
         # Set h(x) and g(x) for start node
         self.calculate_hx(start, goal) 
         start.g_val = 0
 
-        open = []
-        open.append(start)
-        closed = []
-
-        while (open != []):            
-            # Find node with least f
-            f1 = 10000
-            for i in range(0, len(open)):
-                f2 = open[i].getH_val() + open[i].getG_val()
-                if (f2 < f1):
-                    f1 = f2
-                    node = open[i]
-            
-            open.remove(node)
-            self.expand_node(node, grid)
+        # The open list is a binary heap keyed on (f, h, order pushed): ties between
+        # equal f values go to the smaller h, i.e. the larger g(x), the node nearest the
+        # goal, and then to the node added first. Closed cells and the best g(x) pushed
+        # so far are indexed by row*Ncols+col for O(1) lookups.
+        pushed = 0
+        open = [(start.getH_val() + start.getG_val(), start.getH_val(), pushed, start)]
+        closed = grid_io.state_table(cells)
+        best_g = grid_io.state_table(cells, UNREACHED, 'i')
+        best_g[start.getX() * self.Ncols + start.getY()] = 0
+
+        while (open != []):
+            # Pop node with least f, skipping stale entries whose cell was already expanded
+            node = heapq.heappop(open)[3]
+            node_idx = node.getX() * self.Ncols + node.getY()
+            if closed[node_idx]:
+                continue
+
+            self.expand_node(node, cells)
             self.count += 1
+            self.note_expansion(node_idx, len(open))
             
             for i in range(0, len(node.children)) :
-                skip_child = False
                 child = node.children[i]
                 if (child.getX() == goal.getX() and child.getY() == goal.getY()) :
                     path_found = True
                     break
 
-                for i in range(0, len(closed)):
-                    if (closed[i].getX() == child.getX() and closed[i].getY() == child.getY()):
-                        skip_child = True
-                        break
-                if skip_child:
+                child_idx = child.getX() * self.Ncols + child.getY()
+                if closed[child_idx]:
                     continue
                 
                 # For each child, calculate f(x) = h(x) + g(x)
@@ -352,37 +683,1095 @@ class PathPlanner(object):
                 self.calculate_hx(child, goal)
                 f = child.getH_val() + child.getG_val()
 
-                for i in range(0, len(open)):
-                    if (open[i].getX() == child.getX() and open[i].getY() == child.getY()):
-                        if (child.getG_val() >= open[i].getG_val()):
-                            skip_child = True
-                            break
-                if skip_child:
+                # Lazy decrease-key: only push when this is the cheapest way to reach the child
+                if (child.getG_val() >= best_g[child_idx]):
                     continue
-                else:
-                    open.append(child)
+                best_g[child_idx] = child.getG_val()
+                pushed += 1
+                heapq.heappush(open, (f, child.getH_val(), pushed, child))
+                self.generated += 1
             
-            closed.append(node)
+            closed[node_idx] = 1
 
             if path_found:
-                coordinate = str(goal.getX()) + ", " + str(goal.getY())
-                coordinate = coordinate.replace(" ", "")
-                coordinate = coordinate.replace(",", ", ")
-                
-                self.visited_str.insert(0, coordinate)
-                while True:
-                    coordinate = str(node.getX()) + ", " + str(node.getY())
-                    coordinate = coordinate.replace(" ", "")
-                    coordinate = coordinate.replace(",", ", ")
-                    
-                    self.visited_str.insert(0, coordinate)
-                    if (node.getX() == start.getX() and node.getY() == start.getY()):
-                        return path_found
-                    
-                    node = node.parent
+                # The goal child's parent links lead back to the start
+                self.trace_nodes(child, start)
+                return path_found
         
         return path_found
 
+    def breadth_first_search_compact(self, start, goal, grid):
+        """
+        BFS that keeps its visited flags, parent links and FIFO queue in flat arrays
+        instead of Node objects. Expansion order and the Traversed count match
+        breadth_first_search.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: A 2D array or flat sequence representing the environment.
+        @return True if a path was found, False otherwise
+        """
+        cells = self.flatten_grid(grid)
+        start_idx = start.getX() * self.Ncols + start.getY()
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+
+        visited = grid_io.state_table(cells)
+        parent = grid_io.state_table(cells, -1, 'i')
+
+        # Every cell is enqueued at most once, so the queue is an append-only array
+        # read from a moving head index.
+        queue = array('i', [start_idx])
+        visited[start_idx] = 1
+        head = 0
+
+        while head < len(queue):
+            idx = queue[head]
+            head += 1
+
+            self.count += 1
+            self.note_expansion(idx, len(queue) - head)
+            if idx == goal_idx:
+                self.trace_path(parent, start_idx, goal_idx)
+                return True
+
+            for child in self.expand_index(idx, cells):
+                if not visited[child]:
+                    visited[child] = 1
+                    parent[child] = idx
+                    queue.append(child)
+                    self.generated += 1
+
+        return False
+
+    def depth_first_search_compact(self, start, goal, grid, deepening=True):
+        """
+        Iterative-deepening DFS that keeps the explicit stack, parent links and the
+        best-depth table as flat arrays. Children are checked for the
+        goal when generated and the Traversed count is the number of children generated,
+        as in depth_first_search.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: A 2D array or flat sequence representing the environment.
+        @param deepening: If False, run a single plain DFS instead
+        @return True if a path was found, False otherwise
+        """
+        cells = self.flatten_grid(grid)
+        start_idx = start.getX() * self.Ncols + start.getY()
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+
+        parent = grid_io.state_table(cells, -1, 'i')
+
+        if not deepening:
+            visited = grid_io.state_table(cells)
+            stack = array('i', [start_idx])
+
+            while len(stack) != 0:
+                idx = stack.pop()
+                if visited[idx]:
+                    continue
+                visited[idx] = 1
+                self.note_expansion(idx, len(stack))
+
+                for child in self.expand_index(idx, cells):
+                    self.count += 1
+                    if child == goal_idx:
+                        parent[child] = idx
+                        self.trace_path(parent, start_idx, goal_idx)
+                        return True
+                    if not visited[child]:
+                        parent[child] = idx
+                        stack.append(child)
+                        self.generated += 1
+
+            return False
+
+        Ncols = self.Ncols
+        x2 = goal.getX()
+        y2 = goal.getY()
+        best = grid_io.state_table(cells, 0, 'i')
+        seen = grid_io.state_table(cells, -1, 'i')
+        limit = max(1, abs(goal.getX() - start.getX()) + abs(goal.getY() - start.getY())) - 1
+        cutoff = True
+
+        while cutoff:
+            limit += 1
+            cutoff = False
+            seen[start_idx] = limit
+            best[start_idx] = 0
+
+            # Stack entries hold the depth they were pushed at
+            stack = array('i', [start_idx])
+            stack_depth = array('i', [0])
+
+            while len(stack) != 0:
+                idx = stack.pop()
+                d = stack_depth.pop()
+                if d > best[idx]:
+                    continue
+                self.note_expansion(idx, len(stack))
+
+                for child in self.expand_index(idx, cells):
+                    self.count += 1
+                    if child == goal_idx:
+                        parent[child] = idx
+                        self.trace_path(parent, start_idx, goal_idx)
+                        return True
+
+                    if seen[child] != limit or d + 1 < best[child]:
+                        x1, y1 = divmod(child, Ncols)
+                        if d + 1 + abs(x2 - x1) + abs(y2 - y1) > limit:
+                            cutoff = True
+                            continue
+                        seen[child] = limit
+                        best[child] = d + 1
+                        parent[child] = idx
+                        stack.append(child)
+                        stack_depth.append(d + 1)
+                        self.generated += 1
+
+        return False
+
+    def a_star_search_compact(self, start, goal, grid):
+        """
+        A* that keeps g(x), parent links and the closed set in flat arrays instead of
+        Node objects. The open list holds (f, h, order pushed, cell index) entries, so
+        paths and the Traversed count match a_star_search.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: A 2D array or flat sequence representing the environment.
+        @return True if a path was found, False otherwise
+        """
+        cells = self.flatten_grid(grid)
+        Ncols = self.Ncols
+        start_idx = start.getX() * Ncols + start.getY()
+        goal_idx = goal.getX() * Ncols + goal.getY()
+        x2 = goal.getX()
+        y2 = goal.getY()
+
+        closed = grid_io.state_table(cells)
+        g_val = grid_io.state_table(cells, UNREACHED, 'i')
+        parent = grid_io.state_table(cells, -1, 'i')
+        g_val[start_idx] = 0
+
+        pushed = 0
+        x1, y1 = divmod(start_idx, Ncols)
+        h = abs(x2-x1) + abs(y2-y1)
+        open = [(h, h, pushed, start_idx)]
+
+        while (open != []):
+            idx = heapq.heappop(open)[3]
+            if closed[idx]:
+                continue
+
+            self.count += 1
+            self.note_expansion(idx, len(open))
+            g = g_val[idx] + 1
+            for child in self.expand_index(idx, cells):
+                if child == goal_idx:
+                    parent[child] = idx
+                    self.trace_path(parent, start_idx, goal_idx)
+                    return True
+
+                if closed[child] or g >= g_val[child]:
+                    continue
+
+                g_val[child] = g
+                parent[child] = idx
+                x1, y1 = divmod(child, Ncols)
+                pushed += 1
+                h = abs(x2-x1) + abs(y2-y1)
+                heapq.heappush(open, (h + g, h, pushed, child))
+                self.generated += 1
+
+            closed[idx] = 1
+
+        return False
+
+    def distance_field(self, start, grid):
+        """
+        Returns the BFS distance and parent fields from a single source, computing them
+        only if they are not already in the LRU cache. The cache holds at most
+        field_cache_bytes of fields and is emptied when the grid changes.
+
+        @param self: The PathPlanner object
+        @param start: The source node
+        @param grid: The grid environment in which the search takes place
+        @return a tuple (dist, parent) of flat arrays indexed by row*Ncols+col; dist is
+                UNREACHED for cells that cannot be reached from start
+        """
+        # Grid objects count their edits, so a changed grid never reuses old fields
+        grid_key = (id(grid), getattr(grid, 'version', 0))
+        if grid_key != self.field_grid:
+            self.invalidate_fields()
+            self.field_grid = grid_key
+
+        start_idx = start.getX() * self.Ncols + start.getY()
+        if start_idx in self.field_cache:
+            self.field_cache.move_to_end(start_idx)
+            return self.field_cache[start_idx]
+
+        cells = self.flatten_grid(grid)
+        dist = grid_io.state_table(cells, UNREACHED, 'i')
+        parent = grid_io.state_table(cells, -1, 'i')
+        dist[start_idx] = 0
+
+        # Expand one wavefront (all cells at the same distance) at a time
+        frontier = array('i', [start_idx])
+        d = 0
+        while len(frontier) != 0:
+            self.count += len(frontier)
+            d += 1
+            wave = array('i')
+            for idx in frontier:
+                self.note_expansion(idx, len(frontier) + len(wave))
+                for child in self.expand_index(idx, cells):
+                    if dist[child] == UNREACHED:
+                        dist[child] = d
+                        parent[child] = idx
+                        wave.append(child)
+                        self.generated += 1
+            frontier = wave
+
+        size = grid_io.state_bytes(dist) + grid_io.state_bytes(parent)
+        if size <= self.field_cache_bytes:
+            while self.field_cache and (len(self.field_cache) + 1) * size > self.field_cache_bytes:
+                self.field_cache.popitem(last=False)
+            self.field_cache[start_idx] = (dist, parent)
+        return dist, parent
+
+    def invalidate_fields(self):
+        """
+        Empties the distance field cache. Call this after editing a grid that is not a
+        Grid object, since those changes cannot be detected.
+
+        @param self: The PathPlanner object
+        @return none
+        """
+        self.field_cache.clear()
+        self.field_grid = None
+
+    def distance_field_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found, by walking the parent links of start's cached BFS distance field back
+        from the goal. Queries sharing a source only pay for the BFS once; the path is
+        the same one breadth_first_search returns.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        if not self.connected(start, goal, grid):
+            return False
+
+        dist, parent = self.distance_field(start, grid)
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+        if dist[goal_idx] == UNREACHED:
+            return False
+
+        self.trace_path(parent, start.getX() * self.Ncols + start.getY(), goal_idx)
+        return True
+
+    def jump_horizontal(self, idx, dc, cells, goal_idx):
+        """
+        Moves from cell idx along its row in direction dc (+1 right, -1 left) until it
+        reaches the goal, a jump point, or an obstacle. A cell is a jump point when the
+        cell above or below it is free but the one diagonally behind it is blocked,
+        since the search has to turn there.
+
+        @param self: The PathPlanner object
+        @param idx: The index of the cell to jump from
+        @param dc: The column direction, +1 or -1
+        @param cells: The flat grid returned by flatten_grid
+        @param goal_idx: The index of the goal cell
+        @return the index of the cell jumped to, or -1 if there is none
+        """
+        Ncols = self.Ncols
+        last = self.Nrows * Ncols - Ncols
+        c = idx % Ncols
+
+        while True:
+            c += dc
+            if c < 0 or c >= Ncols:
+                return -1
+            idx += dc
+            if cells[idx] != 0:
+                return -1
+            if idx == goal_idx:
+                return idx
+            if idx >= Ncols and cells[idx-Ncols] == 0 and cells[idx-Ncols-dc] != 0:
+                return idx
+            if idx < last and cells[idx+Ncols] == 0 and cells[idx+Ncols-dc] != 0:
+                return idx
+
+    def jump_vertical(self, idx, dr, cells, goal_idx):
+        """
+        Moves from cell idx along its column in direction dr (+1 down, -1 up) until it
+        reaches the goal, an obstacle, or a cell from which a horizontal jump finds
+        something, which makes that cell a jump point.
+
+        @param self: The PathPlanner object
+        @param idx: The index of the cell to jump from
+        @param dr: The row direction, +1 or -1
+        @param cells: The flat grid returned by flatten_grid
+        @param goal_idx: The index of the goal cell
+        @return the index of the cell jumped to, or -1 if there is none
+        """
+        step = dr * self.Ncols
+        size = self.Nrows * self.Ncols
+
+        while True:
+            idx += step
+            if idx < 0 or idx >= size or cells[idx] != 0:
+                return -1
+            if idx == goal_idx:
+                return idx
+            if (self.jump_horizontal(idx, 1, cells, goal_idx) != -1 or
+                    self.jump_horizontal(idx, -1, cells, goal_idx) != -1):
+                return idx
+
+    def jump_point_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using Jump Point Search. Because every move costs 1, runs of cells along
+        a row or column can be skipped over without expanding them; only jump points
+        (where the shortest path may turn) go on the open list. The path has the same
+        length as the one BFS finds, and self.count is the number of jump points expanded.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        Ncols = self.Ncols
+        start_idx = start.getX() * Ncols + start.getY()
+        goal_idx = goal.getX() * Ncols + goal.getY()
+        x2 = goal.getX()
+        y2 = goal.getY()
+
+        closed = grid_io.state_table(cells)
+        g_val = grid_io.state_table(cells, UNREACHED, 'i')
+        parent = grid_io.state_table(cells, -1, 'i')
+        g_val[start_idx] = 0
+
+        # Manhattan distance is the exact cost on an empty 4-connected grid
+        pushed = 0
+        open = [(abs(x2 - start.getX()) + abs(y2 - start.getY()), pushed, start_idx)]
+
+        while (open != []):
+            idx = heapq.heappop(open)[2]
+            if closed[idx]:
+                continue
+            if idx == goal_idx:
+                self.trace_jumps(parent, start_idx, goal_idx)
+                return True
+            closed[idx] = 1
+            self.count += 1
+            self.note_expansion(idx, len(open))
+
+            # Directions to jump in, pruned by the direction the node was reached from
+            r, c = divmod(idx, Ncols)
+            if parent[idx] == -1:
+                vertical = (1, -1)
+                horizontal = (1, -1)
+            else:
+                pr, pc = divmod(parent[idx], Ncols)
+                if pr == r:
+                    dc = 1 if c > pc else -1
+                    horizontal = (dc,)
+                    vertical = []
+                    if r > 0 and cells[idx-Ncols] == 0 and cells[idx-Ncols-dc] != 0:
+                        vertical.append(-1)
+                    if r < self.Nrows-1 and cells[idx+Ncols] == 0 and cells[idx+Ncols-dc] != 0:
+                        vertical.append(1)
+                else:
+                    vertical = (1 if r > pr else -1,)
+                    horizontal = (1, -1)
+
+            successors = []
+            for dr in vertical:
+                successors.append(self.jump_vertical(idx, dr, cells, goal_idx))
+            for dc in horizontal:
+                successors.append(self.jump_horizontal(idx, dc, cells, goal_idx))
+
+            for child in successors:
+                if child == -1 or closed[child]:
+                    continue
+                x1, y1 = divmod(child, Ncols)
+                g = g_val[idx] + abs(x1 - r) + abs(y1 - c)
+                if g >= g_val[child]:
+                    continue
+                g_val[child] = g
+                parent[child] = idx
+                pushed += 1
+                heapq.heappush(open, (g + abs(x2 - x1) + abs(y2 - y1), pushed, child))
+                self.generated += 1
+
+        return False
+
+    def trace_jumps(self, parent, start_idx, goal_idx):
+        """
+        Follows the jump point parent links back from the goal and stores the full
+        cell-by-cell path from start to goal in self.visited_str.
+
+        @param self: The PathPlanner object
+        @param parent: A flat array holding each jump point's parent index
+        @param start_idx: The index of the start cell
+        @param goal_idx: The index of the goal cell
+        @return none
+        """
+        jumps = [goal_idx]
+        while jumps[-1] != start_idx:
+            jumps.append(parent[jumps[-1]])
+        jumps.reverse()
+
+        path = [start_idx]
+        for idx in jumps[1:]:
+            # Consecutive jump points share a row or a column
+            step = self.Ncols if abs(idx - path[-1]) >= self.Ncols else 1
+            if idx < path[-1]:
+                step = -step
+            path.extend(range(path[-1] + step, idx + step, step))
+
+        self.visited_str = ["%d, %d" % divmod(idx, self.Ncols) for idx in path]
+
+    def trace_meeting(self, parent_f, parent_b, start_idx, goal_idx, meet_f, meet_b):
+        """
+        Stores the path of a bidirectional search in self.visited_str: the forward
+        parents lead from meet_f back to the start and the backward parents lead from
+        meet_b on to the goal.
+
+        @param self: The PathPlanner object
+        @param parent_f: The forward search's parent array
+        @param parent_b: The backward search's parent array
+        @param start_idx: The index of the start cell
+        @param goal_idx: The index of the goal cell
+        @param meet_f: The forward side's cell of the edge where the searches met
+        @param meet_b: The backward side's cell of that edge (may equal meet_f)
+        @return none
+        """
+        path = [meet_f]
+        while path[-1] != start_idx:
+            path.append(parent_f[path[-1]])
+        path.reverse()
+
+        if meet_b != meet_f:
+            path.append(meet_b)
+        while path[-1] != goal_idx:
+            path.append(parent_b[path[-1]])
+
+        self.visited_str = ["%d, %d" % divmod(idx, self.Ncols) for idx in path]
+
+    def bidirectional_breadth_first_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using a bidirectional BFS. One BFS grows from the start and one from the
+        goal; each step expands a full level of whichever side has done less work so
+        far (expansions plus frontier size), which keeps the two sides balanced even in
+        corridors. When a level touches the other search, the shortest connection found
+        in that level is the shortest path. self.side_counts holds the (forward, backward) expansions.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        self.side_counts = [0, 0]
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        start_idx = start.getX() * self.Ncols + start.getY()
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+        if start_idx == goal_idx:
+            # The two searches would only meet again one step away and back
+            self.visited_str = ["%d, %d" % divmod(start_idx, self.Ncols)]
+            return True
+
+        # Index 0 is the forward search (from start), index 1 the backward search
+        dist = (grid_io.state_table(cells, UNREACHED, 'i'),
+                grid_io.state_table(cells, UNREACHED, 'i'))
+        parent = (grid_io.state_table(cells, -1, 'i'),
+                  grid_io.state_table(cells, -1, 'i'))
+        frontier = [array('i', [start_idx]), array('i', [goal_idx])]
+        dist[0][start_idx] = 0
+        dist[1][goal_idx] = 0
+
+        best = UNREACHED
+        meet = None
+        while len(frontier[0]) != 0 and len(frontier[1]) != 0:
+            side = 0 if self.side_counts[0] + len(frontier[0]) <= self.side_counts[1] + len(frontier[1]) else 1
+            mine = dist[side]
+            other = dist[1 - side]
+
+            wave = array('i')
+            for idx in frontier[side]:
+                self.side_counts[side] += 1
+                self.note_expansion(idx, len(frontier[0]) + len(frontier[1]) + len(wave))
+                for child in self.expand_index(idx, cells):
+                    if other[child] != UNREACHED and mine[idx] + 1 + other[child] < best:
+                        best = mine[idx] + 1 + other[child]
+                        meet = (idx, child) if side == 0 else (child, idx)
+                    if mine[child] == UNREACHED:
+                        mine[child] = mine[idx] + 1
+                        parent[side][child] = idx
+                        wave.append(child)
+                        self.generated += 1
+            frontier[side] = wave
+
+            if meet is not None:
+                self.count += self.side_counts[0] + self.side_counts[1]
+                self.trace_meeting(parent[0], parent[1], start_idx, goal_idx, meet[0], meet[1])
+                return True
+
+        self.count += self.side_counts[0] + self.side_counts[1]
+        return False
+
+    def bidirectional_a_star_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using a bidirectional A*. One A* searches from the start towards the goal
+        and one from the goal towards the start, both with the Manhattan distance as
+        h(x); each step expands from whichever side has done less work so far. The
+        search stops once the best connection found is no longer than the least f on
+        either open list, which makes it the shortest path. self.side_counts holds the
+        (forward, backward) expansions.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        self.side_counts = [0, 0]
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        Ncols = self.Ncols
+        start_idx = start.getX() * Ncols + start.getY()
+        goal_idx = goal.getX() * Ncols + goal.getY()
+        targets = (divmod(goal_idx, Ncols), divmod(start_idx, Ncols))
+        if start_idx == goal_idx:
+            # The two searches would only meet again one step away and back
+            self.visited_str = ["%d, %d" % targets[0]]
+            return True
+
+        # Index 0 is the forward search (from start), index 1 the backward search
+        g_val = (grid_io.state_table(cells, UNREACHED, 'i'),
+                 grid_io.state_table(cells, UNREACHED, 'i'))
+        parent = (grid_io.state_table(cells, -1, 'i'),
+                  grid_io.state_table(cells, -1, 'i'))
+        closed = (grid_io.state_table(cells), grid_io.state_table(cells))
+        g_val[0][start_idx] = 0
+        g_val[1][goal_idx] = 0
+
+        pushed = 0
+        h = abs(targets[0][0] - targets[1][0]) + abs(targets[0][1] - targets[1][1])
+        open = ([(h, 0, start_idx)], [(h, 0, goal_idx)])
+
+        best = UNREACHED
+        meet = None
+        while open[0] != [] and open[1] != []:
+            if best <= open[0][0][0] or best <= open[1][0][0]:
+                break
+
+            side = 0 if self.side_counts[0] + len(open[0]) <= self.side_counts[1] + len(open[1]) else 1
+            idx = heapq.heappop(open[side])[2]
+            if closed[side][idx]:
+                continue
+            closed[side][idx] = 1
+            self.side_counts[side] += 1
+            self.note_expansion(idx, len(open[0]) + len(open[1]))
+
+            mine = g_val[side]
+            other = g_val[1 - side]
+            tx, ty = targets[side]
+            g = mine[idx] + 1
+            for child in self.expand_index(idx, cells):
+                if other[child] != UNREACHED and g + other[child] < best:
+                    best = g + other[child]
+                    meet = (idx, child) if side == 0 else (child, idx)
+                if closed[side][child] or g >= mine[child]:
+                    continue
+                mine[child] = g
+                parent[side][child] = idx
+                x1, y1 = divmod(child, Ncols)
+                pushed += 1
+                heapq.heappush(open[side], (g + abs(tx - x1) + abs(ty - y1), pushed, child))
+                self.generated += 1
+
+        self.count += self.side_counts[0] + self.side_counts[1]
+        if meet is None:
+            return False
+        self.trace_meeting(parent[0], parent[1], start_idx, goal_idx, meet[0], meet[1])
+        return True
+
+    def hierarchical_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using hierarchical path finding (HPA*, see hpa.py). The grid's abstract
+        graph is built on first use unless one was attached when the grid was loaded.
+        The path is close to, but not always exactly, the shortest one; self.count is
+        the number of abstract nodes expanded.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        graph = getattr(grid, 'hpa', None)
+        if graph is None:
+            graph = hpa.ClusterGraph.build(grid_io.Grid(self.Nrows, self.Ncols, cells))
+            if isinstance(grid, grid_io.Grid):
+                grid.hpa = graph
+
+        path, expansions = graph.find_path(cells, start.getX() * self.Ncols + start.getY(),
+                                           goal.getX() * self.Ncols + goal.getY())
+        self.count += expansions
+        self.generated = None
+        self.peak_frontier = None
+        if path is None:
+            return False
+
+        self.visited_str = ["%d, %d" % divmod(idx, self.Ncols) for idx in path]
+        return True
+
+    def landmark_search(self, start, goal, grid):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using A* with the ALT heuristic (see landmarks.py): the largest
+        triangle-inequality bound |d(L, goal) - d(L, n)| over a few precomputed
+        landmarks L, or the Manhattan distance if that is larger. Both are lower
+        bounds, so the path is a shortest one. The landmark tables are built on first
+        use unless they were attached when the grid was loaded.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @return True if a path was found, False otherwise
+        """
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        table = getattr(grid, 'landmarks', None)
+        if table is None:
+            table = landmarks.LandmarkTable.build(grid_io.Grid(self.Nrows, self.Ncols, cells))
+            if isinstance(grid, grid_io.Grid):
+                grid.landmarks = table
+
+        Ncols = self.Ncols
+        start_idx = start.getX() * Ncols + start.getY()
+        goal_idx = goal.getX() * Ncols + goal.getY()
+        x2 = goal.getX()
+        y2 = goal.getY()
+        dist = table.dist
+        bounds = table.goal_bounds(goal_idx, start_idx, landmarks.ACTIVE_LANDMARKS)
+
+        closed = grid_io.state_table(cells)
+        g_val = grid_io.state_table(cells, UNREACHED, 'i')
+        parent = grid_io.state_table(cells, -1, 'i')
+        g_val[start_idx] = 0
+
+        # Ties between equal f values go to the smaller h, as in a_star_search
+        pushed = 0
+        open = [(0, 0, pushed, start_idx)]
+
+        while (open != []):
+            idx = heapq.heappop(open)[3]
+            if closed[idx]:
+                continue
+
+            self.count += 1
+            self.note_expansion(idx, len(open))
+            g = g_val[idx] + 1
+            for child in self.expand_index(idx, cells):
+                if child == goal_idx:
+                    parent[child] = idx
+                    self.trace_path(parent, start_idx, goal_idx)
+                    return True
+
+                if closed[child] or g >= g_val[child]:
+                    continue
+
+                g_val[child] = g
+                parent[child] = idx
+                x1, y1 = divmod(child, Ncols)
+                h = abs(x2 - x1) + abs(y2 - y1)
+                for offset, dg in bounds:
+                    d = abs(dg - dist[offset + child])
+                    if d > h:
+                        h = d
+                pushed += 1
+                heapq.heappush(open, (g + h, h, pushed, child))
+                self.generated += 1
+
+            closed[idx] = 1
+
+        return False
+
+    def anytime_search(self, start, goal, grid, time_budget=None, expansion_budget=None,
+                       epsilon=ANYTIME_EPSILON, step=ANYTIME_STEP):
+        """
+        Given a grid environment, return True if a path from start to goal is found
+        within the budget, using anytime repairing A* (ARA*). A first path is found
+        quickly with the heuristic inflated by epsilon; epsilon is then lowered by
+        step on each pass, reusing the previous pass's work, until the path is proven
+        shortest or the budget runs out. The best path found so far is kept in
+        self.visited_str, and self.suboptimality holds the proven bound on how many
+        times longer than the shortest path it may be (1.0 once it is shortest).
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @param time_budget: The time allowed in milliseconds, or None for no limit
+        @param expansion_budget: The number of expansions allowed, or None for no limit
+        @param epsilon: The starting inflation of the heuristic (at least 1)
+        @param step: How much epsilon is lowered after each pass
+        @return True if a path was found, False otherwise
+        """
+        self.suboptimality = None
+        if not self.connected(start, goal, grid):
+            return False
+
+        deadline = None
+        if time_budget is not None:
+            deadline = time.perf_counter() + time_budget / 1000.0
+
+        cells = self.flatten_grid(grid)
+        Ncols = self.Ncols
+        start_idx = start.getX() * Ncols + start.getY()
+        goal_idx = goal.getX() * Ncols + goal.getY()
+        x2 = goal.getX()
+        y2 = goal.getY()
+
+        g_val = grid_io.state_table(cells, UNREACHED, 'i')
+        parent = grid_io.state_table(cells, -1, 'i')
+        # closed[idx] is the number of the pass that expanded idx, so a new pass does
+        # not have to clear it
+        closed = grid_io.state_table(cells, 0, 'i')
+        g_val[start_idx] = 0
+
+        # Manhattan distance is a consistent heuristic for 4-connected unit-cost moves
+        epsilon = max(epsilon, 1.0)
+        pushed = 0
+        open = [(epsilon * (abs(x2 - start.getX()) + abs(y2 - start.getY())), pushed, start_idx)]
+        incons = set()
+        found = False
+        iteration = 1
+        expansions = 0
+
+        while True:
+            # One weighted A* pass: expand until no open entry could improve the goal
+            while open and open[0][0] < g_val[goal_idx]:
+                f, _, idx = heapq.heappop(open)
+                if closed[idx] == iteration:
+                    continue
+                x1, y1 = divmod(idx, Ncols)
+                if f != g_val[idx] + epsilon * (abs(x2 - x1) + abs(y2 - y1)):
+                    continue
+                closed[idx] = iteration
+
+                self.count += 1
+                expansions += 1
+                self.note_expansion(idx, len(open))
+                if expansion_budget is not None and expansions >= expansion_budget:
+                    return found
+                if deadline is not None and (expansions & 63) == 0 and time.perf_counter() > deadline:
+                    return found
+
+                g = g_val[idx] + 1
+                for child in self.expand_index(idx, cells):
+                    if g >= g_val[child]:
+                        continue
+                    g_val[child] = g
+                    parent[child] = idx
+                    if closed[child] == iteration:
+                        # Already expanded this pass; it is revisited in the next one
+                        incons.add(child)
+                    else:
+                        x1, y1 = divmod(child, Ncols)
+                        pushed += 1
+                        heapq.heappush(open, (g + epsilon * (abs(x2 - x1) + abs(y2 - y1)), pushed, child))
+                        self.generated += 1
+
+            if g_val[goal_idx] == UNREACHED:
+                return False
+
+            # Publish this pass's path and the bound g(goal) / min(g + h) over every
+            # cell that could still lead to a shorter path
+            found = True
+            self.trace_path(parent, start_idx, goal_idx)
+            waiting = incons.union(idx for _, _, idx in open if closed[idx] != iteration)
+            lower = g_val[goal_idx]
+            for idx in waiting:
+                x1, y1 = divmod(idx, Ncols)
+                lower = min(lower, g_val[idx] + abs(x2 - x1) + abs(y2 - y1))
+            self.suboptimality = max(1.0, min(epsilon, float(g_val[goal_idx]) / max(lower, 1)))
+            if self.suboptimality == 1.0:
+                return True
+
+            # Lower epsilon and re-key every waiting cell for the next pass
+            epsilon = max(1.0, epsilon - step)
+            iteration += 1
+            open = []
+            for idx in waiting:
+                x1, y1 = divmod(idx, Ncols)
+                pushed += 1
+                open.append((g_val[idx] + epsilon * (abs(x2 - x1) + abs(y2 - y1)), pushed, idx))
+            heapq.heapify(open)
+            incons = set()
+
+    def weighted_search(self, start, goal, grid, diagonal=False):
+        """
+        Given a weighted grid environment, return True if a cheapest path from start to
+        goal is found using Dijkstra's algorithm with a bucket queue (see weighted.py).
+        Entering a cell costs the grid's cost for that cell, and with diagonal=True
+        moves are 8-connected. The path's cost is stored in self.path_cost. Grids
+        without costs are searched as if every cell cost 1.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place.
+        @param diagonal: If True, diagonal moves are allowed
+        @return True if a path was found, False otherwise
+        """
+        if not self.connected(start, goal, grid):
+            return False
+
+        cells = self.flatten_grid(grid)
+        costs = getattr(grid, 'costs', None)
+        start_idx = start.getX() * self.Ncols + start.getY()
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+
+        cost, parent, expansions, generated = weighted.dial_search(cells, costs, self.Nrows, self.Ncols,
+                                                                   start_idx, goal_idx, diagonal,
+                                                                   self.note_expansion)
+        self.count += expansions
+        self.generated += generated
+        if cost == weighted.UNREACHED:
+            return False
+
+        self.path_cost = cost / weighted.move_costs(diagonal)[0]
+        self.trace_path(parent, start_idx, goal_idx)
+        return True
+
+    def incremental_search(self, start, goal, grid, changes=None):
+        """
+        Given a grid environment, return True if a valid path from start to goal is
+        found using D* Lite (see incremental.py). The search state is kept between
+        calls: later calls with the same grid and goal apply the list of changed cells
+        and only re-expand the nodes the changes affect, and a new start is handled
+        without replanning. self.count is the number of nodes (re-)expanded by this call.
+
+        @param self: The PathPlanner object
+        @param start: The node to begin search at.
+        @param goal: The node being searched for.
+        @param grid: The grid environment in which the search takes place. Changes are
+                     written to it, so a Grid object must not be memory-mapped.
+        @param changes: A list of (row, col, value) tuples; value 1 blocks the cell
+                        and 0 frees it
+        @return True if a path was found, False otherwise
+        """
+        start_idx = start.getX() * self.Ncols + start.getY()
+        goal_idx = goal.getX() * self.Ncols + goal.getY()
+
+        if self.dstar is None or self.dstar_grid is not grid or self.dstar.goal_idx != goal_idx:
+            if isinstance(grid, grid_io.Grid):
+                state_grid = grid
+            else:
+                # Plain 2D arrays are copied once; later changes go to the copy and to grid
+                state_grid = grid_io.Grid(self.Nrows, self.Ncols, bytearray(self.flatten_grid(grid)))
+            self.dstar = incremental.DStarLite(state_grid, start_idx, goal_idx)
+            self.dstar_grid = grid
+        elif self.dstar.start_idx != start_idx:
+            self.dstar.move_start(start_idx)
+
+        if changes:
+            self.dstar.update_cells(changes)
+            if not isinstance(grid, grid_io.Grid):
+                for x, y, value in changes:
+                    grid[x][y] = value
+
+        path = self.dstar.find_path()
+        self.count += self.dstar.expansions
+        self.generated = None
+        self.peak_frontier = None
+        if path is None:
+            return False
+
+        self.visited_str = ["%d, %d" % divmod(idx, self.Ncols) for idx in path]
+        return True
+
+def run_search(PathPlan, search_type, start, goal, grid):
+    """
+    Runs the search named by search_type on the given PathPlanner.
+
+    @param PathPlan: The PathPlanner object to search with
+    @param search_type: One of the names in SEARCH_TYPES
+    @param start: The node to begin search at.
+    @param goal: The node being searched for.
+    @param grid: The grid environment in which the search takes place.
+    @return True if a path was found, False otherwise
+    """
+    if (search_type == "BFS"):
+        return PathPlan.breadth_first_search(start, goal, grid)
+    elif (search_type == "BFS-BI"):
+        return PathPlan.bidirectional_breadth_first_search(start, goal, grid)
+    elif (search_type == "BFS-FIELD"):
+        return PathPlan.distance_field_search(start, goal, grid)
+    elif (search_type == "DFS"):
+        return PathPlan.depth_first_search(start, goal, grid)
+    elif (search_type == "DFS-PLAIN"):
+        return PathPlan.depth_first_search(start, goal, grid, deepening=False)
+    elif (search_type == "A*"):
+        return PathPlan.a_star_search(start, goal, grid)
+    elif (search_type == "A*-ALT"):
+        return PathPlan.landmark_search(start, goal, grid)
+    elif (search_type == "A*-ANYTIME"):
+        return PathPlan.anytime_search(start, goal, grid, PathPlan.time_budget, PathPlan.expansion_budget)
+    elif (search_type == "A*-BI"):
+        return PathPlan.bidirectional_a_star_search(start, goal, grid)
+    elif (search_type == "JPS"):
+        return PathPlan.jump_point_search(start, goal, grid)
+    elif (search_type == "HPA*"):
+        return PathPlan.hierarchical_search(start, goal, grid)
+    elif (search_type == "DIJKSTRA"):
+        return PathPlan.weighted_search(start, goal, grid)
+    elif (search_type == "DIJKSTRA-8"):
+        return PathPlan.weighted_search(start, goal, grid, diagonal=True)
+    raise ValueError("Invalid SEARCH_TYPE: %s" % search_type)
+
+def run_isolated_search(task):
+    """
+    Runs one search of an ALL comparison inside its own worker process, on a fresh
+    PathPlanner and fresh start and goal Nodes, against the grid in shared memory.
+
+    @param task: A tuple (shared memory name, Nrows, Ncols, weighted, grid filename,
+                 search type, (row, col) of the start, (row, col) of the goal, compact,
+                 (time in ms, expansions) budgets, trace_memory)
+    @return a SearchResult object
+    """
+    (shm_name, Nrows, Ncols, weighted, filename, search_type, start, goal,
+     compact, budgets, trace_memory) = task
+    if shm_name is None:
+        # Tiled grids are not copied: each worker reads the chunks it needs from the file
+        shm = None
+        grid = grid_io.load_grid(filename)
+    else:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        size = Nrows * Ncols
+        costs = shm.buf[size:2 * size].toreadonly() if weighted else None
+        grid = grid_io.Grid(Nrows, Ncols, shm.buf[:size].toreadonly(), costs=costs)
+    components.attach_labels(grid, filename)
+
+    PathPlan = PathPlanner(Nrows, Ncols, compact=compact)
+    PathPlan.time_budget, PathPlan.expansion_budget = budgets
+    result = PathPlan.search(search_type, Node(*start), Node(*goal), grid, trace_memory=trace_memory)
+
+    if shm is None:
+        grid.close()
+    else:
+        # The block can only be closed once nothing holds a view of it
+        del PathPlan, grid, costs
+        shm.close()
+    return result
+
+def run_all(filename, grid, search_types, start, goal, compact, budgets, trace_memory=False):
+    """
+    Runs several searches at once, each in its own process with its own PathPlanner,
+    so no search sees the Nodes or counters of another. The grid is copied once into
+    a shared memory block that every worker reads without copying, and the wall time
+    of the whole comparison is that of the slowest search rather than the sum. A tiled
+    grid is not copied; each worker opens the file and caches its own chunks.
+
+    @param filename: The name of the grid file, used to find its saved labels
+    @param grid: The Grid object to search
+    @param search_types: A list of names from SEARCH_TYPES
+    @param start: The (row, col) of the start cell
+    @param goal: The (row, col) of the goal cell
+    @param compact: True if the searches should run in compact mode
+    @param budgets: The (time in ms, expansions) budgets of an A*-ANYTIME search
+    @param trace_memory: If True, measure each search's peak memory with tracemalloc
+    @return a list of SearchResult objects, in the order of search_types
+    """
+    size = grid.Nrows * grid.Ncols
+    weighted = grid.costs is not None
+    shm = None
+    if not isinstance(grid, grid_io.TiledGrid):
+        shm = shared_memory.SharedMemory(create=True, size=max(2 * size if weighted else size, 1))
+    try:
+        if shm is not None:
+            shm.buf[:size] = grid.cells
+            if weighted:
+                shm.buf[size:2 * size] = grid.costs
+        tasks = [(shm.name if shm is not None else None, grid.Nrows, grid.Ncols, weighted, filename,
+                  search_type, start, goal, compact, budgets, trace_memory) for search_type in search_types]
+        with Pool(len(tasks), maxtasksperchild=1) as pool:
+            return pool.map(run_isolated_search, tasks, chunksize=1)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+def print_table(results, wall_time):
+    """
+    Prints the results of several searches side by side.
+
+    @param results: A list of SearchResult objects
+    @param wall_time: The seconds the whole comparison took
+    @return none
+    """
+    print("%-12s %8s %12s %12s %10s" % ("Search", "Length", "Expansions", "Generated", "Time (s)"))
+    for result in results:
+        print("%-12s %8s %12d %12s %10.4f" % (result.search_type,
+              "-" if result.path is None else len(result.path) - 1, result.expansions,
+              "-" if result.generated is None else result.generated, result.wall_time))
+    print("Wall time: %.4f s (searches alone: %.4f s)" % (wall_time, sum(r.wall_time for r in results)))
+
+def print_result(result):
+    """
+    Prints a search result: the path, the number of nodes traversed, and any
+    statistics that only some searches report.
+
+    @param result: A SearchResult object
+    @return none
+    """
+    print("Path: [" + ", ".join("(%d, %d)" % cell for cell in result.path) + "]")
+    print("Traversed:", result.expansions)
+    if result.cost is not None:
+        print("Cost: %g" % result.cost)
+    if result.suboptimality is not None:
+        print("Suboptimality bound: %.3f" % result.suboptimality)
+    if result.side_counts is not None:
+        print("Traversed (forward, backward): %d, %d" % tuple(result.side_counts))
+    if result.chunk_cache is not None:
+        cache = result.chunk_cache
+        print("Chunk cache: %d hits, %d misses (%.1f%% hit rate), %d evictions" %
+              (cache["hits"], cache["misses"], 100 * (cache["hit_rate"] or 0), cache["evictions"]))
+
 def main():
     """
     Given a file containing the specifications of a grid environment, a starting coordinate,
@@ -392,41 +1781,65 @@ def main():
     @return 0 at end of process
     """
 
-    if (len(sys.argv) != 9):
-        sys.exit("Usage: python main.py --input FILENAME --start START_NODE --goal GOAL_NODE --search SEARCH_TYPE")
+    usage = ("Usage: python main.py --input FILENAME --start START_NODE --goal GOAL_NODE --search SEARCH_TYPE"
+             " [--compact] [--budget MS] [--max-expansions N] [--json] [--memory] [--profile]")
+    if (len(sys.argv) < 9):
+        sys.exit(usage)
 
     if (sys.argv[1] != "--input" or sys.argv[3] != "--start" or sys.argv[5] != "--goal" or sys.argv[7] != "--search"):
-        sys.exit("Usage: python main.py --input FILENAME --start START_NODE --goal GOAL_NODE --search SEARCH_TYPE")
+        sys.exit(usage)
+
+    # Optional flags: compact mode, the budgets of an A*-ANYTIME search, JSON output,
+    # peak memory tracing and profiling
+    compact = False
+    time_budget = None
+    expansion_budget = None
+    json_output = False
+    trace_memory = False
+    profile = False
+    i = 9
+    while i < len(sys.argv):
+        if sys.argv[i] == "--compact":
+            compact = True
+            i += 1
+        elif sys.argv[i] == "--json":
+            json_output = True
+            i += 1
+        elif sys.argv[i] == "--memory":
+            trace_memory = True
+            i += 1
+        elif sys.argv[i] == "--profile":
+            profile = True
+            i += 1
+        elif sys.argv[i] == "--budget" and i+1 < len(sys.argv) and sys.argv[i+1].replace('.', '', 1).isnumeric():
+            time_budget = float(sys.argv[i+1])
+            i += 2
+        elif sys.argv[i] == "--max-expansions" and i+1 < len(sys.argv) and sys.argv[i+1].isnumeric():
+            expansion_budget = int(sys.argv[i+1])
+            i += 2
+        else:
+            sys.exit(usage)
 
     start = sys.argv[4]
     end = sys.argv[6]
     search_type = sys.argv[8]
 
-    # Read file
-    with open(sys.argv[2], 'r') as file:
-        Nrows = 0
-        grid = []
-        gridline = []
-
-        for line in file:
-            Nrows += 1
-            Ncols = 0
-            for i in line:
-                if (i == '0'):
-                    gridline.append(0)
-                    Ncols += 1          
-                elif (i == '1'):
-                    gridline.append(1)
-                    Ncols += 1
-                elif (i == ','):
-                    continue
-                elif (i == '\n'):
-                    break
-                else:
-                    sys.exit("File contains invalid character")
-            grid.append(gridline)
-            gridline = []
-    file.close()
+    # Read file (comma-separated text, or a memory-mapped .npy grid)
+    try:
+        grid = grid_io.load_grid(sys.argv[2])
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+    components.attach_labels(grid, sys.argv[2])
+    # Keep stdout to the JSON document alone in --json mode
+    info = sys.stderr if json_output else sys.stdout
+    if search_type == "HPA*" and not hpa.attach_graph(grid, sys.argv[2]):
+        grid.hpa = hpa.ClusterGraph.build(grid)
+        print("Preprocessing time: %.3f s" % grid.hpa.build_time, file=info)
+    if search_type == "A*-ALT" and not landmarks.attach_landmarks(grid, sys.argv[2]):
+        grid.landmarks = landmarks.LandmarkTable.build(grid)
+        print("Preprocessing time: %.3f s" % grid.landmarks.build_time, file=info)
+    Nrows = grid.Nrows
+    Ncols = grid.Ncols
 
     # Check for valid Start coordinate
     coordinate = start.split(',')
@@ -437,7 +1850,7 @@ def main():
             sys.exit("START_NODE invalid: obstacle in the way.")
     else:
         print("START_NODE and GOAL_NODE must be in coordinate form.")
-        sys.exit("Usage: python main.py --input FILENAME --start START_NODE --goal GOAL_NODE --search SEARCH_TYPE")
+        sys.exit(usage)
 
     root = Node(coordinate[0], coordinate[1])
 
@@ -450,7 +1863,7 @@ def main():
             sys.exit("GOAL_NODE invalid: obstacle in the way.")
     else:
         print("START_NODE and GOAL_NODE must be in coordinate form.")
-        sys.exit("Usage: python main.py --input FILENAME --start START_NODE --goal GOAL_NODE --search SEARCH_TYPE")
+        sys.exit(usage)
 
     goal = Node(coordinate[0], coordinate[1])
 
@@ -458,74 +1871,52 @@ def main():
         sys.exit("GOAL_NODE is the START_NODE, no need to search")
 
     # Instansiate PathPlanner Object and Carry out Search
-    PathPlan = PathPlanner(Nrows, Ncols)
-    if (search_type == "BFS"):
-        path_found = PathPlan.breadth_first_search(root, goal, grid)
-
-    elif (search_type == "DFS"): 
-        path_found = PathPlan.depth_first_search(root, goal, grid)
+    PathPlan = PathPlanner(Nrows, Ncols, compact=compact)
+    PathPlan.time_budget = time_budget
+    PathPlan.expansion_budget = expansion_budget
+    if (search_type not in SEARCH_TYPES and search_type != "ALL"):
+        print("Invalid SEARCH_TYPE...")
+        sys.exit("Options are: " + " | ".join(SEARCH_TYPES) + " | ALL")
 
-    elif (search_type == "A*"):
-        path_found = PathPlan.a_star_search(root, goal, grid)
-
-    elif (search_type == "ALL"):
-        bfs_path = PathPlan.breadth_first_search(root, goal, grid)
-        if bfs_path:
-            # Print out path and number of nodes traversed
-            print("Path: " + '[', end='')
-            for i in range(0, len(PathPlan.visited_str)):
-                if i == len(PathPlan.visited_str)-1 :
-                    print('(' + PathPlan.visited_str[i], end=')]')
-                    break
-                print('(' + PathPlan.visited_str[i], end='), ')
-            print("\nTraversed:", PathPlan.getCount())
-        else:
-            sys.exit("Path could not be found.")
-
-        PathPlan.count = 0
-        PathPlan.visited_str = []
-        dfs_path = PathPlan.depth_first_search(root, goal, grid)
-        if dfs_path:
-            # Print out path and number of nodes traversed
-            print("Path: " + '[', end='')
-            for i in range(0, len(PathPlan.visited_str)):
-                if i == len(PathPlan.visited_str)-1 :
-                    print('(' + PathPlan.visited_str[i], end=')]')
-                    break
-                print('(' + PathPlan.visited_str[i], end='), ')
-            print("\nTraversed:", PathPlan.getCount())
-        else:
-            sys.exit("Path could not be found")
-        
-        PathPlan.count = 0
-        PathPlan.visited_str = []
-        astar_path = PathPlan.a_star_search(root, goal, grid)
-        # Print out path and number of nodes traversed
-        print("Path: " + '[', end='')
-        for i in range(0, len(PathPlan.visited_str)):
-            if i == len(PathPlan.visited_str)-1 :
-                print('(' + PathPlan.visited_str[i], end=')]')
-                break
-            print('(' + PathPlan.visited_str[i], end='), ')
-        print("\nTraversed:", PathPlan.getCount())
+    begin = time.perf_counter()
+    if (search_type == "ALL" and not profile):
+        results = run_all(sys.argv[2], grid, ALL_SEARCHES, (root.getX(), root.getY()), (goal.getX(), goal.getY()),
+                          compact, (time_budget, expansion_budget), trace_memory)
+    else:
+        # A profile has to be taken in this process, so ALL runs its searches one after
+        # another, each still on its own PathPlanner and Nodes
+        profiler = cProfile.Profile() if profile else None
+        results = []
+        for name in (ALL_SEARCHES if search_type == "ALL" else [search_type]):
+            if results:
+                PathPlan = PathPlanner(Nrows, Ncols, compact=compact)
+                root = Node(root.getX(), root.getY())
+                goal = Node(goal.getX(), goal.getY())
+            if profiler is not None:
+                profiler.enable()
+            results.append(PathPlan.search(name, root, goal, grid, trace_memory=trace_memory))
+            if profiler is not None:
+                profiler.disable()
+
+        if profiler is not None:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("tottime").print_stats(15)
+    wall_time = time.perf_counter() - begin
+
+    if json_output:
+        print(json.dumps(results[0].to_dict() if search_type != "ALL" else [r.to_dict() for r in results]))
         return 0
 
-    else:
-        print("Invalid SEARCH_TYPE...")
-        sys.exit("Options are: BFS | DFS | A* | ALL")
+    if search_type == "ALL":
+        for result in results:
+            if result.found:
+                print(result.search_type + ":")
+                print_result(result)
+        print_table(results, wall_time)
+        return 0
 
-    if not path_found:
+    if not results[0].found:
         sys.exit("Could not find a path.")
-        
-    # Print out path and number of nodes traversed
-    print("Path: " + '[', end='')
-    for i in range(0, len(PathPlan.visited_str)):
-        if i == len(PathPlan.visited_str)-1 :
-            print('(' + PathPlan.visited_str[i], end=')]')
-            break
-        print('(' + PathPlan.visited_str[i], end='), ')
-    print("\nTraversed:", PathPlan.getCount())
-
+    print_result(results[0])
     return 0
 
 if __name__ == '__main__':
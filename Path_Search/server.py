@@ -0,0 +1,489 @@
+"""
+Author: Caroline Rinks
+Runs a long-lived path planning server, so queries do not pay for starting Python and
+loading the grid every time. Named grids are loaded once and kept resident; a grid
+whose file changes on disk is reloaded automatically. Searches run in a pool of worker
+processes, so the event loop stays free to accept new requests while they run.
+
+Every grid the server has checked is copied, with the labels, abstract graph and landmark
+tables saved next to it, to a snapshot in a private temporary folder, and the workers load
+the snapshot rather than the original file. A worker started after the file was replaced
+by one that cannot be read still gets the last grid that could. A snapshot that has been
+replaced is deleted once no request still being answered was given it. Reloads of a grid run
+one at a time, and a file that failed to load is not tried again until it changes.
+
+Usage:
+
+    python3 server.py --grid NAME=FILENAME [--grid NAME=FILENAME ...] [--socket PATH | --port PORT]
+                      [--workers N] [--compact]
+
+The server listens on a Unix socket (default /tmp/path_search.sock) or, with --port, on
+localhost TCP. Each request is one line of JSON and each reply is one line of JSON. Requests
+on one connection may be answered out of order; replies carry the request's "id".
+
+    {"id": 1, "grid": "NAME", "start": "0,0", "goal": "9,9", "search": "A*"}
+    {"id": 2, "op": "grids"}
+    {"id": 3, "op": "reload", "grid": "NAME"}
+
+Coordinates may also be given as [row, col] lists. Path requests may also give "budget" (ms)
+and "max_expansions" for A*-ANYTIME.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import batch
+import components
+import grid_io
+import hpa
+import landmarks
+import main as m
+
+USAGE = ("Usage: python server.py --grid NAME=FILENAME [--grid NAME=FILENAME ...] [--socket PATH | --port PORT]"
+         " [--workers N] [--compact]")
+
+DEFAULT_SOCKET = "/tmp/path_search.sock"
+
+# Seconds between checks for changed grid files
+RELOAD_INTERVAL = 1.0
+
+# Per-process cache of loaded grids: name -> (generation, Grid, PathPlanner)
+worker_grids = {}
+
+def load_grid(filename):
+    """
+    Loads a grid file together with any component labels, abstract graph and landmark
+    tables saved next to it.
+
+    @param filename: The name of the grid file
+    @return a Grid object
+    """
+    grid = grid_io.load_grid(filename)
+    components.attach_labels(grid, filename)
+    hpa.attach_graph(grid, filename)
+    landmarks.attach_landmarks(grid, filename)
+    return grid
+
+def snapshot(filename, copy):
+    """
+    Copies a grid file and the labels, abstract graph and landmark tables saved next to
+    it. File times are copied too, so the saved tables are still recognized as up to date.
+
+    @param filename: The name of the grid file
+    @param copy: The name of the copy, with the same extension
+    @return none
+    """
+    shutil.copy2(filename, copy)
+    for side_file in (components.labels_filename, hpa.graph_filename, landmarks.landmarks_filename):
+        if os.path.exists(side_file(filename)):
+            shutil.copy2(side_file(filename), side_file(copy))
+
+def remove_snapshot(copy):
+    """
+    Deletes a snapshot made by snapshot().
+
+    @param copy: The name of the snapshot's grid file
+    @return none
+    """
+    for name in (copy, components.labels_filename(copy), hpa.graph_filename(copy),
+                 landmarks.landmarks_filename(copy)):
+        if os.path.exists(name):
+            os.remove(name)
+
+def solve(name, filename, generation, compact, request):
+    """
+    Answers one path request inside a worker process. The worker keeps each grid (and
+    a PathPlanner for it, so its distance field cache carries over) until the server
+    reports a newer generation of the grid.
+
+    @param name: The grid's name
+    @param filename: The grid's snapshot file
+    @param generation: The number of times the server has loaded the grid
+    @param compact: True if the searches should run in compact mode
+    @param request: The decoded JSON request
+    @return the reply as a dict
+    """
+    cached = worker_grids.get(name)
+    if cached is None or cached[0] != generation:
+        if cached is not None:
+            cached[1].close()
+        grid = load_grid(filename)
+        cached = (generation, grid, m.PathPlanner(grid.Nrows, grid.Ncols, compact=compact))
+        worker_grids[name] = cached
+
+    _, grid, PathPlan = cached
+    PathPlan.time_budget = request.get("budget")
+    PathPlan.expansion_budget = request.get("max_expansions")
+    start, goal = (",".join(map(str, c)) if isinstance(c, list) else str(c)
+                   for c in (request["start"], request["goal"]))
+    result = batch.answer_query(PathPlan, grid, request["search"], (request.get("id"), start, goal))
+    del result["line"]
+    reply = {"id": request.get("id"), "grid": name}
+    reply.update(result)
+    return reply
+
+class PlannerServer(object):
+    def __init__(self, grids, workers, compact):
+        """
+        The Constructor for the PlannerServer class.
+
+        @param self: The PlannerServer object
+        @param grids: A dict mapping grid names to file names
+        @param workers: The number of worker processes
+        @param compact: True if the searches should run in compact mode
+        @return none
+        """
+        self.files = dict(grids)
+        self.compact = compact
+        self.snapshots = tempfile.mkdtemp(prefix="path_search-")
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+
+        # name -> (generation, mtime, Nrows, Ncols, snapshot) of the grid the workers should use
+        self.grids = {}
+
+        # snapshot -> number of requests given it that have not been answered yet, and the
+        # replaced snapshots waiting for those requests before they are deleted
+        self.in_use = {}
+        self.retired = set()
+
+        # name -> mtime of a grid file that could not be loaded, so it is not retried until it changes
+        self.failed = {}
+
+        # Keeps a reload request and the file watcher from loading the same grid at once
+        self.reloading = asyncio.Lock()
+
+        for name in self.files:
+            _, entry, error = self.load(name, 1)
+            if error is not None:
+                self.close()
+                raise ValueError(error)
+            self.grids[name] = entry
+
+    def snapshot_name(self, name, generation):
+        """
+        Returns the file name of a grid's snapshot.
+
+        @param self: The PlannerServer object
+        @param name: The grid's name
+        @param generation: The snapshot's generation number
+        @return the snapshot's file name, with the grid file's extension
+        """
+        return os.path.join(self.snapshots, "%d.%d%s" % (list(self.files).index(name), generation,
+                                                         os.path.splitext(self.files[name])[1]))
+
+    def load(self, name, generation):
+        """
+        Snapshots a grid file and checks that the snapshot can be loaded. Runs in a
+        background thread, so it does not change the server's state.
+
+        @param self: The PlannerServer object
+        @param name: The grid's name
+        @param generation: The generation number of the new snapshot
+        @return a tuple (mtime, entry, error): the file's modification time (None if it
+                could not be read), the new entry for self.grids (None on failure) and
+                None or an error message
+        """
+        filename = self.files[name]
+        copy = self.snapshot_name(name, generation)
+        mtime = None
+        try:
+            mtime = os.path.getmtime(filename)
+            snapshot(filename, copy)
+            grid = load_grid(copy)
+        except (OSError, ValueError) as err:
+            remove_snapshot(copy)
+            return mtime, None, "%s: %s" % (filename, err)
+
+        grid.close()
+        return mtime, (generation, mtime, grid.Nrows, grid.Ncols, copy), None
+
+    def retire(self, copy):
+        """
+        Deletes a snapshot that has been replaced, or marks it to be deleted when the
+        last request given it has been answered.
+
+        @param self: The PlannerServer object
+        @param copy: The snapshot's file name
+        @return none
+        """
+        if self.in_use.get(copy, 0) == 0:
+            remove_snapshot(copy)
+        else:
+            self.retired.add(copy)
+
+    def release(self, copy):
+        """
+        Records that a request given a snapshot has been answered, deleting the snapshot
+        if it was the last one and the snapshot has been replaced.
+
+        @param self: The PlannerServer object
+        @param copy: The snapshot's file name
+        @return none
+        """
+        self.in_use[copy] -= 1
+        if self.in_use[copy] == 0:
+            del self.in_use[copy]
+            if copy in self.retired:
+                self.retired.discard(copy)
+                remove_snapshot(copy)
+
+    def close(self):
+        """
+        Stops the worker processes and deletes the snapshots.
+
+        @param self: The PlannerServer object
+        @return none
+        """
+        self.pool.shutdown()
+        shutil.rmtree(self.snapshots, ignore_errors=True)
+
+    async def reload(self, name):
+        """
+        Re-reads a grid file in a background thread. The workers pick the new grid up
+        on their next request for it; if the file cannot be read, the old grid stays.
+
+        @param self: The PlannerServer object
+        @param name: The grid's name
+        @return None if the grid was reloaded, or an error message
+        """
+        async with self.reloading:
+            generation = self.grids[name][0] + 1
+            mtime, entry, error = await asyncio.get_running_loop().run_in_executor(
+                None, self.load, name, generation)
+            if error is not None:
+                self.failed[name] = mtime
+                return error
+            self.failed.pop(name, None)
+            old = self.grids[name][4]
+            self.grids[name] = entry
+            self.retire(old)
+        print("Reloaded %s from %s (generation %d)" % (name, self.files[name], generation), file=sys.stderr)
+        return None
+
+    async def watch(self):
+        """
+        Reloads every grid whose file has changed, checking every RELOAD_INTERVAL seconds.
+        A file that failed to load is skipped until its modification time changes again.
+
+        @param self: The PlannerServer object
+        @return none
+        """
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            for name, filename in self.files.items():
+                try:
+                    mtime = os.path.getmtime(filename)
+                    changed = mtime != self.grids[name][1] and mtime != self.failed.get(name)
+                except OSError:
+                    changed = False
+                if changed:
+                    await self.reload(name)
+
+    async def handle_request(self, request):
+        """
+        Answers one decoded request.
+
+        @param self: The PlannerServer object
+        @param request: The decoded JSON request
+        @return the reply as a dict
+        """
+        op = request.get("op", "path")
+        reply = {"id": request.get("id")}
+
+        if op == "grids":
+            reply["grids"] = {name: {"file": self.files[name], "rows": info[2], "cols": info[3],
+                                     "generation": info[0]} for name, info in self.grids.items()}
+            return reply
+
+        name = request.get("grid")
+        if name not in self.grids:
+            reply["error"] = "Unknown grid: %s" % name
+            return reply
+
+        if op == "reload":
+            error = await self.reload(name)
+            if error is not None:
+                reply["error"] = error
+            reply["generation"] = self.grids[name][0]
+            return reply
+
+        if op != "path":
+            reply["error"] = "Unknown op: %s" % op
+            return reply
+        if request.get("search") not in m.SEARCH_TYPES:
+            reply["error"] = "search must be one of " + " | ".join(m.SEARCH_TYPES)
+            return reply
+        if "start" not in request or "goal" not in request:
+            reply["error"] = "start and goal are required"
+            return reply
+
+        # The snapshot is kept until this request has been answered, even if the grid
+        # is reloaded while the request waits for a worker
+        generation, _, _, _, copy = self.grids[name]
+        self.in_use[copy] = self.in_use.get(copy, 0) + 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, solve, name, copy, generation, self.compact, request)
+        finally:
+            self.release(copy)
+
+    async def answer(self, line, writer, lock):
+        """
+        Answers one request line and writes the reply line.
+
+        @param self: The PlannerServer object
+        @param line: The raw request line
+        @param writer: The connection's StreamWriter
+        @param lock: A lock that keeps replies on one connection from interleaving
+        @return none
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as err:
+            reply = {"error": "Invalid request: %s" % err}
+        else:
+            # Errors raised while answering, including inside a worker, keep the request's id
+            try:
+                reply = await self.handle_request(request)
+            except Exception as err:
+                reply = {"id": request.get("id"), "error": "%s: %s" % (type(err).__name__, err)}
+
+        async with lock:
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+
+    async def serve_connection(self, reader, writer):
+        """
+        Reads request lines from one client until it disconnects, answering each one
+        concurrently as soon as it arrives.
+
+        @param self: The PlannerServer object
+        @param reader: The connection's StreamReader
+        @param writer: The connection's StreamWriter
+        @return none
+        """
+        lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip() == b"":
+                    continue
+                task = asyncio.ensure_future(self.answer(line, writer, lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def parse_args():
+    """
+    Parses the command-line arguments.
+
+    @return grids: A dict mapping grid names to file names
+    @return socket_path: The Unix socket to listen on, or None to use TCP
+    @return port: The localhost TCP port to listen on, or None to use a Unix socket
+    @return workers: The number of worker processes
+    @return compact: True if the searches should run in compact mode
+    """
+    grids = {}
+    socket_path = None
+    port = None
+    workers = os.cpu_count() or 1
+    compact = False
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == "--compact":
+            compact = True
+            i += 1
+            continue
+        if i+1 == len(sys.argv):
+            sys.exit(USAGE)
+
+        if sys.argv[i] == "--grid":
+            name, sep, filename = sys.argv[i+1].partition("=")
+            if sep == "" or name == "" or filename == "":
+                sys.exit("--grid must be given as NAME=FILENAME")
+            grids[name] = filename
+        elif sys.argv[i] == "--socket":
+            socket_path = sys.argv[i+1]
+        elif sys.argv[i] == "--port":
+            if not sys.argv[i+1].isnumeric():
+                sys.exit("--port must be a port number")
+            port = int(sys.argv[i+1])
+        elif sys.argv[i] == "--workers":
+            if not sys.argv[i+1].isnumeric() or int(sys.argv[i+1]) < 1:
+                sys.exit("--workers must be a positive integer")
+            workers = int(sys.argv[i+1])
+        else:
+            sys.exit(USAGE)
+        i += 2
+
+    if not grids or (socket_path is not None and port is not None):
+        sys.exit(USAGE)
+    if port is None and socket_path is None:
+        socket_path = DEFAULT_SOCKET
+    return grids, socket_path, port, workers, compact
+
+async def run(server, socket_path, port):
+    """
+    Listens for clients until the process is interrupted.
+
+    @param server: The PlannerServer object
+    @param socket_path: The Unix socket to listen on, or None
+    @param port: The localhost TCP port to listen on, or None
+    @return none
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        listener = await asyncio.start_unix_server(server.serve_connection, path=socket_path)
+        print("Listening on %s" % socket_path, file=sys.stderr)
+    else:
+        listener = await asyncio.start_server(server.serve_connection, host="127.0.0.1", port=port)
+        print("Listening on 127.0.0.1:%d" % port, file=sys.stderr)
+
+    watcher = asyncio.ensure_future(server.watch())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        watcher.cancel()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def main():
+    """
+    Loads the named grids and serves path requests until interrupted.
+
+    @return 0 at end of process
+    """
+    grids, socket_path, port, workers, compact = parse_args()
+    try:
+        server = PlannerServer(grids, workers, compact)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+    try:
+        asyncio.run(run(server, socket_path, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == '__main__':
+    main()
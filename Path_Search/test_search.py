@@ -0,0 +1,255 @@
+"""
+Author: Caroline Rinks
+Tests for the PathPlanner searches. Run with:
+
+    python3 -m pytest -q
+"""
+
+import random
+import time
+
+import grid_io
+import incremental
+import main as m
+import weighted
+
+def random_grid(n, seed, density=0.3):
+    """
+    Builds an n x n grid with random obstacles and free corners.
+
+    @param n: The number of rows and columns
+    @param seed: The random seed
+    @param density: The fraction of cells that are obstacles
+    @return a Grid object
+    """
+    rng = random.Random(seed)
+    cells = bytearray(1 if rng.random() < density else 0 for _ in range(n * n))
+    cells[0] = 0
+    cells[-1] = 0
+    return grid_io.Grid(n, n, cells)
+
+def run(search_type, grid, compact):
+    """
+    Searches from the top left to the bottom right corner of a grid.
+
+    @param search_type: One of main.SEARCH_TYPES
+    @param grid: The Grid object to search
+    @param compact: True to search in compact mode
+    @return a SearchResult object
+    """
+    PathPlan = m.PathPlanner(grid.Nrows, grid.Ncols, compact=compact)
+    return PathPlan.search(search_type, m.Node(0, 0), m.Node(grid.Nrows - 1, grid.Ncols - 1), grid)
+
+def is_valid_path(path, grid, start=None, goal=None):
+    """
+    Checks that a path runs from start to goal over free cells, one step at a time.
+
+    @param path: A list of (row, col) tuples
+    @param grid: The Grid object that was searched
+    @param start: The (row, col) of the start, or None for the top left corner
+    @param goal: The (row, col) of the goal, or None for the bottom right corner
+    @return True if the path is valid
+    """
+    if path[0] != (start or (0, 0)) or path[-1] != (goal or (grid.Nrows - 1, grid.Ncols - 1)):
+        return False
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        if abs(x1 - x2) + abs(y1 - y2) != 1 or grid.cells[x2 * grid.Ncols + y2] != 0:
+            return False
+    return True
+
+def matches_bfs_on_random_grids(search_type, tmp_path, seeds=200, sizes=(2, 20), max_ratio=1.0):
+    """
+    Searches random grids between two random free cells in Node and compact mode,
+    with each grid given as a Grid, as a 2D list and (every fourth seed) as a TiledGrid
+    of 8 x 8 chunks, and checks every result against BFS.
+
+    @param search_type: One of main.SEARCH_TYPES
+    @param tmp_path: A folder for the tiled grids
+    @param seeds: The number of random grids
+    @param sizes: The smallest and largest number of rows and columns
+    @param max_ratio: How many times longer (in moves) than the BFS path a path may be
+    @return none
+    """
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        n = rng.randint(*sizes)
+        grid = random_grid(n, seed, density=rng.choice((0.1, 0.3, 0.4)))
+        free = [divmod(idx, n) for idx in range(n * n) if grid.cells[idx] == 0]
+        start, goal = rng.choice(free), rng.choice(free)
+        bfs = m.PathPlanner(n, n, compact=True).search("BFS", m.Node(*start), m.Node(*goal), grid)
+
+        forms = [grid, [list(grid.cells[x * n:(x + 1) * n]) for x in range(n)]]
+        if seed % 4 == 0:
+            filename = str(tmp_path / ("%d.tiles" % seed))
+            grid_io.save_tiled(grid, filename, chunk=8)
+            forms.append(grid_io.TiledGrid(filename))
+        try:
+            for form in forms:
+                for compact in (False, True):
+                    PathPlan = m.PathPlanner(n, n, compact=compact)
+                    result = PathPlan.search(search_type, m.Node(*start), m.Node(*goal), form)
+                    assert result.found == bfs.found, (seed, type(form).__name__, compact)
+                    if result.found:
+                        assert is_valid_path(result.path, grid, start, goal), (seed, type(form).__name__, compact)
+                        assert len(result.path) - 1 <= max_ratio * (len(bfs.path) - 1)
+                        assert len(result.path) >= len(bfs.path)
+        finally:
+            if len(forms) == 3:
+                forms[2].close()
+
+def test_jps_path_is_as_short_as_bfs(tmp_path):
+    matches_bfs_on_random_grids("JPS", tmp_path)
+
+def test_bidirectional_paths_are_as_short_as_bfs(tmp_path):
+    matches_bfs_on_random_grids("BFS-BI", tmp_path)
+    matches_bfs_on_random_grids("A*-BI", tmp_path)
+
+def test_hpa_paths_are_close_to_bfs(tmp_path):
+    # Grids of up to 80 x 80 span several 32 x 32 clusters; HPA* paths may be a little
+    # longer than the shortest (at most 17% longer over 200 seeds)
+    matches_bfs_on_random_grids("HPA*", tmp_path, seeds=100, sizes=(10, 80), max_ratio=1.25)
+
+def test_alt_path_is_as_short_as_bfs(tmp_path):
+    matches_bfs_on_random_grids("A*-ALT", tmp_path, sizes=(2, 40))
+
+def test_anytime_search_is_as_short_as_bfs_without_a_budget(tmp_path):
+    matches_bfs_on_random_grids("A*-ANYTIME", tmp_path)
+
+def test_anytime_search_keeps_its_bound_within_a_budget():
+    for seed in range(200):
+        rng = random.Random(seed)
+        grid = random_grid(rng.randint(5, 30), seed, density=rng.choice((0.1, 0.3)))
+        bfs = run("BFS", grid, True)
+        for compact in (False, True):
+            PathPlan = m.PathPlanner(grid.Nrows, grid.Ncols, compact=compact)
+            PathPlan.expansion_budget = rng.randint(1, 200)
+            result = PathPlan.search("A*-ANYTIME", m.Node(0, 0), m.Node(grid.Nrows - 1, grid.Ncols - 1), grid)
+            # Out of budget before a first path is found is allowed, a wrong bound is not
+            assert bfs.found or not result.found
+            if result.found:
+                assert is_valid_path(result.path, grid)
+                assert len(result.path) - 1 <= result.suboptimality * (len(bfs.path) - 1) + 1e-9
+
+def test_dfs_modes_agree_on_random_grids():
+    for seed in range(100):
+        grid = random_grid(random.Random(seed).randint(2, 30), seed)
+        node = run("DFS", grid, False)
+        compact = run("DFS", grid, True)
+        bfs = run("BFS", grid, True)
+
+        assert (node.found, node.path, node.expansions, node.generated) == \
+               (compact.found, compact.path, compact.expansions, compact.generated)
+        assert node.found == bfs.found
+        if node.found:
+            assert is_valid_path(node.path, grid)
+
+def test_dfs_path_is_as_short_as_bfs():
+    for seed in range(200):
+        rng = random.Random(seed)
+        grid = random_grid(rng.randint(2, 20), seed, density=rng.choice((0.1, 0.3, 0.4)))
+        bfs = run("BFS", grid, True)
+        for compact in (False, True):
+            dfs = run("DFS", grid, compact)
+            assert dfs.found == bfs.found
+            if dfs.found:
+                assert is_valid_path(dfs.path, grid)
+                assert len(dfs.path) == len(bfs.path)
+
+def test_dfs_finishes_on_1000x1000_open_grid():
+    n = 1000
+    for compact in (True, False):
+        grid = grid_io.Grid(n, n, bytearray(n * n))
+        begin = time.perf_counter()
+        result = run("DFS", grid, compact)
+        assert result.found
+        assert is_valid_path(result.path, grid)
+        assert time.perf_counter() - begin < 120
+
+def test_a_star_path_is_as_short_as_bfs():
+    for seed in range(200):
+        rng = random.Random(seed)
+        grid = random_grid(rng.randint(2, 20), seed, density=rng.choice((0.1, 0.3, 0.4)))
+        bfs = run("BFS", grid, True)
+        node = run("A*", grid, False)
+        compact = run("A*", grid, True)
+        assert (node.found, node.path, node.expansions) == (compact.found, compact.path, compact.expansions)
+        assert node.found == bfs.found
+        if node.found:
+            assert is_valid_path(node.path, grid)
+            assert len(node.path) == len(bfs.path)
+
+def test_a_star_goes_straight_across_1000x1000_open_grid():
+    n = 1000
+    for compact in (True, False):
+        grid = grid_io.Grid(n, n, bytearray(n * n))
+        begin = time.perf_counter()
+        result = run("A*", grid, compact)
+        # The Manhattan heuristic is exact here, so only the path's own cells are expanded
+        assert result.found
+        assert len(result.path) == 2 * n - 1
+        assert result.expansions == 2 * n - 2
+        assert time.perf_counter() - begin < 1
+
+def test_dial_search_matches_heap_dijkstra_on_random_weighted_grids():
+    for seed in range(200):
+        rng = random.Random(seed)
+        grid = random_grid(rng.randint(2, 25), seed, density=rng.choice((0.1, 0.3)))
+        n = grid.Nrows
+        costs = bytearray(rng.randint(1, 9) for _ in range(n * n)) if seed % 4 else None
+        free = [idx for idx in range(n * n) if grid.cells[idx] == 0]
+        start, goal = rng.choice(free), rng.choice(free)
+        for diagonal in (False, True):
+            dial = weighted.dial_search(grid.cells, costs, n, n, start, goal, diagonal)
+            heap = weighted.dijkstra_search(grid.cells, costs, n, n, start, goal, diagonal)
+            assert dial[0] == heap[0]
+            if dial[0] != weighted.UNREACHED:
+                path = weighted.trace(dial[1], start, goal)
+                assert weighted.path_cost(path, costs, n, diagonal) == dial[0]
+
+def test_dstar_lite_replans_match_fresh_bfs():
+    for seed in range(200):
+        rng = random.Random(seed)
+        n = rng.randint(3, 15)
+        grid = random_grid(n, seed, density=rng.choice((0.1, 0.3)))
+        goal_idx = n * n - 1
+        dstar = incremental.DStarLite(grid, 0, goal_idx)
+        for step in range(6):
+            if step > 0:
+                # Block and free a few cells, never the robot's cell or the goal
+                changes = [(x, y, rng.randint(0, 1)) for x, y in
+                           (divmod(rng.randrange(n * n), n) for _ in range(rng.randint(1, 4)))
+                           if x * n + y not in (dstar.start_idx, goal_idx)]
+                dstar.update_cells(changes)
+            path = dstar.find_path()
+
+            start = m.Node(*divmod(dstar.start_idx, n))
+            bfs = m.PathPlanner(n, n, compact=True).search("BFS", start, m.Node(n - 1, n - 1), grid)
+            assert (path is not None) == bfs.found
+            if path is None:
+                break
+            assert len(path) == len(bfs.path)
+            assert all(grid.cells[idx] == 0 for idx in path)
+
+            # The robot moves a few cells along the path before the next changes
+            if len(path) > 1:
+                dstar.move_start(path[min(len(path) - 1, rng.randint(1, 3))])
+
+def test_tiled_search_state_grows_with_cells_reached(tmp_path):
+    # A dense table for a 2000 x 2000 grid takes 4 MB per byte of state; a short
+    # search on a tiled grid only stores the few hundred cells it reaches (and the
+    # chunks it reads, 64 KB each)
+    n = 2000
+    filename = str(tmp_path / "open.tiles")
+    grid_io.save_tiled(grid_io.Grid(n, n, bytearray(n * n)), filename)
+    grid = grid_io.TiledGrid(filename)
+    try:
+        for search_type in ("BFS", "A*", "BFS-BI", "A*-BI", "DIJKSTRA"):
+            for compact in (False, True):
+                PathPlan = m.PathPlanner(n, n, compact=compact)
+                result = PathPlan.search(search_type, m.Node(1000, 1000), m.Node(1010, 1005), grid,
+                                         trace_memory=True)
+                assert result.found
+                assert len(result.path) == 16
+                assert result.peak_memory < 2**20
+    finally:
+        grid.close()
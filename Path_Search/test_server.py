@@ -0,0 +1,150 @@
+"""
+Author: Caroline Rinks
+Tests for the path planning server. Run with:
+
+    python3 -m pytest -q
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import grid_io
+import server
+
+class FakeWriter(object):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(json.loads(data))
+
+    async def drain(self):
+        pass
+
+def make_server(tmp_path):
+    """
+    Writes a 10x10 open grid and starts a PlannerServer with one worker on it.
+
+    @param tmp_path: The folder to write the grid to
+    @return the PlannerServer object and the grid's file name
+    """
+    filename = str(tmp_path / "open.dat")
+    grid_io.save_grid(grid_io.Grid(10, 10, bytearray(100)), filename)
+    return server.PlannerServer({"open": filename}, 1, False), filename
+
+def test_cold_worker_keeps_last_good_grid(tmp_path):
+    planner, filename = make_server(tmp_path)
+    try:
+        with open(filename, "w") as file:
+            file.write("not,a\ngrid\n")
+        os.utime(filename, (0, 0))
+
+        async def scenario():
+            error = await planner.reload("open")
+            # The worker pool starts its first worker only now, after the file broke
+            reply = await planner.handle_request({"id": 7, "grid": "open", "start": "0,0",
+                                                  "goal": "9,9", "search": "BFS"})
+            return error, reply
+
+        error, reply = asyncio.run(scenario())
+        assert error is not None
+        assert reply["id"] == 7 and reply["found"] and len(reply["path"]) == 19
+        assert planner.grids["open"][0] == 1
+    finally:
+        planner.close()
+    assert not os.path.exists(planner.snapshots)
+
+def test_old_snapshots_are_deleted(tmp_path):
+    planner, filename = make_server(tmp_path)
+    try:
+        for _ in range(3):
+            assert asyncio.run(planner.reload("open")) is None
+        # No request was using the replaced snapshots, so only the newest is left
+        assert os.listdir(planner.snapshots) == ["0.4.dat"]
+    finally:
+        planner.close()
+
+def test_queued_request_outlives_two_reloads(tmp_path):
+    planner, filename = make_server(tmp_path)
+    try:
+        async def scenario():
+            # Keep the only worker busy so the request waits in the pool's queue
+            busy = planner.pool.submit(time.sleep, 0.5)
+            request = asyncio.ensure_future(planner.handle_request(
+                {"id": 1, "grid": "open", "start": "0,0", "goal": "9,9", "search": "BFS"}))
+            await asyncio.sleep(0.05)
+            assert await planner.reload("open") is None
+            assert await planner.reload("open") is None
+            assert sorted(os.listdir(planner.snapshots)) == ["0.1.dat", "0.3.dat"]
+            reply = await request
+            busy.result()
+            return reply
+
+        reply = asyncio.run(scenario())
+        assert reply["id"] == 1 and reply["found"] and len(reply["path"]) == 19
+        assert os.listdir(planner.snapshots) == ["0.3.dat"]
+        assert planner.in_use == {} and planner.retired == set()
+    finally:
+        planner.close()
+
+def test_concurrent_reloads_take_turns(tmp_path):
+    planner, filename = make_server(tmp_path)
+    try:
+        async def scenario():
+            return await asyncio.gather(planner.reload("open"), planner.reload("open"))
+
+        assert asyncio.run(scenario()) == [None, None]
+        assert planner.grids["open"][0] == 3
+        assert os.listdir(planner.snapshots) == ["0.3.dat"]
+    finally:
+        planner.close()
+
+def test_broken_file_is_not_reloaded_until_it_changes(tmp_path, monkeypatch):
+    planner, filename = make_server(tmp_path)
+    monkeypatch.setattr(server, "RELOAD_INTERVAL", 0.01)
+    loads = []
+    load = planner.load
+    planner.load = lambda name, generation: loads.append(generation) or load(name, generation)
+    try:
+        with open(filename, "w") as file:
+            file.write("not,a\ngrid\n")
+        os.utime(filename, (100, 100))
+
+        async def watch_for(seconds):
+            watcher = asyncio.ensure_future(planner.watch())
+            await asyncio.sleep(seconds)
+            watcher.cancel()
+
+        asyncio.run(watch_for(0.2))
+        assert len(loads) == 1
+        assert planner.grids["open"][0] == 1
+
+        # Fixing the file changes its modification time, so it is loaded again
+        grid_io.save_grid(grid_io.Grid(10, 10, bytearray(100)), filename)
+        os.utime(filename, (200, 200))
+        asyncio.run(watch_for(0.2))
+        assert len(loads) == 2
+        assert planner.grids["open"][0] == 2
+    finally:
+        planner.close()
+
+def test_errors_while_answering_keep_the_id(tmp_path):
+    planner, _ = make_server(tmp_path)
+    try:
+        async def broken(request):
+            raise ValueError("grid file is not valid")
+        planner.handle_request = broken
+
+        writer = FakeWriter()
+        async def scenario():
+            lock = asyncio.Lock()
+            await planner.answer(b'{"id": 3, "grid": "open"}\n', writer, lock)
+            await planner.answer(b'{"id": 4,\n', writer, lock)
+        asyncio.run(scenario())
+
+        assert writer.lines[0] == {"id": 3, "error": "ValueError: grid file is not valid"}
+        assert "id" not in writer.lines[1] and writer.lines[1]["error"].startswith("Invalid request")
+    finally:
+        planner.close()
@@ -0,0 +1,291 @@
+"""
+Author: Caroline Rinks
+Implements shortest path search on weighted terrain grids, where entering a free cell
+costs a small integer (1 for plain floor, up to 9 for slow zones and ramps) and moves
+may optionally be 8-connected.
+
+Because every edge cost is a small integer, Dijkstra's algorithm is run with a bucket
+queue (Dial's algorithm): a ring of buckets indexed by distance, so pushing and popping
+are O(1) instead of O(log n) heap operations. dijkstra_search() is a plain heap-based
+Dijkstra kept as the reference the bucket queue is checked against.
+
+In 8-connected mode a straight move costs STRAIGHT and a diagonal move DIAGONAL units
+times the cost of the cell entered, and a diagonal move may not cut the corner of an
+obstacle.
+
+Usage (check the bucket queue against plain Dijkstra on random queries):
+
+    python3 weighted.py --input FILENAME [--queries N] [--seed SEED] [--diagonal]
+"""
+
+import heapq
+import random
+import sys
+import time
+
+import grid_io
+
+UNREACHED = 2**31 - 1
+
+# Move costs in 8-connected mode, in tenths of a straight move (14/10 ~ sqrt(2))
+STRAIGHT = 10
+DIAGONAL = 14
+
+def move_costs(diagonal):
+    """
+    Returns the cost units of a straight and a diagonal move.
+
+    @param diagonal: True for 8-connected moves, False for 4-connected moves
+    @return a tuple (straight, diagonal); diagonal is None in 4-connected mode
+    """
+    if diagonal:
+        return STRAIGHT, DIAGONAL
+    return 1, None
+
+def neighbours(idx, cells, Nrows, Ncols, diagonal):
+    """
+    Returns the free cells next to idx: DOWN, RIGHT, UP, LEFT and then, in 8-connected
+    mode, the four diagonals whose two orthogonal neighbours are both free.
+
+    @param idx: The index (row*Ncols+col) of the cell to expand
+    @param cells: The flat grid
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param diagonal: True for 8-connected moves
+    @return a list of (cell index, True if the move is diagonal) pairs
+    """
+    i, j = divmod(idx, Ncols)
+    down = i != Nrows - 1 and cells[idx + Ncols] == 0
+    right = j != Ncols - 1 and cells[idx + 1] == 0
+    up = i != 0 and cells[idx - Ncols] == 0
+    left = j != 0 and cells[idx - 1] == 0
+
+    result = []
+    if down:
+        result.append((idx + Ncols, False))
+    if right:
+        result.append((idx + 1, False))
+    if up:
+        result.append((idx - Ncols, False))
+    if left:
+        result.append((idx - 1, False))
+    if diagonal:
+        for child, ok in ((idx + Ncols + 1, down and right), (idx - Ncols + 1, up and right),
+                          (idx - Ncols - 1, up and left), (idx + Ncols - 1, down and left)):
+            if ok and cells[child] == 0:
+                result.append((child, True))
+    return result
+
+def dial_search(cells, costs, Nrows, Ncols, start_idx, goal_idx, diagonal=False, on_expand=None):
+    """
+    Dijkstra's algorithm with a bucket queue. No edge costs more than C units, so
+    every pending distance lies between d and d+C for the distance d being settled,
+    and a ring of C+1 buckets indexed by distance modulo C+1 holds the whole queue.
+
+    @param cells: The flat grid
+    @param costs: The flat per-cell entry costs, or None if every cell costs 1
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param start_idx: The index of the start cell
+    @param goal_idx: The index of the goal cell
+    @param diagonal: True for 8-connected moves
+    @param on_expand: If given, called as on_expand(idx, frontier size) for every cell settled
+    @return a tuple (cost, parent, expansions, generated): the path cost in move units
+            (UNREACHED if there is no path), the flat parent array, the number of cells
+            settled and the number of queue entries pushed
+    """
+    straight, diag = move_costs(diagonal)
+    max_cost = max(costs) if costs is not None and len(costs) != 0 else 1
+    nbuckets = max_cost * (diag or straight) + 1
+
+    dist = grid_io.state_table(cells, UNREACHED, 'i')
+    parent = grid_io.state_table(cells, -1, 'i')
+    dist[start_idx] = 0
+    buckets = [[] for _ in range(nbuckets)]
+    buckets[0].append(start_idx)
+    pending = 1
+    expansions = 0
+    generated = 0
+
+    d = 0
+    while pending:
+        bucket = buckets[d % nbuckets]
+        while bucket:
+            idx = bucket.pop()
+            pending -= 1
+            # Entries left behind when a cell's distance improved are skipped
+            if dist[idx] != d:
+                continue
+            expansions += 1
+            if on_expand is not None:
+                on_expand(idx, pending)
+            if idx == goal_idx:
+                return d, parent, expansions, generated
+
+            for child, is_diagonal in neighbours(idx, cells, Nrows, Ncols, diagonal):
+                step = diag if is_diagonal else straight
+                nd = d + (step if costs is None else step * costs[child])
+                if nd < dist[child]:
+                    dist[child] = nd
+                    parent[child] = idx
+                    buckets[nd % nbuckets].append(child)
+                    pending += 1
+                    generated += 1
+        d += 1
+
+    return UNREACHED, parent, expansions, generated
+
+def dijkstra_search(cells, costs, Nrows, Ncols, start_idx, goal_idx, diagonal=False, on_expand=None):
+    """
+    Plain Dijkstra's algorithm with a binary heap, used to check dial_search.
+
+    @param cells: The flat grid
+    @param costs: The flat per-cell entry costs, or None if every cell costs 1
+    @param Nrows: The number of rows in the grid
+    @param Ncols: The number of columns in the grid
+    @param start_idx: The index of the start cell
+    @param goal_idx: The index of the goal cell
+    @param diagonal: True for 8-connected moves
+    @param on_expand: If given, called as on_expand(idx, frontier size) for every cell settled
+    @return a tuple (cost, parent, expansions, generated) as for dial_search
+    """
+    straight, diag = move_costs(diagonal)
+    dist = grid_io.state_table(cells, UNREACHED, 'i')
+    parent = grid_io.state_table(cells, -1, 'i')
+    closed = grid_io.state_table(cells)
+    dist[start_idx] = 0
+    open = [(0, start_idx)]
+    expansions = 0
+    generated = 0
+
+    while open:
+        d, idx = heapq.heappop(open)
+        if closed[idx]:
+            continue
+        closed[idx] = 1
+        expansions += 1
+        if on_expand is not None:
+            on_expand(idx, len(open))
+        if idx == goal_idx:
+            return d, parent, expansions, generated
+
+        for child, is_diagonal in neighbours(idx, cells, Nrows, Ncols, diagonal):
+            step = diag if is_diagonal else straight
+            nd = d + (step if costs is None else step * costs[child])
+            if nd < dist[child]:
+                dist[child] = nd
+                parent[child] = idx
+                heapq.heappush(open, (nd, child))
+                generated += 1
+
+    return UNREACHED, parent, expansions, generated
+
+def path_cost(path, costs, Ncols, diagonal):
+    """
+    Adds up the cost of a path, to check the parent links a search returned.
+
+    @param path: A list of cell indices from start to goal
+    @param costs: The flat per-cell entry costs, or None if every cell costs 1
+    @param Ncols: The number of columns in the grid
+    @param diagonal: True for 8-connected moves
+    @return the path cost in move units
+    """
+    straight, diag = move_costs(diagonal)
+    total = 0
+    for a, b in zip(path, path[1:]):
+        step = diag if (a % Ncols != b % Ncols and a // Ncols != b // Ncols) else straight
+        total += step if costs is None else step * costs[b]
+    return total
+
+def trace(parent, start_idx, goal_idx):
+    """
+    Follows the parent array back from the goal.
+
+    @param parent: The flat parent array returned by a search
+    @param start_idx: The index of the start cell
+    @param goal_idx: The index of the goal cell
+    @return the list of cell indices from start to goal
+    """
+    path = [goal_idx]
+    while path[-1] != start_idx:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+def parse_args():
+    """
+    Parses the command-line arguments.
+
+    @return filename: The grid file to search
+    @return queries: The number of random queries to run
+    @return seed: The random seed used to pick the queries
+    @return diagonal: True for 8-connected moves
+    """
+    usage = "Usage: python weighted.py --input FILENAME [--queries N] [--seed SEED] [--diagonal]"
+    args = sys.argv[1:]
+    diagonal = "--diagonal" in args
+    if diagonal:
+        args.remove("--diagonal")
+
+    filename = ""
+    queries = 20
+    seed = 0
+    if len(args) % 2 != 0:
+        sys.exit(usage)
+    for i in range(0, len(args), 2):
+        if args[i] == "--input":
+            filename = args[i+1]
+        elif args[i] == "--queries" and args[i+1].isnumeric():
+            queries = int(args[i+1])
+        elif args[i] == "--seed" and args[i+1].isnumeric():
+            seed = int(args[i+1])
+        else:
+            sys.exit(usage)
+
+    if filename == "":
+        sys.exit(usage)
+    return filename, queries, seed, diagonal
+
+def main():
+    """
+    Runs the bucket queue and plain Dijkstra on random queries over a grid and checks
+    that they agree on every path cost.
+
+    @return 0 if both searches agreed on every query, 1 otherwise
+    """
+    filename, queries, seed, diagonal = parse_args()
+    try:
+        grid = grid_io.load_grid(filename)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+    free = [idx for idx in range(grid.Nrows * grid.Ncols) if grid.cells[idx] == 0]
+    if len(free) < 2:
+        sys.exit("Grid needs at least two free cells")
+
+    rng = random.Random(seed)
+    agree = True
+    totals = {"dial": 0.0, "heap": 0.0}
+    print("%-12s %-12s %10s %10s %10s" % ("start", "goal", "cost", "dial exp", "heap exp"))
+    for _ in range(queries):
+        a, b = rng.sample(free, 2)
+        results = {}
+        for name, search in (("dial", dial_search), ("heap", dijkstra_search)):
+            begin = time.perf_counter()
+            results[name] = search(grid.cells, grid.costs, grid.Nrows, grid.Ncols, a, b, diagonal)
+            totals[name] += time.perf_counter() - begin
+
+        cost, parent, expansions, _ = results["dial"]
+        ok = cost == results["heap"][0]
+        if ok and cost != UNREACHED:
+            ok = path_cost(trace(parent, a, b), grid.costs, grid.Ncols, diagonal) == cost
+        agree = agree and ok
+        print("%-12s %-12s %10s %10d %10d%s" % ("%d,%d" % divmod(a, grid.Ncols), "%d,%d" % divmod(b, grid.Ncols),
+              cost if cost != UNREACHED else None, expansions, results["heap"][2], "" if ok else "  MISMATCH"))
+
+    print("\nbucket queue: %.3f s, heap: %.3f s" % (totals["dial"], totals["heap"]))
+    print("All costs agree" if agree else "Costs DIFFER")
+    return 0 if agree else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,29 +3,305 @@ Author: Caroline Rinks
 Implements the WebCrawler class, which collects links starting at a specified webpage,
 extracts content from these links, and cleans the extracted content to be evaluated
 for relevancy given a user-specified query.
+
+Pages are fetched concurrently by a pool of threads sharing one requests Session, whose
+connection pool keeps connections to each host open between requests. Every request has
+a timeout and is retried with exponential backoff. The fetched HTML is parsed in a pool of
+worker processes, so parsing does not hold up the fetches.
+
+Links are collected breadth-first, one depth level at a time, and only links on the crawl's
+domain are followed. Links are normalized (made absolute, fragments, trailing slashes and
+index documents such as index.html removed, http and https treated alike). The collected
+links and the text of the pages fetched while collecting are written to temporary files
+(see Spool), and the links already seen are remembered as 8-byte hashes in a flat table
+(see KeySet), so collecting keeps a few dozen bytes per link in memory. The documents
+crawl() returns are still one list in memory, since the index is built from all of them.
 """
 
 from bs4 import BeautifulSoup
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
-import requests, re, string, sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from array import array
+from bisect import bisect_left
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import hashlib, os, requests, re, string, tempfile, time
+
+# Responses worth retrying: rate limiting and server-side errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# The number of pages of a depth level fetched before their links are followed
+FRONTIER_BATCH = 256
+
+# Page names servers answer with when a directory is asked for; /a/index.html is the page /a
+INDEX_DOCUMENTS = ("index.html", "index.htm", "index.shtml", "index.php", "index.asp", "index.aspx",
+                   "default.html", "default.htm", "default.asp", "default.aspx")
+
+class CrawlError(Exception):
+    """
+    Raised when a crawl cannot be started or its root page cannot be fetched.
+    """
+    pass
+
+class CacheError(Exception):
+    """
+    Raised when the saved crawl, docs.pickle and links.pickle, does not have the same
+    number of documents and links.
+    """
+    pass
+
+class Spool(object):
+    def __init__(self):
+        """
+        The Constructor for the Spool class: a list of strings kept in a temporary file,
+        one after another as UTF-8, with only the 8-byte offset of each in memory. Strings
+        can be read back by position while more are appended, from any thread.
+
+        @param self: The Spool object.
+        @return none
+        """
+        self.file = tempfile.TemporaryFile()
+        self.offsets = array('q', [0])
+        self.flushed = True
+
+    def append(self, text):
+        """
+        Writes a string to the end of the spool.
+
+        @param self: The Spool object.
+        @param text: The string.
+        @return none
+        """
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        self.flushed = False
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, n):
+        if n < 0 or n >= len(self.offsets) - 1:
+            raise IndexError("spool index out of range")
+        if not self.flushed:
+            self.file.flush()
+            self.flushed = True
+        start = self.offsets[n]
+        return os.pread(self.file.fileno(), self.offsets[n + 1] - start, start).decode("utf-8")
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def close(self):
+        """
+        Closes and deletes the spool's file.
+
+        @param self: The Spool object.
+        @return none
+        """
+        self.file.close()
+
+class KeySet(object):
+    def __init__(self):
+        """
+        The Constructor for the KeySet class: a set of 8-byte keys (see url_key) stored
+        in a flat open-addressing table that is kept at most half full, so it takes at
+        most 16 bytes per key instead of the ~60 of a Python set of ints.
+
+        @param self: The KeySet object.
+        @return none
+        """
+        self.table = array('Q', [0]) * 1024
+        self.count = 0
+
+    def add(self, key):
+        """
+        Adds a key to the set.
+
+        @param self: The KeySet object.
+        @param key: A 64-bit key.
+        @return True if the key was not in the set yet, False if it was
+        """
+        # 0 marks an empty slot, so the key 0 is stored as 1
+        key = key or 1
+        table = self.table
+        mask = len(table) - 1
+        i = key & mask
+        while table[i] != 0:
+            if table[i] == key:
+                return False
+            i = (i + 1) & mask
+        table[i] = key
+        self.count += 1
+        if 2 * self.count > len(table):
+            self.grow()
+        return True
+
+    def grow(self):
+        """
+        Doubles the table and re-inserts every key.
+
+        @param self: The KeySet object.
+        @return none
+        """
+        old = self.table
+        self.table = array('Q', [0]) * (2 * len(old))
+        mask = len(self.table) - 1
+        for key in old:
+            if key != 0:
+                i = key & mask
+                while self.table[i] != 0:
+                    i = (i + 1) & mask
+                self.table[i] = key
+
+    def __len__(self):
+        return self.count
+
+def normalize_url(href, base):
+    """
+    Turns a link into the one form it is compared and stored in: absolute, with a
+    lowercase scheme and host, no default port, fragment, trailing slash or index document
+    (/a/index.html becomes /a).
+
+    @param href: The link as written in the page.
+    @param base: The URL of the page the link was found on.
+    @return The normalized URL, or None if the link is not an http(s) link.
+    """
+    try:
+        parts = urlsplit(urljoin(base, href.strip()))
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = parts.hostname
+    if scheme not in ("http", "https") or not host:
+        return None
+
+    if ":" in host:
+        host = "[%s]" % host
+    if port is not None and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = "%s:%d" % (host, port)
+    path = parts.path
+    head, _, name = path.rpartition("/")
+    if name.lower() in INDEX_DOCUMENTS:
+        path = head
+    path = path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+def url_key(url):
+    """
+    Hashes a normalized URL to the 8-byte key kept in the crawler's seen set. The scheme
+    is left out, so the http and https versions of a page share a key.
+
+    @param url: A URL returned by normalize_url.
+    @return The key as an int.
+    """
+    return int.from_bytes(hashlib.blake2b(url.split(":", 1)[1].encode(), digest_size=8).digest(), "big")
+
+def default_domain(url):
+    """
+    Returns the domain a crawl starting at url stays on: the last two labels of its
+    host name (eecs.utk.edu gives utk.edu), or the whole host for IP addresses and
+    single-label hosts.
+
+    @param url: A URL returned by normalize_url.
+    @return The domain.
+    """
+    host = urlsplit(url).hostname
+    labels = host.split(".")
+    if ":" in host or labels[-1].isnumeric() or len(labels) < 2:
+        return host
+    return ".".join(labels[-2:])
+
+def in_domain(url, domain):
+    """
+    Checks if a URL's host is the domain or one of its subdomains.
+
+    @param url: A URL returned by normalize_url.
+    @param domain: The domain, e.g. utk.edu.
+    @return True if the URL is on the domain.
+    """
+    host = urlsplit(url).hostname
+    return host == domain or host.endswith("." + domain)
+
+def extract_page(html):
+    """
+    Extracts the relevant text and every link from a webpage. Runs in a worker process.
+
+    @param html: The page's HTML as bytes.
+    @return The extracted text and the list of the page's href values.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    hrefs = [a['href'] for a in soup.find_all('a', href=True)]
+    return extract_text(soup), hrefs
+
+def extract_text(html):
+    """
+    Extracts the relevant text from a webpage. Runs in a worker process.
+
+    @param html: The page's HTML as bytes, or the page already parsed by BeautifulSoup.
+    @return The extracted text.
+    """
+    doc = ""
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, 'html.parser')
+
+    # Extract text from <p> elements inside <div> elements with "entry-content" class attribute.
+    div = soup.find_all('div')
+    for i in div:
+        entry = i.find_all(class_='entry-content')
+        for j in entry:
+            p = j.find_all('p')
+            for k in p:
+                doc += k.text + ' '
+
+        # Extract text from <p> elements inside <div> elements with "person_content" class attribute.
+        person = i.find_all(class_='person_content')
+        for c in person:
+            p = c.find_all('p')
+            for h in p:
+                doc += h.text + ' '
+
+    # Extract text from <table> elements with "table_default" as class attribute.
+    table = soup.find_all('table')
+    for i in table:
+        default = i.find_all(class_='table_default')
+        for j in default:
+            doc += j.text + ' '
+
+    return doc
 
 class WebCrawler(object):
-    def __init__(self, root, verbose):
+    def __init__(self, root, verbose, concurrency=16, timeout=10.0, retries=2, backoff=0.5,
+                 domain=None, max_links=None):
         """
         The Constructor for the WebCrawler class.
 
         @param self: The WebCrawler object.
         @param root: The webpage to start crawling from.
         @param verbose: Controls the verbosity of the program's output.
+        @param concurrency: The number of pages fetched at the same time.
+        @param timeout: The seconds to wait for a server to connect or send data.
+        @param retries: The number of times a failed request is retried.
+        @param backoff: The seconds to wait before the first retry; each retry waits twice as long.
+        @param domain: The domain links must be on, or None for the domain of the root.
+        @param max_links: The most links to collect, or None for no limit.
         @return none
         """
         self.root = root
         self.verbose = verbose
-        self.depth = 1        
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.domain = domain
+        self.max_links = max_links
 
         self.links = []
         self.documents = []
+        # The texts of the pages collect() fetched, and the positions of those pages in the
+        # list of links, in increasing order
+        self.spool = None
+        self.spooled = array('q')
+        self.pages_per_second = None
 
     def get_documents(self):
         """
@@ -67,121 +343,213 @@ class WebCrawler(object):
 
     def collect(self, s, d):
         """
-        Collects links with "utk.edu" starting at site s and “crawling” a depth of d.
+        Collects the links within the crawler's domain starting at site s and crawling
+        breadth-first to a depth of d: the links on s are depth 1, the links on those pages
+        depth 2, and so on. Every link is normalized before it is compared, and only a
+        short hash of it is remembered. The links, and the text of every page fetched
+        along the way (so crawl() does not fetch it again), are written to temporary
+        files instead of being held in memory; the list of links is a Spool.
 
         @param self: The WebCrawler object.
         @param s: The webpage to start crawling from.
-        @param d: The depth the crawler should go, hard-coded to 1.
+        @param d: The depth the crawler should go.
         @return none
+        @raise CrawlError: If s is not an http(s) URL or its page cannot be fetched.
         """
-        # Define a site, header request object, and create a request.
-        hdr = {'User-Agent': 'Mozilla/5.0'}
-        req = Request(s, headers=hdr)
-
-        # Catch and print any HTTP error BeautifulSoup encounters 
-        # when opening the website at the URL.
-        try:
-            page = urlopen(req)
-        except HTTPError as err:
-            print(err.code)
-            if err.code == 403:
-                print(err.code)
-        
-        # Object to parse the HTML format
-        soup = BeautifulSoup(page, 'html.parser')
+        root = normalize_url(s, s)
+        if root is None:
+            raise CrawlError("%s is not an http(s) URL" % s)
+        domain = self.domain or default_domain(root)
+
+        link_list = Spool()
+        link_list.append(root)
+        seen = KeySet()
+        seen.add(url_key(root))
+        self.close_spool()
+        self.spool = Spool()
+        frontier = array('q', [0])
 
-        link_num = 0
-        link_list = []
         if self.verbose == "T":
             print("1. COLLECTING LINKS - STARTED")
 
-        # collect all links with "utk.edu"
-        # extract all anchor tags.
-        for k in soup.find_all('a'):
-            link = k['href']
-
-            # prevent duplicate links.
-            if not (link in link_list):
-                if link[0:5] == "https":
-                    link_2 = "http" + link[5:len(link)]
-                elif link[0:4] == "http":
-                    link_2 = "https" + link[4:len(link)]
-                else:
-                    continue
-                if link_2 in link_list:
-                    continue
-            else:
-                continue
-                
-            if "utk.edu" in link:
-                link_list.append(k['href'])
-                link_num += 1
-                if self.verbose == "T":
-                    print("COLLECTED: LINK %d" % link_num)
-        
+        session = self.make_session()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as fetchers, ProcessPoolExecutor() as parsers:
+            for level in range(1, d + 1):
+                next_frontier = array('q')
+                # Fetch the level in batches so only a batch of pages is held at a time
+                for b in range(0, len(frontier), FRONTIER_BATCH):
+                    batch = frontier[b:b + FRONTIER_BATCH]
+                    urls = [link_list[n] for n in batch]
+                    parsing = []
+                    for n, page in zip(batch, fetchers.map(lambda url: self.fetch(session, url), urls)):
+                        if page is not None:
+                            parsing.append((n, page[0], parsers.submit(extract_page, page[1])))
+
+                    # Links are taken in page order so the crawl comes out the same every time
+                    for n, url, future in parsing:
+                        text, hrefs = future.result()
+                        self.spool_text(n, text)
+                        for href in hrefs:
+                            # Relative links are resolved against the URL the page was served from
+                            link = normalize_url(href, url)
+                            if link is None or not in_domain(link, domain):
+                                continue
+                            if self.max_links is not None and len(link_list) >= self.max_links:
+                                break
+                            if not seen.add(url_key(link)):
+                                continue
+                            next_frontier.append(len(link_list))
+                            link_list.append(link)
+                            if self.verbose == "T":
+                                print("COLLECTED: LINK %d (DEPTH %d)" % (len(link_list) - 1, level))
+
+                if len(next_frontier) == 0 or (self.max_links is not None and len(link_list) >= self.max_links):
+                    break
+                frontier = next_frontier
+        session.close()
+
+        if len(self.spooled) == 0 or self.spooled[0] != 0:
+            self.close_spool()
+            link_list.close()
+            raise CrawlError("Could not fetch %s" % root)
+
         if self.verbose == "T":
-            print("1. COLLECTING LINKS - DONE")        
+            print("1. COLLECTING LINKS - DONE (%d links)" % len(link_list))
 
         self.set_links(link_list)
 
+    def spool_text(self, n, text):
+        """
+        Writes the text of link n to the text spool. Links are spooled in increasing order.
+
+        @param self: The WebCrawler object.
+        @param n: The link's position in the list of links.
+        @param text: The text extracted from the link's page.
+        @return none
+        """
+        self.spool.append(text)
+        self.spooled.append(n)
+
+    def spooled_text(self, n):
+        """
+        Reads the text of link n back from the text spool.
+
+        @param self: The WebCrawler object.
+        @param n: The link's position in the list of links.
+        @return The text extracted from the link's page, or None if it was not spooled.
+        """
+        i = bisect_left(self.spooled, n)
+        if i == len(self.spooled) or self.spooled[i] != n:
+            return None
+        return self.spool[i]
+
+    def close_spool(self):
+        """
+        Closes and deletes the text spool, if there is one.
+
+        @param self: The WebCrawler object.
+        @return none
+        """
+        if self.spool is not None:
+            self.spool.close()
+        self.spool = None
+        self.spooled = array('q')
+
+    def make_session(self):
+        """
+        Creates the Session shared by the fetching threads. Its connection pool keeps up
+        to one connection per thread open to each host, so pages on the same host reuse
+        connections instead of reconnecting for every request.
+
+        @param self: The WebCrawler object.
+        @return a requests Session
+        """
+        session = requests.Session()
+        session.headers['User-Agent'] = 'Mozilla/5.0'
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.concurrency,
+                                                pool_maxsize=self.concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def fetch(self, session, url):
+        """
+        Fetches one page. Timeouts, connection errors, rate limiting and server errors
+        are retried with exponential backoff; other errors give up at once.
+
+        @param self: The WebCrawler object.
+        @param session: The requests Session to fetch with.
+        @param url: The page to fetch.
+        @return The URL the page was served from (after redirects) and its body as bytes,
+                or None if it could not be fetched.
+        """
+        for attempt in range(0, self.retries + 1):
+            if attempt != 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = session.get(url, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                continue
+            except requests.exceptions.RequestException:
+                return None
+
+            if response.status_code in RETRY_STATUSES:
+                continue
+            if response.status_code != 200:
+                return None
+            return response.url, response.content
+        return None
+
     def crawl(self):
         """
-        Extracts and stores all relevant text from the list of collected links.
+        Extracts and stores all relevant text from the list of collected links. Pages
+        are fetched concurrently and parsed in worker processes; pages collect() already
+        fetched are not fetched again. A page that cannot be fetched becomes an empty
+        document, so documents stay in the same order as links.
 
         @param self: The WebCrawler object.
         @return none
         """
-        doc_list = []
-        link_num = 1
         link_list = self.get_links()
+        doc_list = [None] * len(link_list)
+        if self.spool is not None:
+            for n, text in zip(self.spooled, self.spool):
+                doc_list[n] = text
+        self.close_spool()
+        link_num = 0
 
         if self.verbose == "T":
             print("2. CRAWLING LINKS - STARTED")
 
-        for i in link_list:
-            doc = ""
-            hdr = {'User-Agent': 'Mozilla/5.0'}
-            req = Request(i, headers=hdr)
+        begin = time.perf_counter()
+        session = self.make_session()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as fetchers, ProcessPoolExecutor() as parsers:
+            fetching = {fetchers.submit(self.fetch, session, link): n for n, link in enumerate(link_list)
+                        if doc_list[n] is None}
+            parsing = {}
+            for future in as_completed(fetching):
+                n = fetching[future]
+                page = future.result()
+                if page is None:
+                    if self.verbose == "T":
+                        print("FAILED: %s" % link_list[n].rstrip())
+                    continue
 
-            # Catch and print any HTTP error
-            try:
-                page = urlopen(req)
-            except:
-                continue
+                link_num += 1
+                parsing[parsers.submit(extract_text, page[1])] = n
+                if self.verbose == "T":
+                    print("CRAWLING: LINK (%d/%d)" % (link_num, len(fetching)))
 
-            soup = BeautifulSoup(page, 'html.parser')
-            
-            if self.verbose == "T":
-                print("CRAWLING: LINK (%d/%d)" % (link_num, len(link_list)))
-
-            # Extract text from <p> elements inside <div> elements with "entry-content" class attribute.
-            div = soup.find_all('div')
-            for i in div:
-                entry = i.find_all(class_='entry-content')
-                for j in entry:
-                    p = j.find_all('p')
-                    for k in p:
-                        doc += k.text + ' '
-        
-                # Extract text from <p> elements inside <div> elements with "person_content" class attribute.
-                person = i.find_all(class_='person_content')
-                for c in person:
-                    p = c.find_all('p')
-                    for h in p:
-                        doc += h.text + ' '
-
-            # Extract text from <table> elements with "table_default" as class attribute.
-            table = soup.find_all('table')
-            for i in table:
-                default = i.find_all(class_='table_default')
-                for j in default:
-                    doc += k.text + ' '
-
-            doc_list.append(doc)
-            link_num += 1
+            for future in as_completed(parsing):
+                doc_list[parsing[future]] = future.result()
+        session.close()
+        doc_list = ["" if doc is None else doc for doc in doc_list]
 
+        elapsed = time.perf_counter() - begin
+        self.pages_per_second = link_num / elapsed if elapsed > 0 else None
         if self.verbose == "T":
-            print("2. CRAWLING LINKS - DONE")
+            print("2. CRAWLING LINKS - DONE (%d pages in %.2f s, %.1f pages/s)" %
+                  (link_num, elapsed, self.pages_per_second or 0.0))
 
         self.set_documents(doc_list)
             
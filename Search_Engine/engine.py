@@ -3,16 +3,19 @@ Author: Caroline Rinks
 Implements the SearchEngine class.
 """
 
-from requests.models import DEFAULT_REDIRECT_LIMIT
-from sklearn.feature_extraction.text import TfidfVectorizer
 import os
-import numpy as np
-import pandas as pd
+import shutil
+import time
 import crawler as c
+import index
 import interface as i
 
+# The folder the index is saved to
+INDEX_DIR = "index"
+
 class SearchEngine(object):
-    def __init__(self, root, mode, query, verbose, depth):
+    def __init__(self, root, mode, query, verbose, depth, concurrency=16, timeout=10.0, domain=None,
+                 max_links=None):
         """
         The Constructor for the SearchEngine class.
 
@@ -21,7 +24,11 @@ class SearchEngine(object):
         @param mode: The mode of the user interface: Interactive (I) or Command-Line (C)
         @param query: A string supplied by the user for which to find relevant webpages.
         @param verbose: Controls the verbosity of the program's output.
-        @param depth: The depth the crawler should go, hard-coded to 1.
+        @param depth: The depth the crawler should go.
+        @param concurrency: The number of pages the crawler fetches at the same time.
+        @param timeout: The seconds the crawler waits for a server before retrying.
+        @param domain: The domain the crawler stays on, or None for the domain of the root.
+        @param max_links: The most links the crawler collects, or None for no limit.
         @return none
         """
         self.root = root
@@ -30,10 +37,10 @@ class SearchEngine(object):
         self.verbose = verbose
         self.depth = depth
 
-        self.tfidf_vectorizer = None
-        self.df = None
+        self.index = None
             
-        self.crawler = c.WebCrawler(self.root, self.verbose)
+        self.crawler = c.WebCrawler(self.root, self.verbose, concurrency, timeout, domain=domain,
+                                    max_links=max_links)
         self.interface = i.SearchInterface(self.mode, self, self.query)
 
         self.docs = []
@@ -52,117 +59,108 @@ class SearchEngine(object):
 
     def train(self):
         """
-        Calls the collect(), crawl(), and clean() WebCrawler class methods
-        and saves the generated links and cleaned documents to the files 
-        "links.pickle" and "docs.pickle" if the files do not already exist.
+        Loads the saved index from the "index" folder if there is one. Otherwise reads
+        the cleaned documents and links from "docs.pickle" and "links.pickle", or calls
+        the collect(), crawl(), and clean() WebCrawler class methods and saves their
+        results to those files if they do not exist. The index is then built from the
+        documents and saved. Files that do not match are an error rather than a reason
+        to crawl again, so a cached start never goes to the network.
 
         @param self: The SearchEngine object.
         @return none
+        @raise CacheError: If docs.pickle and links.pickle do not match.
         """
-        try:
-            dfile = open("docs.pickle", "x")
-            lfile = open("links.pickle", "x")
-        except:
-            # load cleaned documents from "docs.pickle" if it already exists
-            dfile = open("docs.pickle", "r")
-            self.docs.append(dfile.read())
-            dfile.close()
-            self.crawler.documents = self.docs
-
-            # load crawled links from "links.pickle" if it already exists
-            with open("links.pickle", "r") as lfile:
-                line = lfile.readline()
-                while line:
-                    self.links.append(line)
-                    line = lfile.readline()
-            lfile.close()
-            self.crawler.links = self.links
-
-            self.df = self.compute_tf_idf()
+        begin = time.perf_counter()
+        self.index = index.InvertedIndex.load(INDEX_DIR)
+        if self.index is not None:
+            if self.verbose == "T":
+                print("Loaded index of %d documents in %.2f ms" %
+                      (self.index.num_docs(), 1000 * (time.perf_counter() - begin)))
             return
 
-        # Generate crawled links and cleaned documents
-        self.crawler.collect(self.root, self.depth)
-        self.crawler.crawl()
-        self.docs = self.crawler.clean()
-
-        # Save cleaned documents to "docs.pickle"
-        for doc in self.docs:
-            dfile.write(doc)
-            dfile.write("\n\n")
-        dfile.close()
-
-        # Save links to "links.pickle"
-        self.links = self.crawler.get_links()
-        for link in self.links:
-            lfile.write(link)
-            lfile.write("\n")
-        lfile.close()
-
-        self.df = self.compute_tf_idf()
+        self.docs = []
+        self.links = []
+        if os.path.exists("docs.pickle") and os.path.exists("links.pickle"):
+            # load cleaned documents from "docs.pickle", each followed by a blank line
+            with open("docs.pickle", "r", encoding="utf-8", errors="replace") as dfile:
+                self.docs = dfile.read().split("\n\n")[:-1]
+
+            # load crawled links from "links.pickle", one per line
+            with open("links.pickle", "r", encoding="utf-8") as lfile:
+                self.links = lfile.read().splitlines()
+
+            if len(self.docs) != len(self.links):
+                raise c.CacheError("docs.pickle has %d documents but links.pickle has %d links; delete "
+                                 "both files (or use :delete) to crawl %s again" %
+                                 (len(self.docs), len(self.links), self.root))
+        else:
+            # Generate crawled links and cleaned documents
+            self.crawler.collect(self.root, self.depth)
+            self.crawler.crawl()
+            self.docs = self.crawler.clean()
+            self.links = self.crawler.get_links()
+
+            # Save cleaned documents to "docs.pickle"
+            with open("docs.pickle", "w", encoding="utf-8") as dfile:
+                for doc in self.docs:
+                    dfile.write(doc)
+                    dfile.write("\n\n")
+
+            # Save links to "links.pickle"
+            with open("links.pickle", "w", encoding="utf-8") as lfile:
+                for link in self.links:
+                    lfile.write(link.strip())
+                    lfile.write("\n")
+
+        self.crawler.documents = self.docs
+        self.crawler.links = self.links
+        self.index = self.compute_tf_idf()
+        self.index.save(INDEX_DIR)
         return
 
     def delete(self):
         """
-        Deletes any .pickle files created from the SearchEngine class's train() method.
+        Deletes any .pickle files and the saved index created from the SearchEngine class's
+        train() method.
 
         @param self: The SearchEngine object.
         @return none
         """
-        os.remove("docs.pickle")
-        os.remove("links.pickle")
+        for filename in ("docs.pickle", "links.pickle"):
+            if os.path.exists(filename):
+                os.remove(filename)
+        shutil.rmtree(INDEX_DIR, ignore_errors=True)
 
     def compute_tf_idf(self):
         """
-        Reads and Vectorizes all cleaned documents using Scikit-Learn's TfidfVectorizor.
+        Reads and Vectorizes all cleaned documents using Scikit-Learn's TfidfVectorizor,
+        keeping the result as a sparse inverted index.
 
         @param self: The SearchEngine object.
-        @return none
+        @return an InvertedIndex object
         """
-        # Instantiate the Tfidfvectorizer
-        self.tfidf_vectorizer = TfidfVectorizer()
-
-        # Send docs into the Vectorizer
-        tfidf_vectorizer_vectors = self.tfidf_vectorizer.fit_transform(self.docs)
-
-        # Transpose the result into a more traditional TF-IDF matrix and convert it to an array.
-        X = tfidf_vectorizer_vectors.T.toarray()
-
-        # Convert the matrix into a dataframe using feature names as the dataframe index.
-        df = pd.DataFrame(X, index=self.tfidf_vectorizer.vocabulary)
-        return df
+        return index.InvertedIndex.build(self.docs, self.links)
 
     def handle_query(self, query):
         """
         Evaluates the relevance of webpages by calculating the cosine similarity
-        between the query and each extracted document. Up to the 5 most relevant
-        webpages are outputted to the user. 
+        between the query and each extracted document that shares a term with it.
+        Up to the 5 most relevant webpages are outputted to the user.
 
         @param self: The SearchEngine object.
         @param query: The string supplied by the user for which to find relevant webpages for.
         @return none
         """
-        # Vectorize the query.
-        q = [query]
-        q_vec = self.tfidf_vectorizer.transform(q).toarray().reshape(self.df.shape[0],)
-
-        # Calculate cosine similarity between query and all documents. 
-        sim = {}
-        for i in range(len(self.df.columns)):
-            sim[i] = np.dot(self.df.loc[:, i].values, q_vec) / np.linalg.norm(self.df.loc[:, i]) * np.linalg.norm(q_vec)
-
-        # Sort results.
-        sim_sorted = sorted(sim.items(), key=lambda x: x[1], reverse=True)
+        # Score only the documents that share a term with the query.
+        begin = time.perf_counter()
+        results = self.index.search(query, 5)
+        if self.verbose == "T":
+            print("Scored in %.2f ms" % (1000 * (time.perf_counter() - begin)))
 
         # Print a list of up to 5 documents that are relevant to the query.
-        printed = 0
-        for k, v in sim_sorted:
-            if printed == 5:
-                return
-            if v != 0.0 and not(np.isnan(v)):
-                printed += 1
-                print("[%d] %s (%.2f)" % (printed, (self.crawler.get_links())[k].rstrip(), v))
-        if printed == 0:
+        for printed, (k, v) in enumerate(results, 1):
+            print("[%d] %s (%.2f)" % (printed, self.index.links[k], v))
+        if not results:
             print("Your search did not match any documents. Try again.")
 
     def listen(self):
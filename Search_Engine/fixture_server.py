@@ -0,0 +1,204 @@
+"""
+Author: Caroline Rinks
+Serves the pages in the fixtures folder over HTTP on localhost, as a stand-in for a real
+website when trying out the crawler. Links in the fixture pages are written as {root}PATH
+and point back at this server. The server keeps connections alive, can slow down every
+response to imitate a slow host, and can fail a fraction of requests with 503 errors so the
+crawler's retries can be watched.
+
+Besides the fixture pages, /pages/N (for N below -pages) serves generated pages, each with
+a paragraph of text and links to a few other generated pages, for timing larger crawls.
+Adding ?delay=SECONDS to any URL holds that one response back, on top of -delay.
+
+The server counts the requests it has received and the most it was answering at once, in
+its requests and max_active attributes.
+
+Usage:
+
+    python fixture_server.py [-port PORT] [-delay SECONDS] [-fail RATE] [-pages N]
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os, random, sys, threading, time
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Words the generated pages are written with
+WORDS = ("engineering computer science research lab undergraduate graduate student faculty "
+         "robotics learning power systems networks security algorithms data design course "
+         "professor department program seminar project hardware software vision").split()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests, so connection pooling matters
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """
+        Answers a GET request with a fixture page, a generated page, or an error.
+
+        @param self: The FixtureHandler object.
+        @return none
+        """
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            self.answer()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def answer(self):
+        """
+        Waits out any delay and sends the page asked for.
+
+        @param self: The FixtureHandler object.
+        @return none
+        """
+        server = self.server
+        path, _, query = self.path.split("#")[0].partition("?")
+        delay = server.delay
+        for field in query.split("&"):
+            name, _, value = field.partition("=")
+            if name == "delay" and value.replace('.', '', 1).isnumeric():
+                delay += float(value)
+        if delay > 0:
+            time.sleep(delay)
+
+        with server.lock:
+            fail = server.rng.random() < server.fail_rate
+        if fail:
+            self.reply(503, b"Service Unavailable")
+            return
+
+        root = "http://%s:%d/" % server.server_address[:2]
+        path = path.lstrip("/") or "index.html"
+        if path.startswith("pages/"):
+            page = self.generated_page(path[6:], root)
+            if page is None:
+                self.reply(404, b"Not Found")
+            else:
+                self.reply(200, page)
+            return
+
+        filename = os.path.join(FIXTURES, os.path.basename(path))
+        if not os.path.isfile(filename):
+            self.reply(404, b"Not Found")
+            return
+        with open(filename, "r") as file:
+            self.reply(200, file.read().replace("{root}", root).encode())
+
+    def generated_page(self, number, root):
+        """
+        Writes generated page number N, the same every time it is asked for.
+
+        @param self: The FixtureHandler object.
+        @param number: The page number from the URL.
+        @param root: The server's root URL.
+        @return The page as bytes, or None if there is no such page.
+        """
+        if not number.isnumeric() or int(number) >= self.server.pages:
+            return None
+        n = int(number)
+        rng = random.Random(n)
+        text = " ".join(rng.choice(WORDS) for _ in range(60))
+        links = "".join('<a href="%spages/%d">Page %d</a>\n' % (root, m, m)
+                        for m in (rng.randrange(self.server.pages) for _ in range(5)))
+        return ('<!DOCTYPE html>\n<html>\n<head><title>Page %d</title></head>\n<body>\n%s'
+                '<div class="content">\n<div class="entry-content">\n<p>%s</p>\n</div>\n</div>\n'
+                '</body>\n</html>\n' % (n, links, text)).encode()
+
+    def reply(self, status, body):
+        """
+        Sends a response with a body.
+
+        @param self: The FixtureHandler object.
+        @param status: The HTTP status code.
+        @param body: The response body as bytes.
+        @return none
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Keeps the server quiet; the crawler reports what it fetched.
+
+        @param self: The FixtureHandler object.
+        @return none
+        """
+        pass
+
+def make_server(port=0, delay=0.0, fail_rate=0.0, pages=1000):
+    """
+    Creates a fixture server on localhost. Call serve_forever() on it to start serving.
+
+    @param port: The port to listen on, or 0 to pick a free one.
+    @param delay: The seconds every response is held back.
+    @param fail_rate: The fraction of requests answered with 503.
+    @param pages: The number of generated pages under /pages/.
+    @return a ThreadingHTTPServer object
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.fail_rate = fail_rate
+    server.pages = pages
+    server.rng = random.Random(0)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.active = 0
+    server.max_active = 0
+    return server
+
+def parse_args():
+    """
+    Parses command-line arguments port, delay, fail, and pages.
+
+    @return port: The port to listen on.
+    @return delay: The seconds every response is held back.
+    @return fail_rate: The fraction of requests answered with 503.
+    @return pages: The number of generated pages.
+    """
+    port = 8000
+    delay = 0.0
+    fail_rate = 0.0
+    pages = 1000
+
+    for i in range(1, len(sys.argv), 2):
+        if i+1 == len(sys.argv):
+            sys.exit("ERROR: Missing required arguments")
+        value = sys.argv[i+1]
+        if not value.replace('.', '', 1).isnumeric():
+            sys.exit("ERROR: Invalid arguments provided")
+
+        if sys.argv[i] == "-port":
+            port = int(float(value))
+        elif sys.argv[i] == "-delay":
+            delay = float(value)
+        elif sys.argv[i] == "-fail" and float(value) <= 1:
+            fail_rate = float(value)
+        elif sys.argv[i] == "-pages":
+            pages = int(float(value))
+        else:
+            sys.exit("ERROR: Invalid arguments provided")
+
+    return port, delay, fail_rate, pages
+
+def main():
+    port, delay, fail_rate, pages = parse_args()
+    server = make_server(port, delay, fail_rate, pages)
+    print("Serving fixtures on http://127.0.0.1:%d/" % server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""
+Author: Caroline Rinks
+Implements the InvertedIndex class, a sparse TF-IDF index of the crawled documents.
+
+For every term in the vocabulary the index keeps its postings: the documents that
+contain the term and the term's TF-IDF weight in each. The postings of all terms are
+stored back to back in three flat arrays (the compressed sparse column layout of the
+documents x terms TF-IDF matrix), so the index takes memory in proportion to the number
+of (term, document) pairs rather than vocabulary x documents.
+
+Document vectors are divided by their norms when the index is built, so the cosine
+similarity of a query with a document is the sum, over the query's terms, of the query
+weight times the posting weight. A query is scored by gathering the postings of its terms
+and adding up the products per document, so its cost depends on the number of postings
+read rather than the number of documents, and the best k are picked with a partial sort.
+The few terms found in a large share of the documents (DENSE_TERM_FRACTION) also keep a
+dense weight vector with one entry per document, so a query made of common terms adds up
+whole vectors instead of gathering and counting hundreds of thousands of postings.
+
+An index can be saved to a folder of .npy files and loaded back memory-mapped, so loading
+reads nothing but the file headers; pages of the arrays are read from disk when a query
+first touches them. The vocabulary is stored as a sorted array of UTF-8 encoded terms,
+searched with binary search, and the links as one array of UTF-8 bytes plus the offset
+at which each link starts.
+"""
+
+import os
+import re
+
+import numpy as np
+
+# The tokens TfidfVectorizer extracts by default: runs of two or more word characters
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Postings lists are summed per document by sorting when they cover less than this
+# fraction of the documents, and with one counter per document otherwise
+DENSE_FRACTION = 1 / 4
+
+# Terms found in at least this fraction of the documents also get a dense weight vector,
+# at most DENSE_TERMS of them (4 bytes per document each)
+DENSE_TERM_FRACTION = 1 / 16
+DENSE_TERMS = 32
+
+# The top k scores are partitioned out of the scores at least as high as the k-th best of
+# every SAMPLE_STRIDE-th score, which can be no better than the k-th best of them all
+SAMPLE_STRIDE = 64
+
+# Bumped whenever the layout of a saved index changes
+INDEX_VERSION = 2
+
+# The arrays a saved index is made of, one .npy file each
+INDEX_ARRAYS = ("terms", "idf", "indptr", "doc_ids", "weights", "norms", "link_offsets", "link_bytes",
+                "dense_terms", "dense_weights")
+
+def dense_columns(indptr, doc_ids, weights, ndocs):
+    """
+    Picks the terms found in at least DENSE_TERM_FRACTION of the documents, the most
+    common first and at most DENSE_TERMS of them, and spreads their postings out into
+    one dense row of weights per term.
+
+    @param indptr: Where each term's postings start, with one extra entry at the end.
+    @param doc_ids: The document ids of all postings, in term order.
+    @param weights: The weights of all postings, in term order.
+    @param ndocs: The number of documents.
+    @return the sorted ids of the chosen terms, and a (terms, ndocs) float32 array of
+            their weights in each document
+    """
+    df = np.diff(indptr)
+    common = np.flatnonzero(df >= max(1, DENSE_TERM_FRACTION * ndocs))
+    terms = np.sort(common[np.argsort(-df[common], kind="stable")[:DENSE_TERMS]])
+    dense = np.zeros((len(terms), ndocs), dtype=np.float32)
+    for row, t in enumerate(terms):
+        dense[row, doc_ids[indptr[t]:indptr[t + 1]]] = weights[indptr[t]:indptr[t + 1]]
+    return terms.astype(np.int64), dense
+
+class LinkTable(object):
+    def __init__(self, offsets, data):
+        """
+        The Constructor for the LinkTable class, the links of the indexed documents
+        stored back to back as UTF-8 bytes. Link n is data[offsets[n]:offsets[n+1]].
+
+        @param self: The LinkTable object.
+        @param offsets: Where each link starts, with one extra entry at the end.
+        @param data: The bytes of all links.
+        @return none
+        """
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_list(cls, links):
+        """
+        Packs a list of links into a LinkTable.
+
+        @param cls: The LinkTable class.
+        @param links: The list of links.
+        @return a LinkTable object
+        """
+        encoded = [link.strip().encode() for link in links]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(link) for link in encoded], dtype=np.int64)
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, n):
+        return self.data[self.offsets[n]:self.offsets[n + 1]].tobytes().decode()
+
+class InvertedIndex(object):
+    def __init__(self, terms, idf, indptr, doc_ids, weights, norms, links, dense_terms=None,
+                 dense_weights=None):
+        """
+        The Constructor for the InvertedIndex class. The postings of term t are
+        doc_ids[indptr[t]:indptr[t+1]] with weights weights[indptr[t]:indptr[t+1]].
+        Term dense_terms[r] also has its weight in every document in dense_weights[r].
+
+        @param self: The InvertedIndex object.
+        @param terms: The UTF-8 encoded terms in sorted order; a term's position is its term id.
+        @param idf: The inverse document frequency of each term, indexed by term id.
+        @param indptr: Where each term's postings start, with one extra entry at the end.
+        @param doc_ids: The document ids of all postings, in term order.
+        @param weights: The TF-IDF weights of all postings divided by their document's
+                        norm, in term order.
+        @param norms: The Euclidean norm of each document's TF-IDF vector.
+        @param links: The LinkTable holding each document's link.
+        @param dense_terms: The sorted ids of the terms with a dense weight vector, or
+                            None to pick them with dense_columns().
+        @param dense_weights: The dense weight vectors, one row per term in dense_terms.
+        @return none
+        """
+        self.terms = terms
+        self.idf = idf
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.norms = norms
+        self.links = links
+        if dense_terms is None:
+            dense_terms, dense_weights = dense_columns(indptr, doc_ids, weights, len(norms))
+        self.dense_terms = dense_terms
+        self.dense_weights = dense_weights
+
+    @classmethod
+    def build(cls, docs, links):
+        """
+        Vectorizes the documents with Scikit-Learn's TfidfVectorizer and keeps the
+        result sparse.
+
+        @param cls: The InvertedIndex class.
+        @param docs: The list of cleaned documents.
+        @param links: The list of links, one for each document.
+        @return an InvertedIndex object
+        """
+        # Imported here so that loading a saved index does not pay for importing Scikit-Learn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # Weights come out unnormalized so the document norms can be stored next to them
+        vectorizer = TfidfVectorizer(norm=None, dtype=np.float32)
+        matrix = vectorizer.fit_transform(docs).tocsc()
+        matrix.sort_indices()
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32).ravel())
+        # Pre-normalize, leaving documents without any terms (norm 0) as they are
+        weights = matrix.data / np.where(norms == 0, 1, norms)[matrix.indices]
+        # Term ids follow the terms' sorted order, which UTF-8 encoding keeps
+        terms = np.array([term.encode() for term in vectorizer.get_feature_names_out()], dtype=bytes)
+        return cls(terms, vectorizer.idf_.astype(np.float32), matrix.indptr, matrix.indices,
+                   weights.astype(np.float32), norms, LinkTable.from_list(links))
+
+    def save(self, directory):
+        """
+        Writes the index to a folder of .npy files. The version file is written last,
+        so a folder left behind by an interrupted save is never loaded.
+
+        @param self: The InvertedIndex object.
+        @param directory: The folder to write, created if it does not exist.
+        @return none
+        """
+        os.makedirs(directory, exist_ok=True)
+        version = os.path.join(directory, "version.npy")
+        if os.path.exists(version):
+            os.remove(version)
+
+        arrays = {"terms": self.terms, "idf": self.idf, "indptr": self.indptr, "doc_ids": self.doc_ids,
+                  "weights": self.weights, "norms": self.norms, "link_offsets": self.links.offsets,
+                  "link_bytes": self.links.data, "dense_terms": self.dense_terms,
+                  "dense_weights": self.dense_weights}
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(arrays[name]))
+        np.save(version, np.array([INDEX_VERSION, len(self.norms), len(self.idf)], dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Memory-maps an index written by save().
+
+        @param cls: The InvertedIndex class.
+        @param directory: The folder the index was saved to.
+        @return an InvertedIndex object, or None if the folder holds no complete index
+                of the current version
+        """
+        try:
+            version = np.load(os.path.join(directory, "version.npy"))
+            if version[0] != INDEX_VERSION:
+                return None
+            arrays = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode='r')
+                      for name in INDEX_ARRAYS}
+        except (OSError, ValueError):
+            return None
+
+        if len(arrays["norms"]) != version[1] or len(arrays["idf"]) != version[2]:
+            return None
+        return cls(arrays["terms"], arrays["idf"], arrays["indptr"], arrays["doc_ids"], arrays["weights"],
+                   arrays["norms"], LinkTable(arrays["link_offsets"], arrays["link_bytes"]),
+                   arrays["dense_terms"], arrays["dense_weights"])
+
+    def num_docs(self):
+        """
+        Returns the number of indexed documents.
+
+        @param self: The InvertedIndex object.
+        @return the number of documents
+        """
+        return len(self.norms)
+
+    def query_weights(self, query):
+        """
+        Converts a query into a unit-length TF-IDF vector the same way TfidfVectorizer
+        converts a document: lowercase tokens, raw term counts times IDF. Terms outside
+        the vocabulary are dropped.
+
+        @param self: The InvertedIndex object.
+        @param query: The string supplied by the user.
+        @return the sorted term ids of the query and their weights, or None if no term
+                is in the vocabulary
+        """
+        tokens = np.array([token.encode() for token in TOKEN_PATTERN.findall(query.lower())], dtype=bytes)
+        if len(tokens) == 0 or len(self.terms) == 0:
+            return None
+
+        # Look the tokens up in the sorted terms, dropping the ones that are not there
+        terms = np.searchsorted(self.terms, tokens)
+        found = terms < len(self.terms)
+        found[found] = self.terms[terms[found]] == tokens[found]
+        terms = terms[found]
+        if len(terms) == 0:
+            return None
+
+        terms, counts = np.unique(terms, return_counts=True)
+        weights = counts * self.idf[terms]
+        weights /= np.sqrt(np.dot(weights, weights))
+        return terms, weights
+
+    def score(self, terms, weights):
+        """
+        Adds up the query's weight times the posting weight for every document in the
+        postings of the query's terms. Only those postings are read, unless the query
+        has a term with a dense weight vector or its postings cover a large share of the
+        documents; then every document gets a score.
+
+        @param self: The InvertedIndex object.
+        @param terms: The query's term ids, without repeats.
+        @param weights: The query's weight for each term.
+        @return the ids of the documents sharing a term with the query, in increasing
+                order, and their cosine similarities with the query; or None and the
+                similarity of every document, when most documents share a term with it
+        """
+        weights = weights.astype(self.weights.dtype)
+        starts = self.indptr[terms]
+        ends = self.indptr[terms + 1]
+        if len(terms) == 1:
+            # A term lists each document once, so there is nothing to add up
+            return (np.asarray(self.doc_ids[starts[0]:ends[0]]),
+                    self.weights[starts[0]:ends[0]] * weights[0])
+
+        rows = np.searchsorted(self.dense_terms, terms)
+        dense = rows < len(self.dense_terms)
+        dense[dense] = self.dense_terms[rows[dense]] == terms[dense]
+        if not dense.any() and np.sum(ends - starts) < DENSE_FRACTION * self.num_docs():
+            docs = np.concatenate([self.doc_ids[a:b] for a, b in zip(starts, ends)])
+            products = np.concatenate([self.weights[a:b] * w for a, b, w in zip(starts, ends, weights)])
+            docs, inverse = np.unique(docs, return_inverse=True)
+            return docs, np.bincount(inverse, weights=products)
+
+        # Enough postings that one score per document costs less than sorting them. The
+        # dense vectors are added up in one matrix-vector product over the rows from the
+        # query's first dense term to its last, with weight 0 for the rows in between
+        # that are not in the query; then the other terms' postings are added (a term
+        # lists each document once, so no index repeats within one assignment)
+        if dense.any():
+            first, last = rows[dense][0], rows[dense][-1]
+            coefficients = np.zeros(last - first + 1, dtype=weights.dtype)
+            coefficients[rows[dense] - first] = weights[dense]
+            scores = coefficients @ self.dense_weights[first:last + 1]
+        else:
+            scores = np.zeros(self.num_docs(), dtype=self.weights.dtype)
+        for a, b, w in zip(starts[~dense], ends[~dense], weights[~dense]):
+            scores[self.doc_ids[a:b]] += self.weights[a:b] * w
+        return None, scores
+
+    def search(self, query, k=5):
+        """
+        Scores the documents that share a term with the query by cosine similarity
+        and returns the best k.
+
+        @param self: The InvertedIndex object.
+        @param query: The string supplied by the user.
+        @param k: The number of results to return.
+        @return a list of up to k (document id, score) pairs, best first
+        """
+        q = self.query_weights(query)
+        if q is None:
+            return []
+
+        docs, values = self.score(*q)
+        if len(values) > k:
+            # Keep every document scoring at least the k-th best score, so documents
+            # tied at the cut are chosen in document order below. The k-th best of a
+            # sample is a floor for it, so only the scores above the floor are sorted
+            sample = values[::SAMPLE_STRIDE] if len(values) >= SAMPLE_STRIDE * k else values
+            floor = -np.partition(-sample, k - 1)[k - 1]
+            top = np.flatnonzero(values >= floor) if floor > 0 else np.flatnonzero(values > 0)
+            if len(top) > k:
+                kth = -np.partition(-values[top], k - 1)[k - 1]
+                top = top[values[top] >= kth]
+        else:
+            top = np.arange(len(values))
+        if docs is None:
+            docs = top
+        else:
+            docs = docs[top]
+        values = values[top]
+
+        # Best score first, ties in document order
+        order = np.lexsort((docs, -values))[:k]
+        return [(int(docs[j]), float(values[j])) for j in order if values[j] > 0]
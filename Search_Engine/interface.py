@@ -4,6 +4,8 @@ Implements the SearchInterface class, which implements one of two
 simple interfaces: an interactive search query or a command-line interface.
 """
 
+import crawler as c
+
 class SearchInterface(object):
     def __init__(self, mode, engine, query):
         """
@@ -52,7 +54,10 @@ class SearchInterface(object):
         @return none
         """
         if self.query == ":train":
-            self.engine.train()
+            try:
+                self.engine.train()
+            except (c.CrawlError, c.CacheError) as error:
+                print("ERROR: %s" % error)
         elif self.query == ":delete":
             self.engine.delete()
         else:
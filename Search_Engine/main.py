@@ -4,22 +4,34 @@ Instantiates a SearchEngine object. Implements a simple search engine that
 takes a user-supplied query and finds relevant webpages by calculating the 
 cosine-similarity between the query and each webpage.
 """
+import crawler as c
 import engine as e
 import sys
 
 def parse_args():
     """
-    Parses command-line arguments root, mode, query, and verbose.
+    Parses command-line arguments root, mode, query, verbose, concurrency, timeout, depth,
+    domain, and limit.
 
     @return root: The webpage to start crawling from.
     @return mode: The mode of the user interface: Interactive (I) or Command-Line (C)
     @return query: A string supplied by the user for which to find relevant webpages.
     @return verbose: Controls the verbosity of the program's output.
+    @return concurrency: The number of pages the crawler fetches at the same time.
+    @return timeout: The seconds the crawler waits for a server before retrying.
+    @return depth: The depth the crawler should go.
+    @return domain: The domain the crawler stays on, or None for the domain of the root.
+    @return limit: The most links the crawler collects, or None for no limit.
     """
     root = ""
     mode = ""
     query = ""
     verbose = ""
+    concurrency = 16
+    timeout = 10.0
+    depth = 1
+    domain = None
+    limit = None
     
     # Parse arguments and check validity
     for i in range(0, len(sys.argv)):
@@ -49,6 +61,39 @@ def parse_args():
             verbose = sys.argv[i+1]
             if not(verbose == "T" or verbose == "F"):
                 sys.exit("ERROR: Invalid arguments provided")
+        elif (sys.argv[i] == "-concurrency"):
+            if (i+1 == len(sys.argv)):
+                sys.exit("ERROR: Missing required arguments")
+
+            if not(sys.argv[i+1].isnumeric() and int(sys.argv[i+1]) > 0):
+                sys.exit("ERROR: Invalid arguments provided")
+            concurrency = int(sys.argv[i+1])
+        elif (sys.argv[i] == "-timeout"):
+            if (i+1 == len(sys.argv)):
+                sys.exit("ERROR: Missing required arguments")
+
+            if not(sys.argv[i+1].replace('.', '', 1).isnumeric() and float(sys.argv[i+1]) > 0):
+                sys.exit("ERROR: Invalid arguments provided")
+            timeout = float(sys.argv[i+1])
+        elif (sys.argv[i] == "-depth"):
+            if (i+1 == len(sys.argv)):
+                sys.exit("ERROR: Missing required arguments")
+
+            if not(sys.argv[i+1].isnumeric() and int(sys.argv[i+1]) > 0):
+                sys.exit("ERROR: Invalid arguments provided")
+            depth = int(sys.argv[i+1])
+        elif (sys.argv[i] == "-domain"):
+            if (i+1 == len(sys.argv)):
+                sys.exit("ERROR: Missing required arguments")
+
+            domain = sys.argv[i+1].lower()
+        elif (sys.argv[i] == "-limit"):
+            if (i+1 == len(sys.argv)):
+                sys.exit("ERROR: Missing required arguments")
+
+            if not(sys.argv[i+1].isnumeric() and int(sys.argv[i+1]) > 0):
+                sys.exit("ERROR: Invalid arguments provided")
+            limit = int(sys.argv[i+1])
 
     if root == "" or mode == "":
         sys.exit("ERROR: Missing required arguments")
@@ -59,7 +104,7 @@ def parse_args():
         if verbose == "":
             sys.exit("ERROR: Missing verbose argument")
 
-    return root, mode, query, verbose
+    return root, mode, query, verbose, concurrency, timeout, depth, domain, limit
 
 def main():
     args = parse_args()
@@ -67,9 +112,18 @@ def main():
     mode = args[1]
     query = args[2]
     verbose = args[3]
+    concurrency = args[4]
+    timeout = args[5]
+    depth = args[6]
+    domain = args[7]
+    limit = args[8]
 
-    engine = e.SearchEngine(root, mode, query, verbose, depth=1)
-    engine.start()
+    try:
+        engine = e.SearchEngine(root, mode, query, verbose, depth=depth, concurrency=concurrency,
+                                timeout=timeout, domain=domain, max_links=limit)
+        engine.start()
+    except (c.CrawlError, c.CacheError) as error:
+        sys.exit("ERROR: %s" % error)
 
 if __name__ == '__main__':
     main()
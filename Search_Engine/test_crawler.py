@@ -0,0 +1,157 @@
+"""
+Author: Caroline Rinks
+Tests for the WebCrawler against fixture_server.py, a local stand-in for a website.
+"""
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("requests")
+
+import threading, time
+from crawler import CrawlError, KeySet, Spool, WebCrawler, normalize_url, url_key
+from fixture_server import make_server
+
+def start_server(**options):
+    """
+    Starts a fixture server on a free port in a background thread.
+
+    @param options: The keyword arguments for make_server.
+    @return The server and its root URL.
+    """
+    server = make_server(0, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d/" % server.server_address[1]
+
+@pytest.fixture
+def site():
+    server, root = start_server()
+    yield server, root
+    server.shutdown()
+    server.server_close()
+
+def test_collect_and_crawl_fixture_site(site):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=4, timeout=5, retries=1, backoff=0.01)
+    crawler.collect(root, 1)
+    crawler.crawl()
+
+    links = list(crawler.get_links())
+    docs = crawler.get_documents()
+    assert links == [root] + [root + page for page in ("overview.html", "people.html", "courses.html",
+                                                       "research.html", "missing.html", "pages/0")]
+    assert len(docs) == len(links)
+    assert "electrical engineering and computer science" in docs[0]
+    assert "undergraduate and graduate programs" in docs[0]
+    assert docs[links.index(root + "overview.html")] != ""
+    assert docs[links.index(root + "pages/0")] != ""
+
+def test_index_documents_are_the_directory(site):
+    server, root = site
+    assert normalize_url("/a/index.html", root) == root + "a"
+    assert normalize_url("Default.aspx?x=1", root + "b/") == root + "b?x=1"
+    assert normalize_url("index.html", root) == root
+    assert normalize_url("/index.html.bak", root) == root + "index.html.bak"
+
+    # Every fixture page links home as index.html, which is the root already collected
+    crawler = WebCrawler(root, "F", concurrency=4, timeout=5, retries=1, backoff=0.01)
+    crawler.collect(root, 2)
+    links = list(crawler.get_links())
+    assert root + "index.html" not in links
+    assert len(links) == len(set(links))
+
+def test_spool_and_key_set():
+    spool = Spool()
+    words = ["caf\u00e9 %d" % n for n in range(1000)]
+    for word in words:
+        spool.append(word)
+    assert len(spool) == 1000 and spool[0] == words[0] and spool[999] == words[999]
+    assert list(spool) == words
+    with pytest.raises(IndexError):
+        spool[1000]
+    spool.close()
+
+    keys = KeySet()
+    assert all(keys.add(url_key("http://example.edu/%d" % n)) for n in range(5000))
+    assert not any(keys.add(url_key("https://example.edu/%d" % n)) for n in range(5000))
+    assert keys.add(0) and not keys.add(0)
+    assert len(keys) == 5001 and len(keys.table) <= 4 * len(keys)
+
+def test_collect_spools_links_and_texts_to_disk(site):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=4, timeout=5, retries=1, backoff=0.01)
+    crawler.collect(root, 1)
+    # Links and texts are in temporary files; only their offsets are kept in memory
+    assert isinstance(crawler.get_links(), Spool)
+    assert list(crawler.spooled) == [0]
+    assert "undergraduate and graduate programs" in crawler.spooled_text(0)
+    assert crawler.spooled_text(1) is None
+
+    requests = server.requests
+    crawler.crawl()
+    # Only the pages collect() did not fetch (the links on the root) are fetched
+    assert server.requests - requests == len(crawler.get_links()) - 1
+    assert crawler.spool is None
+
+def test_unreachable_root_raises(site):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=1, timeout=5, retries=0)
+    with pytest.raises(CrawlError):
+        crawler.collect(root + "missing.html", 1)
+    with pytest.raises(CrawlError):
+        crawler.collect("ftp://example.edu/", 1)
+
+def test_broken_link_becomes_empty_document(site):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=2, timeout=5, retries=2, backoff=0.01)
+    crawler.set_links([root + "overview.html", root + "missing.html", root + "research.html"])
+    crawler.crawl()
+
+    docs = crawler.get_documents()
+    assert len(docs) == 3
+    assert docs[0] != "" and docs[2] != ""
+    assert docs[1] == ""
+    # A 404 is not worth retrying, so each page is asked for once
+    assert server.requests == 3
+
+def test_slow_page_times_out_and_is_retried(site):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=2, timeout=0.2, retries=2, backoff=0.01)
+    crawler.set_links([root + "overview.html", root + "people.html?delay=1"])
+
+    begin = time.perf_counter()
+    crawler.crawl()
+    elapsed = time.perf_counter() - begin
+
+    docs = crawler.get_documents()
+    assert docs[0] != ""
+    assert docs[1] == ""
+    # One request for the fast page, and the first try plus two retries for the slow one
+    assert server.requests == 4
+    assert elapsed < 3
+
+def test_failed_requests_are_retried():
+    server, root = start_server(fail_rate=0.5)
+    try:
+        crawler = WebCrawler(root, "F", concurrency=4, timeout=5, retries=10, backoff=0.001)
+        crawler.set_links([root + "pages/%d" % n for n in range(20)])
+        crawler.crawl()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert all(doc != "" for doc in crawler.get_documents())
+    assert server.requests > 20
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_concurrency_is_bounded(site, concurrency):
+    server, root = site
+    crawler = WebCrawler(root, "F", concurrency=concurrency, timeout=5, retries=0)
+    crawler.set_links([root + "pages/%d?delay=0.05" % n for n in range(24)])
+    crawler.crawl()
+
+    assert all(doc != "" for doc in crawler.get_documents())
+    assert server.requests == 24
+    assert server.max_active <= concurrency
+    if concurrency > 1:
+        assert server.max_active > 1
@@ -0,0 +1,57 @@
+"""
+Author: Caroline Rinks
+Tests for how the SearchEngine class starts from docs.pickle, links.pickle and the saved
+index. Run with:
+
+    python -m pytest -q
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("bs4")
+pytest.importorskip("requests")
+
+import threading
+import crawler
+import engine
+from fixture_server import make_server
+
+@pytest.fixture
+def site():
+    server = make_server(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, "http://127.0.0.1:%d/" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+def write_cache(folder, docs, links):
+    with open(folder / "docs.pickle", "w", encoding="utf-8") as dfile:
+        for doc in docs:
+            dfile.write(doc + "\n\n")
+    with open(folder / "links.pickle", "w", encoding="utf-8") as lfile:
+        for link in links:
+            lfile.write(link + "\n")
+
+def test_mismatched_pickles_do_not_crawl(site, tmp_path, monkeypatch):
+    server, root = site
+    monkeypatch.chdir(tmp_path)
+    write_cache(tmp_path, ["robotics lab", "", "power systems"], [root + "a", root + "b"])
+
+    with pytest.raises(crawler.CacheError):
+        engine.SearchEngine(root, "C", "lab", "F", 1)
+    assert server.requests == 0
+    assert not (tmp_path / engine.INDEX_DIR).exists()
+
+def test_cached_start_builds_and_reloads_index(site, tmp_path, monkeypatch):
+    pytest.importorskip("sklearn")
+    server, root = site
+    monkeypatch.chdir(tmp_path)
+    write_cache(tmp_path, ["robotics lab", "", "power systems lab"], [root + "a", root + "b", root + "c"])
+
+    built = engine.SearchEngine(root, "C", "lab", "F", 1)
+    loaded = engine.SearchEngine(root, "C", "lab", "F", 1)
+    assert server.requests == 0
+    assert loaded.index.num_docs() == 3
+    assert [k for k, v in loaded.index.search("robotics", 5)] == [0]
+    assert loaded.index.search("lab power", 5) == built.index.search("lab power", 5)
@@ -0,0 +1,133 @@
+"""
+Author: Caroline Rinks
+Tests for the InvertedIndex class. Run with:
+
+    python -m pytest -q
+"""
+
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import index
+
+def synthetic_index(ndocs, nterms, postings, seed=0):
+    """
+    Builds an index straight from random postings, with term t in about postings/(t+1)
+    documents (a Zipf-like spread of common and rare terms).
+
+    @param ndocs: The number of documents
+    @param nterms: The number of terms
+    @param postings: About how many (term, document) pairs to make
+    @param seed: The random seed
+    @return an InvertedIndex object
+    """
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, nterms + 1)
+    df = np.minimum(postings / np.sum(1.0 / ranks) / ranks, ndocs // 2).astype(np.int64) + 1
+    term_of = np.repeat(np.arange(nterms, dtype=np.int32), df)
+    docs = rng.integers(0, ndocs, size=len(term_of), dtype=np.int32)
+
+    # Sort the postings by term and document and drop repeats
+    order = np.lexsort((docs, term_of))
+    docs = docs[order]
+    term_of = term_of[order]
+    keep = np.ones(len(docs), dtype=bool)
+    keep[1:] = (docs[1:] != docs[:-1]) | (term_of[1:] != term_of[:-1])
+    docs = docs[keep]
+    indptr = np.zeros(nterms + 1, dtype=np.int32)
+    np.cumsum(np.bincount(term_of[keep], minlength=nterms), out=indptr[1:])
+
+    terms = np.array(["t%05d" % t for t in range(nterms)], dtype=bytes)
+    idf = (np.log(ndocs / np.diff(indptr)) + 1).astype(np.float32)
+    weights = rng.random(len(docs), dtype=np.float32) + np.float32(0.01)
+    links = index.LinkTable.from_list(["" for _ in range(ndocs)])
+    return index.InvertedIndex(terms, idf, indptr, docs, weights, np.ones(ndocs, dtype=np.float32), links)
+
+def brute_force(ix, query, k):
+    """
+    Scores every document against the query with a dense matrix.
+
+    @param ix: The InvertedIndex object
+    @param query: The query string
+    @param k: The number of results
+    @return a list of up to k (document id, score) pairs, best first
+    """
+    q = ix.query_weights(query)
+    if q is None:
+        return []
+    matrix = np.zeros((ix.num_docs(), len(ix.idf)))
+    for t in range(len(ix.idf)):
+        matrix[ix.doc_ids[ix.indptr[t]:ix.indptr[t + 1]], t] = ix.weights[ix.indptr[t]:ix.indptr[t + 1]]
+    vector = np.zeros(len(ix.idf))
+    vector[q[0]] = q[1]
+    scores = matrix @ vector
+    order = sorted(range(len(scores)), key=lambda d: (-scores[d], d))
+    return [(d, scores[d]) for d in order[:k] if scores[d] > 0]
+
+def test_search_matches_brute_force():
+    # 2000 documents, so both the sorting and the dense counter paths are taken
+    ix = synthetic_index(2000, 300, 20000, seed=1)
+    rng = np.random.default_rng(2)
+    for _ in range(100):
+        query = " ".join("t%05d" % t for t in rng.integers(0, 300, size=rng.integers(1, 5)))
+        expected = brute_force(ix, query, 10)
+        found = ix.search(query, 10)
+        assert [d for d, _ in found] == [d for d, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+    assert ix.search("nosuchterm t99999") == []
+
+def test_build_matches_tfidf_cosine():
+    pytest.importorskip("sklearn")
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    docs = ["the lab studies robots", "robots and power systems", "graduate research in power",
+            "", "undergraduate robots robots lab"]
+    ix = index.InvertedIndex.build(docs, ["link%d" % n for n in range(len(docs))])
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(docs)
+    for query in ("robots lab", "power", "research robots robots", "nothing"):
+        scores = (matrix @ vectorizer.transform([query]).T).toarray().ravel()
+        expected = [(d, scores[d]) for d in sorted(range(len(docs)), key=lambda d: (-scores[d], d))
+                    if scores[d] > 0][:3]
+        found = ix.search(query, 3)
+        assert [d for d, _ in found] == [d for d, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+    assert ix.links[4] == "link4"
+
+def test_dense_vectors_for_common_terms_survive_save_and_load(tmp_path):
+    ix = synthetic_index(2000, 300, 20000, seed=3)
+    # Terms in at least 1/16 of the documents, so the dense scoring path is taken
+    assert 0 < len(ix.dense_terms) <= index.DENSE_TERMS
+    assert np.all(np.diff(ix.indptr)[ix.dense_terms] >= index.DENSE_TERM_FRACTION * 2000)
+
+    ix.save(str(tmp_path))
+    loaded = index.InvertedIndex.load(str(tmp_path))
+    assert np.array_equal(loaded.dense_terms, ix.dense_terms)
+    query = "t00000 t00002 t00150"
+    assert loaded.search(query, 10) == ix.search(query, 10)
+    assert [d for d, _ in ix.search(query, 10)] == [d for d, _ in brute_force(ix, query, 10)]
+
+def test_query_time_follows_postings_on_1m_documents():
+    ix = synthetic_index(1000000, 50000, 5000000)
+    df = np.diff(ix.indptr)
+    rare = "t%05d" % int(np.argmax(df < 100))
+    common = "t00000"
+    # The three most common terms are each in 13-35% of the documents
+    three_common = "t00000 t00001 t00002"
+    typical = ["t%05d t%05d" % (a, b) for a, b in ((100, 2000), (500, 40000), (1000, 1500), (3000, 7))]
+
+    def query_ms(query, repeat=5):
+        ix.search(query)
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            ix.search(query)
+        return 1000 * (time.perf_counter() - begin) / repeat
+
+    # A rare term reads a few dozen postings and must not pay for the million documents
+    assert query_ms(rare) < 2
+    assert query_ms(common) < 10
+    assert query_ms(three_common) < 10
+    assert max(query_ms(query) for query in typical) < 10